@@ -0,0 +1,108 @@
+"""Compare a batch tiles request with individual tile requests."""
+
+import os
+import json
+import time
+import tempfile
+from concurrent import futures
+
+import click
+import mercantile
+
+fixtures = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def _fixture_mosaic(storage_dir):
+    """Store the fixtures mosaic in a local storage (S3 stand-in)."""
+    from cogeo_mosaic_tiler.mosaic import create_mosaic
+    from cogeo_mosaic_tiler.storage import FileStorage
+    from cogeo_mosaic_tiler.utils import get_hash
+
+    assets = [os.path.join(fixtures, "cog1.tif"), os.path.join(fixtures, "cog2.tif")]
+    mosaic_def = create_mosaic([os.path.abspath(a) for a in assets])
+    mosaicid = get_hash(body=assets)
+    FileStorage(storage_dir).write(mosaicid, mosaic_def)
+    return mosaicid, mosaic_def
+
+
+@click.command()
+@click.option("--zoom", type=int, default=9, help="Tiles zoom level.")
+@click.option("--side", type=int, default=4, help="Tiles block width/height.")
+@click.option("--ext", type=str, default="png", help="Tiles format.")
+@click.option("--query", type=str, default="rescale=0,10000", help="Query string.")
+@click.option(
+    "--concurrency", type=int, default=6, help="Individual requests concurrency."
+)
+@click.option(
+    "--overhead",
+    type=float,
+    default=20,
+    help="Simulated per-request gateway and invocation overhead (ms).",
+)
+@click.option("--runs", type=int, default=3, help="Runs (best time is reported).")
+def main(zoom, side, ext, query, concurrency, overhead, runs):
+    """Time a block of tiles fetched one by one and with one batch request."""
+    os.environ["MOSAIC_STORAGE"] = tempfile.mkdtemp(prefix="cogeo-mosaic-batch-")
+    mosaicid, mosaic_def = _fixture_mosaic(os.environ["MOSAIC_STORAGE"])
+
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    params = dict(p.split("=", 1) for p in query.split("&") if p)
+    center = mercantile.tile(*mosaic_def["center"][:2], zoom)
+    tiles = [
+        (zoom, center.x + dx, center.y + dy)
+        for dx in range(-(side // 2), side - side // 2)
+        for dy in range(-(side // 2), side - side // 2)
+    ]
+
+    def _request(path, method="GET", body=None):
+        time.sleep(overhead / 1000)
+        event = {
+            "path": path,
+            "httpMethod": method,
+            "headers": {},
+            "queryStringParameters": dict(params),
+        }
+        if body:
+            event["body"] = body
+        response = app(event, {})
+        assert response["statusCode"] in [200, 204], response["body"]
+        return len(response.get("body") or "")
+
+    def _individual():
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return sum(
+                executor.map(
+                    lambda t: _request(f"/{mosaicid}/{t[0]}/{t[1]}/{t[2]}.{ext}"),
+                    tiles,
+                )
+            )
+
+    def _batch():
+        body = json.dumps(dict(tiles=[f"{z}/{x}/{y}" for z, x, y in tiles]))
+        return _request(f"/{mosaicid}/batch.{ext}", method="POST", body=body)
+
+    # Warm up (mosaic definition, GDAL headers)
+    _individual()
+
+    click.echo(
+        f"{len(tiles)} tiles (zoom {zoom}, {ext}), {overhead}ms overhead per request,"
+        f" individual requests concurrency {concurrency}"
+    )
+    click.echo("mode        requests  time(ms)  payload(kB)")
+    for name, func, requests in [
+        ("individual", _individual, len(tiles)),
+        ("batch", _batch, 1),
+    ]:
+        timings = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            size = func()
+            timings.append(time.perf_counter() - t0)
+        click.echo(
+            f"{name:<10}  {requests:>8}  {min(timings) * 1000:8.1f}  {size / 1e3:11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
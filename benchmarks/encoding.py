@@ -0,0 +1,59 @@
+"""Compare image encoders and compression profiles across formats and tile sizes."""
+
+import os
+import time
+
+import click
+import numpy
+
+import rasterio
+
+from cogeo_mosaic_tiler import encoders
+
+fixtures = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+def _tile(size):
+    """Read a 8 bit RGB tile with a partial mask from the fixtures."""
+    with rasterio.open(os.path.join(fixtures, "cog1.tif")) as src_dst:
+        data = src_dst.read(out_shape=(src_dst.count, size, size))
+        mask = src_dst.dataset_mask(out_shape=(size, size))
+
+    data = data.astype("float64")
+    data = (data - data.min()) / (data.max() - data.min()) * 255
+    arr = numpy.repeat(data.astype(numpy.uint8)[0:1], 3, axis=0)
+    return arr, mask
+
+
+@click.command()
+@click.option(
+    "--format",
+    "formats",
+    multiple=True,
+    default=["png", "jpeg", "webp"],
+    help="Image formats.",
+)
+@click.option("--size", "sizes", type=int, multiple=True, default=[256, 512])
+@click.option("--runs", type=int, default=20, help="Runs per configuration.")
+def main(formats, sizes, runs):
+    """Report encoding time and output size per encoder and profile."""
+    click.echo("format  size  encoder  profile      ms    bytes")
+    for size in sizes:
+        arr, mask = _tile(size)
+        for img_format in formats:
+            for encoder in encoders.ENCODERS:
+                for profile in encoders.PROFILES:
+                    t0 = time.perf_counter()
+                    for _ in range(runs):
+                        content = encoders.encode(
+                            arr, mask, img_format, encoder=encoder, profile=profile
+                        )
+                    elapsed = (time.perf_counter() - t0) / runs * 1000
+                    click.echo(
+                        f"{img_format:>6}  {size:>4}  {encoder:>7}  {profile:>7}"
+                        f"  {elapsed:6.2f}  {len(content):>7}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
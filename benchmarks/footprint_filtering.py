@@ -0,0 +1,41 @@
+"""Report asset reads saved by footprint filtering on the fixture mosaic."""
+
+import os
+
+import click
+import mercantile
+
+from cogeo_mosaic.utils import get_assets
+
+from cogeo_mosaic_tiler.mosaic import create_mosaic, filter_assets
+
+fixtures = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+
+@click.command()
+@click.option("--valid-footprint", is_flag=True, help="Use valid data footprints.")
+@click.option("--maxzoom", type=int, help="Max zoom (default: mosaic maxzoom + 2).")
+def main(valid_footprint, maxzoom):
+    """Count asset reads per zoom level with and without footprint filtering."""
+    assets = [os.path.join(fixtures, "cog1.tif"), os.path.join(fixtures, "cog2.tif")]
+    mosaic_def = create_mosaic(assets, valid_footprint=valid_footprint)
+    maxzoom = maxzoom or mosaic_def["maxzoom"] + 2
+
+    click.echo("zoom  tiles  reads  filtered  saved")
+    for zoom in range(mosaic_def["minzoom"], maxzoom + 1):
+        tiles = list(mercantile.tiles(*mosaic_def["bounds"], zooms=zoom))
+        reads = filtered = 0
+        for tile in tiles:
+            candidates = get_assets(mosaic_def, *tile)
+            reads += len(candidates)
+            filtered += len(
+                filter_assets(mosaic_def, candidates, mercantile.bounds(tile))
+            )
+        saved = (reads - filtered) / reads * 100 if reads else 0
+        click.echo(
+            f"{zoom:>4}  {len(tiles):>5}  {reads:>5}  {filtered:>8}  {saved:4.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Time mosaic creation stages on synthetic datasets footprints."""
+
+import time
+
+import click
+import numpy
+import pygeos
+import mercantile
+from mock import patch
+from supermercado import burntiles
+
+from cogeo_mosaic.utils import _filter_and_sort
+
+from cogeo_mosaic_tiler import mosaic
+
+
+def _features(count, seed=0):
+    """Random 0.1-0.5 degree boxes over a 20x10 degree area."""
+    rng = numpy.random.RandomState(seed)
+    west = rng.uniform(-80, -60, count)
+    south = rng.uniform(35, 45, count)
+    east = west + rng.uniform(0.1, 0.5, count)
+    north = south + rng.uniform(0.1, 0.5, count)
+    return [
+        {
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[w, n], [w, s], [e, s], [e, n], [w, n]]],
+            },
+            "properties": {
+                "path": f"s3://bucket/{idx}.tif",
+                "bounds": [w, s, e, n],
+                "minzoom": 7,
+                "maxzoom": 12,
+                "datatype": "uint16",
+            },
+        }
+        for idx, (w, s, e, n) in enumerate(zip(west, south, east, north))
+    ]
+
+
+def _per_tile(results, zoom, tile_cover_sort):
+    """Previous implementation: one intersection test per quadkey."""
+    geoms = pygeos.polygons([feat["geometry"]["coordinates"][0] for feat in results])
+    dataset = [
+        {"path": f["properties"]["path"], "geometry": geom}
+        for (f, geom) in zip(results, geoms)
+    ]
+    tiles = {}
+    for tile in burntiles.burn(results, zoom):
+        parent = mercantile.Tile(*tile.tolist())
+        tile_geometry = pygeos.polygons(
+            mercantile.feature(parent)["geometry"]["coordinates"][0]
+        )
+        fdataset = [
+            dataset[idx]
+            for idx in numpy.nonzero(pygeos.intersects(tile_geometry, geoms))[0]
+        ]
+        if tile_cover_sort:
+            fdataset = _filter_and_sort(tile_geometry, fdataset, sort_cover=True)
+        if fdataset:
+            tiles[mercantile.quadkey(parent)] = [f["path"] for f in fdataset]
+    return tiles
+
+
+@click.command()
+@click.option("--count", "counts", type=int, multiple=True)
+@click.option("--zoom", type=int, default=10, help="Quadkey zoom.")
+@click.option("--tile-cover-sort", is_flag=True, help="Sort datasets by coverage.")
+@click.option("--processes", type=int, default=4, help="Quadkeys stage processes.")
+@click.option("--latency", type=float, default=10, help="Header read latency (ms).")
+@click.option("--reads", type=int, default=500, help="Datasets for footprints stage.")
+def main(counts, zoom, tile_cover_sort, processes, latency, reads):
+    """Report footprints (simulated reads) and quadkeys stage timings."""
+    counts = counts or [1000, 5000, 10000, 50000]
+
+    features = {feat["properties"]["path"]: feat for feat in _features(reads)}
+
+    def _read(src_path, valid_footprint=False):
+        time.sleep(latency / 1000)
+        return features[src_path]
+
+    click.echo(f"footprints: {reads} datasets, {latency}ms per header read")
+    with patch.object(mosaic, "_get_footprint", _read):
+        for threads in [1, 20, 64]:
+            if threads == 1 and reads * latency > 20000:
+                continue
+            t0 = time.perf_counter()
+            mosaic.get_footprints(list(features), max_threads=threads)
+            click.echo(f"  threads={threads:<3} {time.perf_counter() - t0:7.2f}s")
+
+    click.echo(f"quadkeys (zoom {zoom}, tile_cover_sort={tile_cover_sort}):")
+    click.echo(f"  datasets  quadkeys  per-tile(s)  bulk(s)  {processes} processes(s)")
+    for count in counts:
+        results = _features(count)
+        t0 = time.perf_counter()
+        _per_tile(results, zoom, tile_cover_sort)
+        legacy = time.perf_counter() - t0
+
+        timings = {}
+        mosaic_def = mosaic.create_mosaic_from_features(
+            results, minzoom=zoom, tile_cover_sort=tile_cover_sort, timings=timings
+        )
+        single = timings["quadkeys"]
+        mosaic.create_mosaic_from_features(
+            results,
+            minzoom=zoom,
+            tile_cover_sort=tile_cover_sort,
+            max_processes=processes,
+            timings=timings,
+        )
+        click.echo(
+            f"  {count:>8}  {len(mosaic_def['tiles']):>8}  {legacy:11.2f}"
+            f"  {single:7.2f}  {timings['quadkeys']:14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compare streaming and stacked pixel selection methods on synthetic tiles."""
+
+import time
+import tracemalloc
+
+import click
+import numpy
+
+from rio_tiler_mosaic.methods import defaults
+
+from cogeo_mosaic_tiler import custom_methods
+
+METHODS = {
+    "median": (defaults.MedianMethod, custom_methods.StreamingMedianMethod),
+    "stdev": (defaults.StdevMethod, custom_methods.StreamingStdevMethod),
+}
+
+
+def _tiles(count, size, bands=3, seed=0):
+    """Yield masked uint16 tiles, created lazily like mosaic_tiler reads."""
+    rng = numpy.random.RandomState(seed)
+    for _ in range(count):
+        data = rng.normal(1000, 200, size=(bands, size, size)).astype(numpy.uint16)
+        mask = numpy.repeat((rng.rand(size, size) < 0.2)[None], bands, axis=0)
+        yield numpy.ma.array(data, mask=mask)
+
+
+def _run(method_class, count, size):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    method = method_class()
+    for tile in _tiles(count, size):
+        method.feed(tile)
+    data, mask = method.data
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, mask, elapsed, peak
+
+
+@click.command()
+@click.option("--count", "counts", type=int, multiple=True, default=[10, 50, 200])
+@click.option("--size", type=int, default=256, help="Tile size.")
+def main(counts, size):
+    """Report time, peak memory and error of streaming methods."""
+    click.echo("method  assets  exact(s)  exact(MB)  stream(s)  stream(MB)  error")
+    for name, (exact_class, stream_class) in METHODS.items():
+        for count in counts:
+            data, mask, exact_time, exact_peak = _run(exact_class, count, size)
+            sdata, _, stream_time, stream_peak = _run(stream_class, count, size)
+            valid = mask > 0
+            error = numpy.abs(data[:, valid].astype("float64") - sdata[:, valid]).mean()
+            click.echo(
+                f"{name:>6}  {count:>6}  {exact_time:8.2f}  {exact_peak / 1e6:9.1f}"
+                f"  {stream_time:9.2f}  {stream_peak / 1e6:10.1f}  {error:5.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
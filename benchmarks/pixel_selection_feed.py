@@ -0,0 +1,59 @@
+"""Micro-benchmark per asset `feed` cost of the tiler pixel selection methods."""
+
+import time
+import tracemalloc
+
+import click
+import numpy
+
+from cogeo_mosaic_tiler.handlers.app import PIXSEL_METHODS
+
+
+def _tiles(count, size, bands=3, seed=0):
+    rng = numpy.random.RandomState(seed)
+    tiles = []
+    for _ in range(count):
+        data = rng.normal(1000, 200, size=(bands, size, size)).astype(numpy.uint16)
+        # Sparse assets so methods exiting when filled see every tile
+        mask = numpy.repeat((rng.rand(size, size) < 0.9)[None], bands, axis=0)
+        tiles.append(numpy.ma.array(data, mask=mask))
+    return tiles
+
+
+def _feed(method_class, tiles):
+    method = method_class()
+    # First feed allocates the buffers
+    method.feed(tiles[0])
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for tile in tiles[1:]:
+        method.feed(tile)
+        if method.is_done:
+            break
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    method.data
+    return elapsed / (len(tiles) - 1), current, peak
+
+
+@click.command()
+@click.option("--count", type=int, default=20, help="Number of assets.")
+@click.option("--size", type=int, default=256, help="Tile size.")
+@click.option("--method", "methods", multiple=True, help="Methods (default: all).")
+def main(count, size, methods):
+    """Report mean time, retained and peak memory per asset feed."""
+    tiles = _tiles(count, size)
+    click.echo("method             feed(ms)  retained(MB)  peak(MB)")
+    for name in methods or PIXSEL_METHODS:
+        elapsed, current, peak = _feed(PIXSEL_METHODS[name], tiles)
+        click.echo(
+            f"{name:<17}  {elapsed * 1000:8.2f}  {current / 1e6:12.2f}"
+            f"  {peak / 1e6:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Replay a tile access log (or a synthetic pan/zoom trace) against the tiler."""
+
+import os
+import re
+import json
+import time
+import random
+import resource
+import tempfile
+import threading
+import urllib.request
+from collections import defaultdict
+from concurrent import futures
+from urllib.parse import urlsplit, parse_qsl
+
+import click
+import numpy
+import mercantile
+
+fixtures = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+# Request path in common/combined, ALB or CloudFront style log lines.
+_REQUEST = re.compile(r"(?:GET|HEAD|POST)\s+(?:https?://[^/\s]+)?(/\S*)")
+_MOSAICID = re.compile(r"(?<=/)[0-9A-Fa-f]{56}(?=/)")
+_TILE = re.compile(r"/\d+/\d+/\d+(?=[@./]|$)")
+
+
+def _read_log(path, mosaicid=None):
+    """Yield request paths (with query string) from an access log."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            match = _REQUEST.search(line)
+            if match:
+                request = match.group(1)
+            elif line.startswith("/"):
+                request = line.split()[0]
+            else:
+                continue
+
+            if mosaicid:
+                request = _MOSAICID.sub(mosaicid, request)
+            yield request
+
+
+def _synthetic(mosaic_def, mosaicid, count, tile_suffix, query, seed=0):
+    """Yield tile paths from a random pan/zoom walk with a 3x3 tiles viewport."""
+    rng = random.Random(seed)
+    minzoom, maxzoom = mosaic_def["minzoom"], mosaic_def["maxzoom"] + 2
+    lng, lat = mosaic_def["center"][:2]
+    zoom = minzoom
+    requests = 0
+    while requests < count:
+        center = mercantile.tile(lng, lat, zoom)
+        for dx in [-1, 0, 1]:
+            for dy in [-1, 0, 1]:
+                yield (
+                    f"/{mosaicid}/{zoom}/{center.x + dx}/{center.y + dy}"
+                    f"{tile_suffix}{query}"
+                )
+                requests += 1
+
+        action = rng.random()
+        if action < 0.2:
+            zoom = min(zoom + 1, maxzoom)
+        elif action < 0.35:
+            zoom = max(zoom - 1, minzoom)
+        else:
+            west, south, east, north = mercantile.bounds(center)
+            lng += rng.choice([-1, 0, 1]) * (east - west)
+            lat += rng.choice([-1, 0, 1]) * (north - south)
+            bounds = mosaic_def["bounds"]
+            lng = min(max(lng, bounds[0]), bounds[2])
+            lat = min(max(lat, bounds[1]), bounds[3])
+
+
+def _endpoint(request):
+    """Endpoint name (path without mosaic id and tile indexes)."""
+    path = urlsplit(request).path
+    path = _MOSAICID.sub("{mosaicid}", path)
+    return _TILE.sub("/{z}/{x}/{y}", path)
+
+
+def _rss():
+    """Current resident set size in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+class InProcessClient(object):
+    """Call the lambda-proxy application directly."""
+
+    def __init__(self):
+        """Import the application."""
+        from cogeo_mosaic_tiler.handlers.app import app
+        from cogeo_mosaic_tiler.server import get_metrics
+
+        self.app = app
+        self.get_metrics = get_metrics
+
+    def __call__(self, request):
+        """Return response status."""
+        url = urlsplit(request)
+        event = {
+            "path": url.path,
+            "httpMethod": "GET",
+            "headers": {"Accept-Encoding": "gzip"},
+            "queryStringParameters": dict(parse_qsl(url.query)),
+        }
+        return self.app(event, {})["statusCode"]
+
+    def metrics(self):
+        """Return process metrics."""
+        return self.get_metrics()
+
+
+class HTTPClient(object):
+    """Send requests to a running server (e.g `cogeo-mosaic-tiler serve`)."""
+
+    def __init__(self, endpoint):
+        """Initialize client."""
+        self.endpoint = endpoint.rstrip("/")
+
+    def __call__(self, request):
+        """Return response status."""
+        try:
+            with urllib.request.urlopen(self.endpoint + request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def metrics(self):
+        """Return server metrics (of the worker answering `/_metrics`)."""
+        try:
+            with urllib.request.urlopen(f"{self.endpoint}/_metrics") as response:
+                return json.loads(response.read())
+        except (urllib.error.URLError, ValueError):
+            return None
+
+
+def _fixture_mosaic(storage_dir):
+    """Store the fixtures mosaic in a local storage (S3 stand-in)."""
+    from cogeo_mosaic_tiler.mosaic import create_mosaic
+    from cogeo_mosaic_tiler.storage import FileStorage
+    from cogeo_mosaic_tiler.utils import get_hash
+
+    assets = [os.path.join(fixtures, "cog1.tif"), os.path.join(fixtures, "cog2.tif")]
+    mosaic_def = create_mosaic([os.path.abspath(a) for a in assets])
+    mosaicid = get_hash(body=assets)
+    FileStorage(storage_dir).write(mosaicid, mosaic_def)
+    return mosaicid, mosaic_def
+
+
+def _hit_rates(before, after):
+    if not before or not after or before.get("pid") != after.get("pid"):
+        return {}
+
+    rates = {}
+    for name, stats in after["caches"].items():
+        hits = stats["hits"] - before["caches"][name]["hits"]
+        misses = stats["misses"] - before["caches"][name]["misses"]
+        if hits + misses:
+            rates[name] = (hits / (hits + misses), hits + misses)
+    return rates
+
+
+@click.command()
+@click.argument("log", type=click.Path(exists=True, dir_okay=False), required=False)
+@click.option("--url", type=str, help="Server endpoint (default: in-process).")
+@click.option("--concurrency", "-c", type=int, default=8, help="Concurrent requests.")
+@click.option("--synthetic", type=int, default=500, help="Synthetic trace requests.")
+@click.option("--tile-suffix", type=str, default="@1x.png", help="Synthetic tiles.")
+@click.option("--query", type=str, default="", help="Synthetic tiles query string.")
+@click.option(
+    "--storage",
+    type=click.Path(file_okay=False),
+    help="Local mosaic storage directory (default: temporary directory).",
+)
+@click.option("--keep-mosaicid", is_flag=True, help="Do not replace log mosaic ids.")
+def main(log, url, concurrency, synthetic, tile_suffix, query, storage, keep_mosaicid):
+    """
+    Replay requests and report throughput, latency, cache hits and memory.
+
+    The fixtures mosaic is stored in a local directory standing in for the
+    mosaic bucket, and mosaic ids found in LOG are replaced by its id. With
+    --url, start the server with the same storage first, e.g
+    `MOSAIC_STORAGE=/tmp/mosaics cogeo-mosaic-tiler serve` and
+    `--storage /tmp/mosaics`.
+
+    """
+    storage = storage or tempfile.mkdtemp(prefix="cogeo-mosaic-replay-")
+    os.environ["MOSAIC_STORAGE"] = storage
+    mosaicid, mosaic_def = _fixture_mosaic(storage)
+
+    if log:
+        requests = list(_read_log(log, None if keep_mosaicid else mosaicid))
+    else:
+        query = f"?{query.lstrip('?')}" if query else ""
+        requests = list(_synthetic(mosaic_def, mosaicid, synthetic, tile_suffix, query))
+
+    client = HTTPClient(url) if url else InProcessClient()
+    results = defaultdict(list)
+    errors = defaultdict(int)
+    peak_rss = defaultdict(float)
+    lock = threading.Lock()
+
+    def _run(request):
+        t0 = time.perf_counter()
+        try:
+            status = client(request)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - t0
+        endpoint = _endpoint(request)
+        rss = _rss() if not url else 0
+        with lock:
+            results[endpoint].append(elapsed)
+            if status >= 400:
+                errors[endpoint] += 1
+            peak_rss[endpoint] = max(peak_rss[endpoint], rss)
+
+    before = client.metrics()
+    t0 = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_run, requests))
+    wall = time.perf_counter() - t0
+    after = client.metrics()
+
+    click.echo(
+        f"{len(requests)} requests in {wall:.2f}s ({len(requests) / wall:.1f} req/s)"
+        f", concurrency {concurrency}, {'in-process' if not url else url}"
+    )
+    header = "endpoint                                  requests  errors    p50(ms)"
+    header += "    p90(ms)    p99(ms)    max(ms)"
+    click.echo(header + ("" if url else "  rss(MB)"))
+    for endpoint, latencies in sorted(results.items()):
+        p50, p90, p99 = numpy.percentile(latencies, [50, 90, 99]) * 1000
+        line = (
+            f"{endpoint[:40]:<40}  {len(latencies):>8}  {errors[endpoint]:>6}"
+            f"  {p50:9.1f}  {p90:9.1f}  {p99:9.1f}  {max(latencies) * 1000:9.1f}"
+        )
+        click.echo(line + ("" if url else f"  {peak_rss[endpoint]:7.1f}"))
+
+    rates = _hit_rates(before, after)
+    if rates:
+        click.echo("cache         hit rate  lookups")
+        for name, (rate, lookups) in rates.items():
+            click.echo(f"{name:<12}  {rate * 100:7.1f}%  {lookups:>7}")
+    if after:
+        click.echo(f"peak RSS: {after['maxrss'] / 1e3:.1f} MB (pid {after['pid']})")
+
+
+if __name__ == "__main__":
+    main()
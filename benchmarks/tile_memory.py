@@ -0,0 +1,56 @@
+"""Compare estimated and measured tile working sets of pixel selection methods."""
+
+import tracemalloc
+
+import click
+import numpy
+
+from rio_tiler_mosaic.mosaic import mosaic_tiler
+
+from cogeo_mosaic_tiler.handlers.app import PIXSEL_METHODS
+from cogeo_mosaic_tiler.memory import estimate_tile_memory
+
+
+@click.command()
+@click.option("--count", "counts", type=int, multiple=True, default=[1, 5, 20, 40])
+@click.option("--bands", type=int, default=3, help="Number of bands.")
+@click.option("--dtype", type=str, default="uint16", help="Data type.")
+@click.option("--size", type=int, default=256, help="Tile size.")
+@click.option("--chunk-size", type=int, default=5, help="Concurrent reads.")
+@click.option("--method", "methods", multiple=True, help="Methods (default: all).")
+def main(counts, bands, dtype, size, chunk_size, methods):
+    """Report tracemalloc peak and estimated memory (MB) of `mosaic_tiler`."""
+    rng = numpy.random.RandomState(0)
+    data = [(rng.rand(bands, size, size) * 1000).astype(dtype) for _ in range(4)]
+    masks = [
+        numpy.where(rng.rand(size, size) < 0.3, 0, 255).astype("uint8")
+        for _ in range(4)
+    ]
+
+    def _tiler(asset, tile_x, tile_y, tile_z, **kwargs):
+        # Copies, like the arrays allocated by each read
+        return data[asset % 4].copy(), masks[asset % 4].copy()
+
+    click.echo("method            assets  measured(MB)  estimated(MB)")
+    for name in methods or PIXSEL_METHODS:
+        for count in counts:
+            tracemalloc.start()
+            mosaic_tiler(
+                list(range(count)),
+                0,
+                0,
+                0,
+                _tiler,
+                pixel_selection=PIXSEL_METHODS[name](),
+                chunk_size=chunk_size,
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            estimate = estimate_tile_memory(name, count, bands, dtype, size, chunk_size)
+            click.echo(
+                f"{name:<16}  {count:>6}  {peak / 1e6:12.1f}  {estimate / 1e6:13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
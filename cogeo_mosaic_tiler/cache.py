@@ -0,0 +1,434 @@
+"""cogeo_mosaic_tiler.cache: in-memory and process-shared caches."""
+
+from typing import Any, Callable, Dict, Hashable
+
+import os
+import time
+import uuid
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe in-memory LRU cache.
+
+    Attributes
+    ----------
+    maxsize : int, optional (default: 512)
+        Maximum number of items to keep (0 disables the cache).
+    ttl : float, optional
+        Items time-to-live in seconds (default: no expiration).
+
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = None):
+        """Initialize cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value or default."""
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            if expires and expires < time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """Add value to the cache (expiring after `ttl` seconds, or cache ttl)."""
+        if not self.maxsize:
+            return
+
+        ttl = ttl or self.ttl
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """Remove value from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove all values."""
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check if key is in the cache (without updating stats)."""
+        with self._lock:
+            if key not in self._data:
+                return False
+            expires, _ = self._data[key]
+            return not expires or expires >= time.time()
+
+    def __len__(self) -> int:
+        """Return number of cached items."""
+        return len(self._data)
+
+    @property
+    def stats(self) -> Dict:
+        """Return cache statistics."""
+        return dict(
+            type="memory",
+            items=len(self._data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+class SharedCache(object):
+    """
+    Cache shared between processes.
+
+    Values are pickled to one file per key in a directory, which should live on
+    a memory backed filesystem (e.g `/dev/shm`) so that pre-forked workers share
+    a single copy of the cached data.
+
+    Attributes
+    ----------
+    path : str, required
+        Cache directory.
+    max_bytes : int, optional (default: 512MB)
+        Approximate maximum size of the cache directory.
+    ttl : float, optional
+        Items time-to-live in seconds (default: no expiration).
+
+    """
+
+    # Check the cache size every N writes.
+    _evict_interval = 64
+
+    def __init__(self, path: str, max_bytes: int = 536870912, ttl: float = None):
+        """Initialize cache."""
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+    def _key_path(self, key: Hashable) -> str:
+        name = hashlib.sha224(repr(key).encode()).hexdigest()
+        return os.path.join(self.path, name)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return cached value or default."""
+        path = self._key_path(key)
+        try:
+            with open(path, "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return default
+
+        if expires and expires < time.time():
+            self.delete(key)
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None) -> None:
+        """Add value to the cache (expiring after `ttl` seconds, or cache ttl)."""
+        if not self.max_bytes:
+            return
+
+        ttl = ttl or self.ttl
+        expires = time.time() + ttl if ttl else None
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump((expires, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Atomic on POSIX, readers never see partially written values.
+            os.replace(tmp_path, self._key_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._writes += 1
+        if self._writes % self._evict_interval == 0:
+            self.evict()
+
+    def delete(self, key: Hashable) -> None:
+        """Remove value from the cache."""
+        try:
+            os.remove(self._key_path(key))
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """Remove all values."""
+        for entry in os.scandir(self.path):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def evict(self) -> None:
+        """Remove oldest values until the cache fits in `max_bytes`."""
+        entries = []
+        for entry in os.scandir(self.path):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+
+        total = sum(e[1] for e in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check if key is in the cache (ignoring expiration)."""
+        return os.path.exists(self._key_path(key))
+
+    def __len__(self) -> int:
+        """Return number of cached items."""
+        return len([e for e in os.scandir(self.path) if not e.name.startswith(".")])
+
+    @property
+    def stats(self) -> Dict:
+        """Return cache statistics (hits and misses are per process)."""
+        return dict(
+            type="shared",
+            path=self.path,
+            items=len(self),
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+def get_cache(namespace: str, maxsize: int = 0, ttl: float = None):
+    """
+    Create a cache.
+
+    When the `CACHE_DIR` environment variable is set (e.g by the pre-fork
+    server), return a cache shared between processes stored in
+    `$CACHE_DIR/{namespace}`, otherwise return an in-memory LRU cache.
+
+    Attributes
+    ----------
+    namespace : str, required
+        Cache name.
+    maxsize : int, optional (default: 0)
+        In-memory cache maximum number of items.
+    ttl : float, optional
+        Items time-to-live in seconds.
+
+    Returns
+    -------
+    cache : LRUCache or SharedCache
+
+    """
+    cache_dir = os.environ.get("CACHE_DIR")
+    if cache_dir:
+        max_bytes = int(os.environ.get("CACHE_MAX_BYTES", 536870912))
+        return SharedCache(
+            os.path.join(cache_dir, namespace), max_bytes=max_bytes, ttl=ttl
+        )
+
+    return LRUCache(maxsize=maxsize, ttl=ttl)
+
+
+class EmptyTileCache(object):
+    """
+    Negative cache recording empty mercator tiles.
+
+    Tiles are stored as bitsets of 64x64 tiles blocks per mosaic and zoom level
+    (512 bytes per block), kept in an in-memory LRU and optionally written to a
+    persistent or shared `store` (e.g `SharedCache`).
+
+    Blocks are keyed by a mosaic revision, kept in the same store, which is
+    changed by `invalidate` so processes sharing the store (or restarted) stop
+    using the tiles recorded before a mosaic is overwritten.
+
+    Attributes
+    ----------
+    maxsize : int, optional (default: 16384)
+        Maximum number of blocks kept in memory.
+    store : LRUCache or SharedCache, optional
+        Persistent store.
+
+    """
+
+    block_size = 64
+
+    def __init__(self, maxsize: int = 16384, store=None):
+        """Initialize cache."""
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._blocks = LRUCache(maxsize=maxsize)
+        self._revisions = store if store is not None else LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def _get_block(self, key: Hashable) -> Any:
+        block = self._blocks.get(key)
+        if block is None and self.store is not None:
+            block = self.store.get(key)
+            if block is not None:
+                block = (block[0], bytearray(block[1]))
+                self._blocks.set(key, block)
+
+        if block is not None and block[0] and block[0] < time.time():
+            self._blocks.delete(key)
+            return None
+
+        return block
+
+    def _index(self, mosaic: str, z: int, x: int, y: int):
+        revision = self._revisions.get(("revision", mosaic), "")
+        key = (mosaic, revision, z, x // self.block_size, y // self.block_size)
+        bit = (y % self.block_size) * self.block_size + (x % self.block_size)
+        return key, bit
+
+    def add(self, mosaic: str, z: int, x: int, y: int, ttl: float = None) -> None:
+        """
+        Record an empty tile.
+
+        Attributes
+        ----------
+        mosaic : str, required
+            Mosaic identifier.
+        z, x, y : int, required
+            Mercator tile.
+        ttl : float, optional
+            Time-to-live of the tile block (default: no expiration).
+
+        """
+        key, bit = self._index(mosaic, z, x, y)
+        with self._lock:
+            block = self._get_block(key)
+            if block is None:
+                expires = time.time() + ttl if ttl else None
+                block = (expires, bytearray(self.block_size ** 2 // 8))
+
+            block[1][bit >> 3] |= 1 << (bit & 7)
+            self._blocks.set(key, block)
+            if self.store is not None:
+                self.store.set(key, (block[0], bytes(block[1])))
+
+    def contains(self, mosaic: str, z: int, x: int, y: int) -> bool:
+        """Check if a tile is known to be empty."""
+        key, bit = self._index(mosaic, z, x, y)
+        block = self._get_block(key)
+        if block is not None and block[1][bit >> 3] & (1 << (bit & 7)):
+            self.hits += 1
+            return True
+
+        self.misses += 1
+        return False
+
+    def invalidate(self, mosaic: str) -> None:
+        """Stop using the tiles recorded for a mosaic (e.g once overwritten)."""
+        self._revisions.set(("revision", mosaic), uuid.uuid4().hex)
+
+    def clear(self) -> None:
+        """Remove all in-memory blocks."""
+        self._blocks.clear()
+
+    @property
+    def stats(self) -> Dict:
+        """Return cache statistics."""
+        return dict(
+            type="empty_tiles",
+            blocks=len(self._blocks),
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+
+class _Flight(object):
+    """In-flight call."""
+
+    def __init__(self):
+        """Initialize call."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce concurrent calls sharing the same key.
+
+    The first caller for a key runs the function, callers arriving while it is
+    running wait for it and share its result (or exception).
+
+    """
+
+    def __init__(self):
+        """Initialize."""
+        self.calls = 0
+        self.coalesced = 0
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Any:
+        """Call `func(*args, **kwargs)` unless a call for `key` is in flight."""
+        with self._lock:
+            self.calls += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func(*args, **kwargs)
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+        return flight.result
+
+    @property
+    def stats(self) -> Dict:
+        """Return coalescing statistics."""
+        return dict(
+            calls=self.calls, coalesced=self.coalesced, in_flight=len(self._flights)
+        )
@@ -4,21 +4,342 @@ import numpy
 from rio_tiler_mosaic.methods.base import MosaicMethodBase
 
 
-class bidx_stddev(MosaicMethodBase):
+class InPlaceMethodBase(MosaicMethodBase):
+    """
+    Base class for methods filling a preallocated output tile in place.
+
+    Buffers are allocated on the first `feed` call (from the first tile shape)
+    and reused for every following asset, so feeding a tile does not allocate
+    new arrays. Pixels are considered valid when the first band is not masked
+    (`mosaic_tiler` masks all bands together).
+
+    Attributes
+    ----------
+    dtype : str or numpy.dtype, optional
+        Output data type (default: input tile data type).
+
+    """
+
+    def __init__(self, dtype=None):
+        """Overwrite base and init in place method."""
+        super(InPlaceMethodBase, self).__init__()
+        self.dtype = dtype
+        self._filled = None
+        self._valid = None
+        self._todo = None
+        self._missing = None
+
+    def _allocate(self, tile):
+        """Allocate output and scratch buffers."""
+        self.tile = numpy.zeros(tile.shape, dtype=self.dtype or tile.dtype)
+        self._filled = numpy.zeros(tile.shape[1:], dtype=bool)
+        self._valid = numpy.empty(tile.shape[1:], dtype=bool)
+        self._todo = numpy.empty(tile.shape[1:], dtype=bool)
+        self._missing = self._filled.size
+
+    @property
+    def is_done(self):
+        """Check if the tile filling is done."""
+        if self._missing is None:
+            return False
+
+        return self.exit_when_filled and self._missing == 0
+
+    @property
+    def data(self):
+        """Return data and mask."""
+        if self.tile is None:
+            return None, None
+
+        return self.tile, self._filled * 255
+
+    def _update_masks(self, tile):
+        """Set `_valid` (valid input pixels) and `_todo` (valid and not filled)."""
+        if self.tile is None:
+            self._allocate(tile)
+
+        mask = numpy.ma.getmask(tile)
+        if mask is numpy.ma.nomask:
+            self._valid.fill(True)
+        else:
+            numpy.logical_not(mask[0], out=self._valid)
+
+        numpy.logical_not(self._filled, out=self._todo)
+        numpy.logical_and(self._todo, self._valid, out=self._todo)
+
+
+class bidx_stddev(InPlaceMethodBase):
     """Return bands stddev."""
 
     def __init__(self):
         """Overwrite base and init bands stddev method."""
-        super(bidx_stddev, self).__init__()
+        super(bidx_stddev, self).__init__(dtype=numpy.float64)
         self.exit_when_filled = True
 
+    def _allocate(self, tile):
+        super(bidx_stddev, self)._allocate(tile[:1])
+        self._mean = numpy.empty(tile.shape[1:], dtype=numpy.float64)
+        self._diff = numpy.empty(tile.shape[1:], dtype=numpy.float64)
+
     def feed(self, tile):
-        """Add data to tile."""
-        tile = numpy.ma.std(tile, axis=0, keepdims=True)
-        if self.tile is None:
-            self.tile = tile
+        """Add bands stddev of pixels not filled yet."""
+        self._update_masks(tile)
+        todo = self._todo
+        if not todo.any():
+            return
+
+        values = tile.data
+        mean, diff, out = self._mean, self._diff, self.tile[0]
+
+        numpy.mean(values, axis=0, out=mean)
+        numpy.copyto(out, 0, where=todo)
+        for band in values:
+            numpy.subtract(band, mean, out=diff, where=todo)
+            numpy.multiply(diff, diff, out=diff, where=todo)
+            numpy.add(out, diff, out=out, where=todo)
+        numpy.divide(out, len(values), out=out, where=todo)
+        numpy.sqrt(out, out=out, where=todo)
+
+        numpy.logical_or(self._filled, todo, out=self._filled)
+        self._missing -= int(numpy.count_nonzero(todo))
+
+
+class StreamingMeanMethod(MosaicMethodBase):
+    """
+    Return the pixels mean, computed from running sums.
+
+    Same output as `MeanMethod` but only keeps the sums and counts, so memory
+    does not depend on the number of assets.
+
+    Attributes
+    ----------
+    enforce_data_type : bool, optional (default: True)
+        Cast the output to the input data type.
+
+    """
+
+    def __init__(self, enforce_data_type=True):
+        """Overwrite base and init streaming Mean method."""
+        super(StreamingMeanMethod, self).__init__()
+        self.enforce_data_type = enforce_data_type
+        self.count = None
+        self.sum = None
+        self.dtype = None
+
+    @property
+    def data(self):
+        """Return data and mask."""
+        if self.count is None:
+            return None, None
+
+        tile = numpy.zeros(self.sum.shape, dtype=numpy.float64)
+        numpy.divide(self.sum, self.count, out=tile, where=self.count > 0)
+        if self.enforce_data_type:
+            tile = tile.astype(self.dtype)
+
+        mask = self.count[0] == 0
+        return tile, ~mask * 255
+
+    def feed(self, tile):
+        """Update running sums."""
+        if self.count is None:
+            self.count = numpy.zeros(tile.shape, dtype=numpy.uint32)
+            self.sum = numpy.zeros(tile.shape, dtype=numpy.float64)
+            self.dtype = tile.dtype
+            self._valid = numpy.empty(tile.shape, dtype=bool)
+
+        valid = numpy.logical_not(numpy.ma.getmaskarray(tile), out=self._valid)
+        numpy.add(self.count, 1, out=self.count, where=valid)
+        numpy.add(self.sum, tile.data, out=self.sum, where=valid)
+
+
+class StreamingStdevMethod(MosaicMethodBase):
+    """
+    Return the pixels standard deviation, computed with Welford's algorithm.
+
+    Same output as `StdevMethod` but only keeps running counts, means and sums
+    of squared differences, so memory does not depend on the number of assets.
+
+    """
+
+    def __init__(self):
+        """Overwrite base and init streaming Stdev method."""
+        super(StreamingStdevMethod, self).__init__()
+        self.count = None
+        self.mean = None
+        self.m2 = None
+
+    @property
+    def data(self):
+        """Return data and mask."""
+        if self.count is None:
+            return None, None
+
+        variance = numpy.zeros(self.m2.shape, dtype=numpy.float64)
+        numpy.divide(self.m2, self.count, out=variance, where=self.count > 0)
+        mask = self.count[0] == 0
+        return numpy.sqrt(variance), ~mask * 255
+
+    def feed(self, tile):
+        """Update running statistics."""
+        if self.count is None:
+            self.count = numpy.zeros(tile.shape, dtype=numpy.uint32)
+            self.mean = numpy.zeros(tile.shape, dtype=numpy.float64)
+            self.m2 = numpy.zeros(tile.shape, dtype=numpy.float64)
+            self._delta = numpy.empty(tile.shape, dtype=numpy.float64)
+            self._delta2 = numpy.empty(tile.shape, dtype=numpy.float64)
+            self._valid = numpy.empty(tile.shape, dtype=bool)
+
+        valid = numpy.logical_not(numpy.ma.getmaskarray(tile), out=self._valid)
+        values = tile.data
+        delta, delta2 = self._delta, self._delta2
+
+        numpy.add(self.count, 1, out=self.count, where=valid)
+        numpy.subtract(values, self.mean, out=delta, where=valid)
+        # mean += delta / count
+        numpy.divide(delta, self.count, out=delta2, where=valid)
+        numpy.add(self.mean, delta2, out=self.mean, where=valid)
+        # m2 += (x - old_mean) * (x - new_mean)
+        numpy.subtract(values, self.mean, out=delta2, where=valid)
+        numpy.multiply(delta, delta2, out=delta, where=valid)
+        numpy.add(self.m2, delta, out=self.m2, where=valid)
+
+
+class StreamingPercentileMethod(MosaicMethodBase):
+    """
+    Return an approximation of the pixels percentile, with the P² algorithm.
+
+    Each pixel keeps 5 markers (heights and positions) updated with every new
+    value (Jain & Chlamtac, 1985), so memory does not depend on the number of
+    assets. Pixels with less than 5 values return the exact percentile.
+
+    Attributes
+    ----------
+    percentile : float, optional (default: 50)
+        Percentile to compute (0-100).
+    enforce_data_type : bool, optional (default: True)
+        Cast the output to the input data type.
+
+    """
+
+    def __init__(self, percentile=50, enforce_data_type=True):
+        """Overwrite base and init streaming Percentile method."""
+        super(StreamingPercentileMethod, self).__init__()
+        self.percentile = percentile
+        self.enforce_data_type = enforce_data_type
+        p = percentile / 100
+        self._increments = numpy.array([0, p / 2, p, (1 + p) / 2, 1])[:, None]
+        self.count = None
+        self.heights = None
+        self.positions = None
+        self.dtype = None
+
+    @property
+    def data(self):
+        """Return data and mask."""
+        if self.count is None:
+            return None, None
+
+        tile = self.heights[2].copy()
+        for count in range(1, 5):
+            idx = self.count == count
+            if idx.any():
+                tile[idx] = numpy.percentile(
+                    self.heights[:count, idx], self.percentile, axis=0
+                )
+
+        if self.enforce_data_type:
+            tile = tile.astype(self.dtype)
+
+        mask = self.count[0] == 0
+        return tile, ~mask * 255
+
+    def feed(self, tile):
+        """Update pixels markers."""
+        if self.count is None:
+            self.count = numpy.zeros(tile.shape, dtype=numpy.uint32)
+            self.heights = numpy.zeros((5,) + tile.shape, dtype=numpy.float64)
+            self.positions = numpy.zeros((5,) + tile.shape, dtype=numpy.float32)
+            self.dtype = tile.dtype
+
+        valid = ~numpy.ma.getmaskarray(tile)
+        values = tile.data
+
+        # Markers update for pixels which already have 5 values
+        update = valid & (self.count >= 5)
+
+        # Store the first 5 values of each pixel
+        init = valid & (self.count < 5)
+        if init.any():
+            for slot in range(5):
+                idx = init & (self.count == slot)
+                self.heights[slot][idx] = values[idx]
+            self.count[init] += 1
+
+            full = init & (self.count == 5)
+            if full.any():
+                self.heights[:, full] = numpy.sort(self.heights[:, full], axis=0)
+                self.positions[:, full] = numpy.arange(1, 6)[:, None]
+
+        # Flat integer indices gather/scatter faster than boolean masks
+        idx = numpy.flatnonzero(update)
+        if idx.size:
+            self._update(idx, values.reshape(-1).take(idx))
+
+    def _update(self, idx, x):
+        heights = self.heights.reshape(5, -1)
+        positions = self.positions.reshape(5, -1)
+        count = self.count.reshape(-1)
+        q = heights.take(idx, axis=1)
+        n = positions.take(idx, axis=1).astype(numpy.float64)
+
+        # Extreme markers and cell of the new value
+        q[0] = numpy.minimum(q[0], x)
+        q[4] = numpy.maximum(q[4], x)
+        cell = (x >= q[1]).astype(numpy.int8) + (x >= q[2]) + (x >= q[3])
+        for i in range(1, 5):
+            n[i] += cell < i
+
+        count[idx] += 1
+        desired = 1 + (count.take(idx) - 1) * self._increments
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            for i in range(1, 4):
+                d = desired[i] - n[i]
+                move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | (
+                    (d <= -1) & (n[i - 1] - n[i] < -1)
+                )
+                if not move.any():
+                    continue
+
+                ds = numpy.sign(d)
+                # Piecewise parabolic prediction
+                qp = q[i] + ds / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + ds) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - ds) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                # Linear prediction when the parabolic one is out of order
+                qn = numpy.where(ds > 0, q[i + 1], q[i - 1])
+                nn = numpy.where(ds > 0, n[i + 1], n[i - 1])
+                ql = q[i] + ds * (qn - q[i]) / (nn - n[i])
+
+                parabolic = (q[i - 1] < qp) & (qp < q[i + 1])
+                q[i] = numpy.where(move, numpy.where(parabolic, qp, ql), q[i])
+                n[i] = numpy.where(move, n[i] + ds, n[i])
+
+        heights[:, idx] = q
+        positions[:, idx] = n
+
+
+class StreamingMedianMethod(StreamingPercentileMethod):
+    """Return an approximation of the pixels median (see StreamingPercentileMethod)."""
+
+    def __init__(self, enforce_data_type=True):
+        """Overwrite base and init streaming Median method."""
+        super(StreamingMedianMethod, self).__init__(
+            percentile=50, enforce_data_type=enforce_data_type
+        )
+
 
-        pidex = self.tile.mask & ~tile.mask
-        mask = numpy.where(pidex, tile.mask, self.tile.mask)
-        self.tile = numpy.ma.where(pidex, tile, self.tile)
-        self.tile.mask = mask
+# Percentiles available as `streaming_p{percentile}` pixel selection methods.
+STREAMING_PERCENTILES = (10, 25, 75, 90)
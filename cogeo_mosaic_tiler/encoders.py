@@ -0,0 +1,163 @@
+"""cogeo_mosaic_tiler.encoders: image encoders and compression profiles."""
+
+from typing import Dict
+
+import io
+
+import numpy
+
+from rio_tiler.utils import array_to_image, _apply_discrete_colormap
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: nocover
+    Image = None
+
+
+# Compression level / quality profiles, as GDAL creation options.
+PROFILES = {
+    "speed": {
+        "png": {"zlevel": 1},
+        "jpeg": {"quality": 75},
+        "webp": {"quality": 75, "lossless": False},
+    },
+    "balanced": {
+        "png": {"zlevel": 6},
+        "jpeg": {"quality": 85},
+        "webp": {"quality": 75, "lossless": False},
+    },
+    "size": {
+        "png": {"zlevel": 9},
+        "jpeg": {"quality": 70},
+        "webp": {"quality": 60, "lossless": False},
+    },
+}
+
+
+def _apply_colormap(arr: numpy.ndarray, color_map) -> numpy.ndarray:
+    """Apply rio-tiler colormap (same as `rio_tiler.utils.array_to_image`)."""
+    if isinstance(color_map, dict):
+        return _apply_discrete_colormap(arr, color_map)
+    return numpy.transpose(color_map[arr][0], [2, 0, 1]).astype(numpy.uint8)
+
+
+class GDALEncoder(object):
+    """Encode images with GDAL in-memory datasets (any GDAL driver)."""
+
+    def supports(self, arr: numpy.ndarray, img_format: str) -> bool:
+        """Check if the encoder can write the array to the format."""
+        return True
+
+    def encode(
+        self, arr: numpy.ndarray, mask: numpy.ndarray, img_format: str, **options
+    ) -> bytes:
+        """Encode image."""
+        return array_to_image(arr, mask, img_format=img_format, **options)
+
+
+class PillowEncoder(object):
+    """
+    Encode 8 bit PNG, JPEG and WEBP images directly with Pillow.
+
+    Skips the GDAL dataset creation and band interleaving, which dominate the
+    encoding time of small tiles.
+
+    """
+
+    formats = {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}
+
+    def supports(self, arr: numpy.ndarray, img_format: str) -> bool:
+        """Check if the encoder can write the array to the format."""
+        return (
+            Image is not None
+            and img_format in self.formats
+            and arr.dtype == numpy.uint8
+            and arr.shape[0] in [1, 3]
+        )
+
+    def encode(
+        self, arr: numpy.ndarray, mask: numpy.ndarray, img_format: str, **options
+    ) -> bytes:
+        """Encode image."""
+        # WEBP doesn't support 1 band images
+        if img_format == "webp" and arr.shape[0] == 1:
+            arr = numpy.repeat(arr, 3, axis=0)
+
+        bands = list(arr)
+        if mask is not None and img_format != "jpeg":
+            bands.append(mask.astype(numpy.uint8))
+
+        mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[len(bands)]
+        data = bands[0] if len(bands) == 1 else numpy.dstack(bands)
+        img = Image.fromarray(data, mode=mode)
+
+        params: Dict = {}
+        if img_format == "png":
+            params["compress_level"] = int(options.get("zlevel", 6))
+        elif img_format == "jpeg":
+            params["quality"] = int(options.get("quality", 85))
+        elif img_format == "webp":
+            params["quality"] = int(options.get("quality", 75))
+            params["lossless"] = str(options.get("lossless", False)).lower() in [
+                "true",
+                "yes",
+                "1",
+            ]
+
+        buf = io.BytesIO()
+        img.save(buf, format=self.formats[img_format], **params)
+        return buf.getvalue()
+
+
+ENCODERS = {"gdal": GDALEncoder(), "pillow": PillowEncoder()}
+
+
+def encode(
+    arr: numpy.ndarray,
+    mask: numpy.ndarray,
+    img_format: str = "png",
+    color_map=None,
+    encoder: str = "gdal",
+    profile: str = "balanced",
+    **options,
+) -> bytes:
+    """
+    Encode an image array.
+
+    Attributes
+    ----------
+    arr : numpy.ndarray, required
+        Image array (bands, height, width).
+    mask : numpy.ndarray, required
+        Mask array, used as alpha band (except for JPEG).
+    img_format : str, optional (default: "png")
+        GDAL driver name (e.g "png", "jpeg", "webp", "GTiff").
+    color_map : numpy.ndarray or dict, optional
+        rio-tiler colormap.
+    encoder : str, optional (default: "gdal")
+        Encoder name in `ENCODERS`. Arrays or formats not supported by the
+        encoder are encoded with GDAL.
+    profile : str, optional (default: "balanced")
+        Compression profile name in `PROFILES`.
+    options : dict, optional
+        Additional creation options (override profile options).
+
+    Returns
+    -------
+    content : bytes
+
+    """
+    img_format = img_format.lower()
+    options = {**PROFILES[profile].get(img_format, {}), **options}
+
+    if len(arr.shape) < 3:
+        arr = numpy.expand_dims(arr, axis=0)
+
+    if color_map is not None:
+        arr = _apply_colormap(arr, color_map)
+
+    img_encoder = ENCODERS[encoder]
+    if not img_encoder.supports(arr, img_format):
+        img_encoder = ENCODERS["gdal"]
+
+    return img_encoder.encode(arr, mask, img_format, **options)
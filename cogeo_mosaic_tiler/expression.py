@@ -0,0 +1,166 @@
+"""cogeo_mosaic_tiler.expression: band math expressions."""
+
+import re
+import ast
+import functools
+
+import numpy
+
+# Functions allowed in expressions (e.g `sqrt(b1)`, `where(b1 > 0, b2, 0)`).
+FUNCTIONS = {
+    name: getattr(numpy, name)
+    for name in [
+        "abs",
+        "sqrt",
+        "exp",
+        "log",
+        "log10",
+        "sin",
+        "cos",
+        "tan",
+        "arctan",
+        "arctan2",
+        "minimum",
+        "maximum",
+        "where",
+    ]
+}
+
+_BAND_NAME = re.compile(r"^[bB](?P<bidx>[0-9]+)$")
+
+# `ast.Num` in python < 3.8
+_CONSTANTS = tuple(getattr(ast, n) for n in ("Constant", "Num") if hasattr(ast, n))
+
+_NODES = (
+    ast.Expression,
+    ast.Tuple,
+    ast.Load,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Call,
+    ast.Name,
+    ast.operator,
+    ast.unaryop,
+    ast.cmpop,
+) + _CONSTANTS
+
+
+def _is_constant(node: ast.AST) -> bool:
+    """Check if a node is a (signed) numeric constant."""
+    if isinstance(node, ast.UnaryOp):
+        return _is_constant(node.operand)
+    return isinstance(node, _CONSTANTS)
+
+
+class Expression(object):
+    """
+    Compiled band math expression.
+
+    Attributes
+    ----------
+    expression : str
+        Comma separated expressions, one per output band, using `b{index}`
+        band names (e.g "(b4 - b3) / (b4 + b3)").
+    bands : list
+        Indexes of the bands used by the expression (sorted), i.e the bands
+        to read.
+
+    """
+
+    def __init__(self, expression: str):
+        """Parse and compile expression."""
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError:
+            raise ValueError(f"Invalid expression: {expression}")
+
+        bands = set()
+        for node in ast.walk(tree):
+            if not isinstance(node, _NODES):
+                raise ValueError(
+                    f"Unsupported syntax in expression: {type(node).__name__}"
+                )
+
+            if isinstance(node, _CONSTANTS) and not isinstance(
+                getattr(node, "value", getattr(node, "n", None)), (int, float)
+            ):
+                raise ValueError("Only numeric constants are allowed in expression")
+
+            # Constants are Python numbers: `9 ** 9 ** 9 ** 9` would be computed
+            # as an (unbounded) integer when evaluated.
+            if (
+                isinstance(node, ast.BinOp)
+                and _is_constant(node.left)
+                and _is_constant(node.right)
+            ):
+                raise ValueError(
+                    "Operations between constants are not allowed in expression"
+                )
+
+            if isinstance(node, ast.Call):
+                if not isinstance(node.func, ast.Name) or node.keywords:
+                    raise ValueError("Invalid function call in expression")
+                if node.func.id not in FUNCTIONS:
+                    raise ValueError(f"Unsupported function: {node.func.id}")
+
+            elif isinstance(node, ast.Name) and node.id not in FUNCTIONS:
+                match = _BAND_NAME.match(node.id)
+                if not match or int(match.group("bidx")) < 1:
+                    raise ValueError(f"Invalid band name: {node.id}")
+                bands.add(int(match.group("bidx")))
+
+        if not bands:
+            raise ValueError("Expression should use at least one band")
+
+        body = tree.body
+        self.count = len(body.elts) if isinstance(body, ast.Tuple) else 1
+        self.bands = sorted(bands)
+        self._code = compile(tree, "<expression>", "eval")
+
+    def __call__(self, data: numpy.ndarray) -> numpy.ndarray:
+        """
+        Evaluate expression.
+
+        Attributes
+        ----------
+        data : numpy.ndarray
+            Bands data (bands, ...), in `bands` order.
+
+        Returns
+        -------
+        data : numpy.ndarray
+            Expression results (float64, with non finite values set to 0),
+            one band per expression.
+
+        """
+        namespace = dict(FUNCTIONS)
+        for bidx, values in zip(self.bands, data):
+            values = values.astype(numpy.float64)
+            namespace[f"b{bidx}"] = namespace[f"B{bidx}"] = values
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            result = eval(self._code, {"__builtins__": {}}, namespace)
+
+        if not isinstance(result, tuple):
+            result = (result,)
+
+        shape = data.shape[1:]
+        return numpy.stack(
+            [
+                numpy.nan_to_num(
+                    numpy.broadcast_to(numpy.asarray(res, dtype=numpy.float64), shape),
+                    nan=0.0,
+                    posinf=0.0,
+                    neginf=0.0,
+                )
+                for res in result
+            ]
+        )
+
+
+@functools.lru_cache(maxsize=256)
+def parse_expression(expression: str) -> Expression:
+    """Parse and compile expression (cached by expression string)."""
+    return Expression(expression)
@@ -0,0 +1,178 @@
+"""cogeo_mosaic_tiler.extract: mosaic area extraction to GeoTIFF."""
+
+from typing import Callable, Dict, Sequence, Tuple
+
+import math
+from concurrent import futures
+
+import mercantile
+import rasterio
+from rasterio import windows
+from rasterio.transform import from_origin
+from rasterio.warp import transform_bounds
+
+from rio_tiler_mosaic.methods.defaults import FirstMethod
+
+from cogeo_mosaic_tiler.preview import WEB_MERCATOR, mosaic_grid
+
+# Output windows (and GeoTIFF blocks) width/height.
+WINDOW_SIZE = 512
+
+
+def get_bbox_grid(
+    bounds: Sequence[float], resolution: float
+) -> Tuple[Tuple[float, float, float, float], int, int]:
+    """
+    Get the Web Mercator grid of an area.
+
+    Attributes
+    ----------
+    bounds : list, required
+        Area bounds (west, south, east, north) in EPSG:4326.
+    resolution : float, required
+        Pixel size in EPSG:3857 units.
+
+    Returns
+    -------
+    bounds, width, height : tuple
+        Grid bounds in EPSG:3857 (aligned on the top-left corner) and size.
+
+    """
+    west, south = mercantile.xy(bounds[0], max(bounds[1], -85.051129))
+    east, north = mercantile.xy(bounds[2], min(bounds[3], 85.051129))
+    width = max(1, math.ceil((east - west) / resolution))
+    height = max(1, math.ceil((north - south) / resolution))
+    return (
+        (west, north - height * resolution, west + width * resolution, north),
+        width,
+        height,
+    )
+
+
+def _get_bounds(src_path: str):
+    try:
+        with rasterio.open(src_path) as src_dst:
+            return transform_bounds(
+                src_dst.crs, WEB_MERCATOR, *src_dst.bounds, densify_pts=21
+            )
+    except Exception:
+        return None
+
+
+def _intersects(a: Sequence[float], b: Sequence[float]) -> bool:
+    return a[0] < b[2] and a[2] > b[0] and a[1] < b[3] and a[3] > b[1]
+
+
+def extract_bbox(
+    assets: Sequence[str],
+    bounds: Sequence[float],
+    resolution: float,
+    path: str,
+    pixel_selection: Callable = FirstMethod,
+    window_size: int = WINDOW_SIZE,
+    chunk_size: int = None,
+    max_threads: int = 20,
+    **kwargs,
+) -> Dict:
+    """
+    Extract a mosaic area to a GeoTIFF file.
+
+    The output is created window by window: for each window, the assets
+    intersecting it are read in parallel at the output resolution and
+    combined with the pixel selection method (see `preview.mosaic_grid`),
+    then written to the file. Memory use depends on the window size and the
+    number of assets, not on the area size. Windows without data are not
+    written (sparse file, masked when read).
+
+    Attributes
+    ----------
+    assets : list, required
+        Dataset urls, in mosaic order.
+    bounds : list, required
+        Area bounds (west, south, east, north) in EPSG:4326.
+    resolution : float, required
+        Pixel size in EPSG:3857 units.
+    path : str, required
+        Output GeoTIFF path.
+    pixel_selection : callable, optional (default: FirstMethod)
+        Pixel selection method class (a new instance is used per window).
+    window_size : int, optional (default: 512)
+        Windows width/height (multiple of 16).
+    chunk_size : int, optional
+        Number of assets read concurrently (default: MAX_THREADS).
+    max_threads : int, optional (default: 20)
+        Max threads to use for reading the assets bounds.
+    kwargs : dict, optional
+        `preview.read_grid` options.
+
+    Returns
+    -------
+    profile : dict
+        Output dataset profile, or None when no data was found.
+
+    """
+    grid_bounds, width, height = get_bbox_grid(bounds, resolution)
+    transform = from_origin(grid_bounds[0], grid_bounds[3], resolution, resolution)
+
+    with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        assets_bounds = list(executor.map(_get_bounds, assets))
+
+    dst = None
+    profile = None
+    try:
+        for row_off in range(0, height, window_size):
+            for col_off in range(0, width, window_size):
+                window = windows.Window(
+                    col_off,
+                    row_off,
+                    min(window_size, width - col_off),
+                    min(window_size, height - row_off),
+                )
+                window_bounds = windows.bounds(window, transform)
+                window_assets = [
+                    asset
+                    for asset, asset_bounds in zip(assets, assets_bounds)
+                    if asset_bounds and _intersects(asset_bounds, window_bounds)
+                ]
+                if not window_assets:
+                    continue
+
+                data, mask = mosaic_grid(
+                    window_assets,
+                    window_bounds,
+                    window.width,
+                    window.height,
+                    pixel_selection=pixel_selection(),
+                    chunk_size=chunk_size,
+                    **kwargs,
+                )
+                if data is None:
+                    continue
+
+                # The output type is the pixel selection method one
+                if dst is None:
+                    dst = rasterio.open(
+                        path,
+                        "w",
+                        driver="GTiff",
+                        width=width,
+                        height=height,
+                        count=data.shape[0],
+                        dtype=data.dtype,
+                        crs=WEB_MERCATOR,
+                        transform=transform,
+                        tiled=True,
+                        blockxsize=window_size,
+                        blockysize=window_size,
+                        compress="deflate",
+                        sparse_ok=True,
+                        bigtiff="IF_SAFER",
+                    )
+                    profile = dst.profile
+                dst.write(data, window=window)
+                dst.write_mask(mask.astype("uint8"), window=window)
+    finally:
+        if dst is not None:
+            dst.close()
+
+    return profile
@@ -1,10 +1,17 @@
 """cogeo_mosaic_tiler.handlers.app: handle request for cogeo-mosaic-tiler endpoints."""
 
-from typing import Any, BinaryIO, Tuple, Union
+from typing import Any, BinaryIO, Dict, Sequence, Tuple, Union
 
+import io
 import os
 import json
+import math
+import tempfile
 import urllib
+import zipfile
+import multiprocessing
+from functools import partial
+from concurrent import futures
 
 import numpy
 
@@ -15,38 +22,60 @@ import mercantile
 import rasterio
 from rasterio.session import AWSSession
 from rasterio.transform import from_bounds
+from rasterio.warp import transform_bounds
 
 from rio_color.utils import scale_dtype, to_math_type
 from rio_color.operations import parse_operations
 
 from rio_tiler.main import tile as cogeoTiler
-from rio_tiler.utils import array_to_image, get_colormap, linear_rescale
-from rio_tiler.profiles import img_profiles
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler.utils import get_colormap, linear_rescale, tile_exists, tile_read
 
 from rio_tiler_mvt.mvt import encoder as mvtEncoder
 from rio_tiler_mosaic.mosaic import mosaic_tiler
 from rio_tiler_mosaic.methods import defaults
 
 from cogeo_mosaic import version as mosaic_version
-from cogeo_mosaic.utils import (
+
+from cogeo_mosaic_tiler import custom_methods, encoders, mvt, raw
+from cogeo_mosaic_tiler.cache import (
+    EmptyTileCache,
+    LRUCache,
+    SharedCache,
+    SingleFlight,
+    get_cache,
+)
+from cogeo_mosaic_tiler.custom_cmaps import get_custom_cmap
+from cogeo_mosaic_tiler.expression import parse_expression
+from cogeo_mosaic_tiler.extract import WINDOW_SIZE, extract_bbox, get_bbox_grid
+from cogeo_mosaic_tiler.headers import HeaderCache
+from cogeo_mosaic_tiler.memory import (
+    STREAMING_METHODS,
+    TileMemoryError,
+    plan_tile_read,
+)
+from cogeo_mosaic_tiler.mosaic import (
+    check_pixel_selection,
     create_mosaic,
     fetch_mosaic_definition,
     fetch_and_find_assets,
+    fetch_and_find_assets_bbox,
     fetch_and_find_assets_point,
+    get_minzoom,
     get_point_values,
+    get_revision,
+    invalidate_mosaic,
+    refresh_mosaic,
 )
-
-from cogeo_mosaic_tiler import custom_methods
-from cogeo_mosaic_tiler.custom_cmaps import get_custom_cmap
+from cogeo_mosaic_tiler.optimize import optimize_mosaic
+from cogeo_mosaic_tiler.overviews import create_overviews
+from cogeo_mosaic_tiler.preview import mosaic_preview
+from cogeo_mosaic_tiler.stats import get_assets_list, get_mosaic_stats
 from cogeo_mosaic_tiler.ogc import wmts_template
-from cogeo_mosaic_tiler.utils import (
-    _aws_put_data,
-    _create_path,
-    _compress_gz_json,
-    get_hash,
-)
+from cogeo_mosaic_tiler.storage import MosaicNotFoundError, get_storage
+from cogeo_mosaic_tiler.utils import _create_path, get_hash
 
-from lambda_proxy.proxy import API
+from cogeo_mosaic_tiler.proxy import API
 
 session = boto3_session()
 s3_client = session.client("s3")
@@ -60,9 +89,231 @@ PIXSEL_METHODS = {
     "median": defaults.MedianMethod,
     "stdev": defaults.StdevMethod,
     "bdix_stdev": custom_methods.bidx_stddev,
+    "streaming_mean": custom_methods.StreamingMeanMethod,
+    "streaming_median": custom_methods.StreamingMedianMethod,
+    "streaming_stdev": custom_methods.StreamingStdevMethod,
 }
+PIXSEL_METHODS.update(
+    {
+        f"streaming_p{p}": partial(custom_methods.StreamingPercentileMethod, p)
+        for p in custom_methods.STREAMING_PERCENTILES
+    }
+)
 app = API(name="cogeo-mosaic-tiler")
 
+# Rendered tiles cache, disabled by default in Lambda (TILE_CACHE_SIZE=0) and
+# shared between workers when running with the pre-fork server.
+tile_cache = get_cache("tiles", maxsize=int(os.environ.get("TILE_CACHE_SIZE", 0)))
+
+# Tiles known to be empty after reading all their assets. Blocks for `url=`
+# mosaics (which can change) expire after EMPTY_TILE_CACHE_TTL seconds.
+EMPTY_TILE_CACHE_TTL = float(os.environ.get("EMPTY_TILE_CACHE_TTL", 3600))
+if os.environ.get("EMPTY_TILE_CACHE_DIR"):
+    empty_tiles = EmptyTileCache(store=SharedCache(os.environ["EMPTY_TILE_CACHE_DIR"]))
+elif os.environ.get("CACHE_DIR"):
+    empty_tiles = EmptyTileCache(store=get_cache("empty_tiles"))
+else:
+    empty_tiles = EmptyTileCache()
+
+# Mosaic definitions summary (zooms and bounds) and WMTS capabilities
+# documents, so polling GIS clients do not fetch or render anything.
+summary_cache = get_cache("summaries", maxsize=1024)
+capabilities_cache = get_cache("capabilities", maxsize=256)
+# Entries for `url=` mosaics (which can change) expire after
+# MOSAIC_URL_CACHE_TTL seconds, the definition is then checked for changes.
+MOSAIC_URL_CACHE_TTL = float(os.environ.get("MOSAIC_URL_CACHE_TTL", 3600))
+
+# Whole mosaic previews, by mosaic and rendering options, and their max
+# width/height.
+preview_cache = get_cache(
+    "previews", maxsize=int(os.environ.get("PREVIEW_CACHE_SIZE", 64))
+)
+PREVIEW_MAX_SIZE = int(os.environ.get("PREVIEW_MAX_SIZE", 2048))
+
+# Area extracts max width * height (default: 2048x2048, 0 for no limit as in
+# server mode), to fit in the Lambda response payload.
+BBOX_MAX_PIXELS = int(os.environ.get("BBOX_MAX_PIXELS", 2048 * 2048))
+
+# Batch requests max number of tiles and tiles rendered concurrently.
+BATCH_MAX_TILES = int(os.environ.get("BATCH_MAX_TILES", 64))
+BATCH_THREADS = int(os.environ.get("BATCH_THREADS", 4))
+
+# Concurrent requests for the same tile wait for a single render.
+tile_flights = SingleFlight()
+
+# Image encoder ("gdal" or "pillow") and default compression profile.
+TILE_ENCODER = os.environ.get("TILE_ENCODER", "gdal")
+TILE_ENCODING_PROFILE = os.environ.get("TILE_ENCODING_PROFILE", "balanced")
+
+# Mosaic creation: threads reading the datasets footprints and processes
+# finding the quadkeys datasets (0: in the request process).
+MOSAIC_CREATE_THREADS = int(os.environ.get("MOSAIC_CREATE_THREADS", 20))
+MOSAIC_CREATE_PROCESSES = int(os.environ.get("MOSAIC_CREATE_PROCESSES", 0))
+
+# Max overview zoom levels, each overview COG is built in memory with
+# `256 * 2 ** (levels - 1)` pixels width/height.
+OVERVIEW_MAX_LEVELS = int(os.environ.get("OVERVIEW_MAX_LEVELS", 4))
+
+# Read assets covering most of the tile first when the pixel selection method
+# stops once the tile is filled (set TILE_COVERAGE_SORT=FALSE to keep the
+# mosaic definition order).
+TILE_COVERAGE_SORT = os.environ.get("TILE_COVERAGE_SORT", "TRUE").upper() == "TRUE"
+
+
+# Tiles working set budget in MB (default: half of the Lambda memory, no
+# limit elsewhere). Larger tiles use streaming pixel selection methods
+# (unless TILE_MEMORY_STREAMING=FALSE), fewer concurrent reads and fewer
+# assets, or are rejected.
+TILE_MEMORY_BUDGET = float(
+    os.environ.get(
+        "TILE_MEMORY_BUDGET",
+        int(os.environ.get("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", 0)) / 2,
+    )
+)
+TILE_MEMORY_STREAMING = (
+    os.environ.get("TILE_MEMORY_STREAMING", "TRUE").upper() == "TRUE"
+)
+
+# Assets (band count, data type), for the tiles working set estimation.
+asset_info_cache = LRUCache(maxsize=4096)
+
+# Assets headers persisted in HEADER_CACHE_DIR (e.g a network file system
+# mounted by every worker): cold workers open the assets without reading
+# their header and only request tiles data.
+if os.environ.get("HEADER_CACHE_DIR"):
+    header_cache = HeaderCache(
+        store=SharedCache(
+            os.environ["HEADER_CACHE_DIR"],
+            max_bytes=int(os.environ.get("HEADER_CACHE_MAX_BYTES", 536870912)),
+        ),
+        session=session,
+    )
+else:
+    header_cache = None
+
+
+def _open_asset(asset: str):
+    """Open an asset, with its cached header if enabled."""
+    if header_cache is None:
+        return rasterio.open(asset)
+    return header_cache.open(asset)
+
+
+def _tile(
+    asset: str, tile_x: int, tile_y: int, tile_z: int, tilesize: int = 256, **kwargs
+):
+    """Read a mercator tile from an asset (`rio_tiler.main.tile`)."""
+    if header_cache is None:
+        return cogeoTiler(asset, tile_x, tile_y, tile_z, tilesize=tilesize, **kwargs)
+
+    with _open_asset(asset) as src_dst:
+        bounds = transform_bounds(
+            src_dst.crs, "epsg:4326", *src_dst.bounds, densify_pts=21
+        )
+        if not tile_exists(bounds, tile_z, tile_x, tile_y):
+            raise TileOutsideBounds(
+                f"Tile {tile_z}/{tile_x}/{tile_y} is outside image bounds"
+            )
+
+        tile = mercantile.Tile(x=tile_x, y=tile_y, z=tile_z)
+        return tile_read(src_dst, mercantile.xy_bounds(tile), tilesize, **kwargs)
+
+
+class _TileReader(object):
+    """Asset tiler keeping track of read errors."""
+
+    def __init__(self):
+        """Initialize reader."""
+        self.errors = []
+
+    def __call__(self, asset, *args, **kwargs):
+        """Read tile from asset."""
+        try:
+            return _tile(asset, *args, **kwargs)
+        except TileOutsideBounds:
+            raise
+        except Exception as err:
+            self.errors.append(err)
+            raise
+
+
+def _find_assets(
+    url: str, x: int, y: int, z: int, pixel_selection: str
+) -> Tuple[Sequence[str], Any]:
+    """Return tile assets, ordered for the pixel selection, and the method."""
+    reverse = pixel_selection == "last"
+    pixsel_method = PIXSEL_METHODS["first" if reverse else pixel_selection]()
+    sort_by_coverage = TILE_COVERAGE_SORT and pixsel_method.exit_when_filled
+    assets = fetch_and_find_assets(
+        url,
+        x,
+        y,
+        z,
+        reverse=reverse,
+        sort_by_coverage=sort_by_coverage,
+        pixel_selection=pixel_selection,
+    )
+    return assets, pixsel_method
+
+
+def _asset_info(asset: str) -> Tuple[int, str]:
+    """Return asset band count and data type."""
+    info = asset_info_cache.get(asset)
+    if info is None:
+        with _open_asset(asset) as src_dst:
+            info = (src_dst.count, src_dst.dtypes[0])
+        asset_info_cache.set(asset, info)
+    return info
+
+
+def _plan_read(
+    assets: Sequence[str],
+    pixel_selection: str,
+    pixsel_method: Any,
+    tilesize: int,
+    bands: int = None,
+) -> Tuple[Sequence[str], Any, Union[int, None]]:
+    """
+    Fit the tile working set in TILE_MEMORY_BUDGET (see `memory.plan_tile_read`).
+
+    Returns the assets to read, the pixel selection method and the number of
+    concurrent reads (None for `mosaic_tiler` default).
+
+    """
+    if not TILE_MEMORY_BUDGET:
+        return assets, pixsel_method, None
+
+    count, dtype = _asset_info(assets[0])
+    chunk_size = int(os.environ.get("MAX_THREADS", multiprocessing.cpu_count() * 5))
+    method = "first" if pixel_selection == "last" else pixel_selection
+    new_method, max_assets, new_chunk_size = plan_tile_read(
+        method,
+        len(assets),
+        bands or count,
+        dtype,
+        tilesize,
+        chunk_size,
+        int(TILE_MEMORY_BUDGET * 1e6),
+        streaming=TILE_MEMORY_STREAMING,
+    )
+    if (new_method, max_assets, new_chunk_size) == (method, len(assets), chunk_size):
+        return assets, pixsel_method, None
+
+    app.log.warning(
+        f"Tile over memory budget: using {new_method} on {max_assets}/{len(assets)}"
+        f" assets with {new_chunk_size} concurrent reads"
+    )
+    if new_method != method:
+        pixsel_method = PIXSEL_METHODS[new_method]()
+    return assets[:max_assets], pixsel_method, new_chunk_size
+
+
+def _record_empty(reader: _TileReader, url: str, mosaicid: str, z: int, x: int, y: int):
+    """Record empty tile, unless some assets could not be read."""
+    if not reader.errors:
+        ttl = None if mosaicid else EMPTY_TILE_CACHE_TTL
+        empty_tiles.add(url, z, x, y, ttl=ttl)
+
 
 def _get_layer_names(src_dst):
     def _get_name(ix):
@@ -90,6 +341,11 @@ def _create(
     tile_cover_sort: Union[str, bool] = False,
     tile_format: str = None,
     tile_scale: Union[str, int] = 1,
+    overview_levels: Union[str, int] = None,
+    valid_footprint: Union[str, bool] = False,
+    statistics: Union[str, bool] = True,
+    optimize: Union[str, bool] = False,
+    max_assets: Union[str, int] = None,
     **kwargs: Any,
 ) -> Tuple[str, str, str]:
     minzoom = int(minzoom) if isinstance(minzoom, str) else minzoom
@@ -97,28 +353,74 @@ def _create(
     min_tile_cover = (
         float(min_tile_cover) if isinstance(min_tile_cover, float) else min_tile_cover
     )
+    overview_levels = (
+        int(overview_levels) if isinstance(overview_levels, str) else overview_levels
+    )
+    if isinstance(valid_footprint, str):
+        valid_footprint = valid_footprint.lower() in ["true", "1", "yes"]
+    if isinstance(statistics, str):
+        statistics = statistics.lower() in ["true", "1", "yes"]
+    if isinstance(optimize, str):
+        optimize = optimize.lower() in ["true", "1", "yes"]
+    max_assets = int(max_assets) if isinstance(max_assets, str) else max_assets
+
+    if overview_levels and not 0 < overview_levels <= OVERVIEW_MAX_LEVELS:
+        return (
+            "NOK",
+            "text/plain",
+            f"Invalid overview_levels, should be between 1 and {OVERVIEW_MAX_LEVELS}",
+        )
 
-    mosaicid = get_hash(body=body, version=mosaic_version)
+    # Mosaics created with options get their own id (other ids are left
+    # unchanged)
+    options = dict(optimize=True, max_assets=max_assets) if optimize else {}
+    if overview_levels:
+        options["overview_levels"] = overview_levels
+    if valid_footprint:
+        options["valid_footprint"] = True
+    mosaicid = get_hash(body=body, version=mosaic_version, **options)
 
+    storage = get_storage()
     try:
-        mosaic_definition = fetch_mosaic_definition(_create_path(mosaicid))
-    except ClientError:
+        mosaic_definition = fetch_mosaic_definition(storage.path(mosaicid))
+    except (ClientError, FileNotFoundError, MosaicNotFoundError):
         body = json.loads(body)
         with rasterio.Env(aws_session):
+            timings = {}
             mosaic_definition = create_mosaic(
                 body,
                 minzoom=minzoom,
                 maxzoom=maxzoom,
+                max_threads=MOSAIC_CREATE_THREADS,
                 minimum_tile_cover=min_tile_cover,
                 tile_cover_sort=tile_cover_sort,
+                valid_footprint=valid_footprint,
+                max_processes=MOSAIC_CREATE_PROCESSES,
+                timings=timings,
             )
-
-            key = f"mosaics/{mosaicid}.json.gz"
-            bucket = os.environ["MOSAIC_DEF_BUCKET"]
-            _aws_put_data(
-                key, bucket, _compress_gz_json(mosaic_definition), client=s3_client
+            app.log.info(
+                f"Mosaic {mosaicid} created from {len(body)} datasets: "
+                + ", ".join(f"{k}={v:.3f}s" for k, v in timings.items())
             )
 
+            if optimize:
+                mosaic_definition = _optimize(mosaicid, mosaic_definition, max_assets)
+
+            if overview_levels:
+                mosaic_definition["overviews"] = create_overviews(
+                    mosaic_definition,
+                    storage.overviews_path(mosaicid),
+                    levels=overview_levels,
+                    client=s3_client,
+                )
+
+            if statistics:
+                mosaic_definition["statistics"] = get_mosaic_stats(
+                    get_assets_list(mosaic_definition)
+                )
+
+            storage.write(mosaicid, mosaic_definition)
+
     if tile_format in ["pbf", "mvt"]:
         tile_url = f"{app.host}/{mosaicid}/{{z}}/{{x}}/{{y}}.{tile_format}"
     elif tile_format in ["png", "jpg", "webp", "tif", "npy"]:
@@ -136,7 +438,7 @@ def _create(
         "bounds": mosaic_definition["bounds"],
         "center": mosaic_definition["center"],
         "maxzoom": mosaic_definition["maxzoom"],
-        "minzoom": mosaic_definition["minzoom"],
+        "minzoom": get_minzoom(mosaic_definition),
         "name": mosaicid,
         "tilejson": "2.1.0",
         "tiles": [tile_url],
@@ -145,6 +447,19 @@ def _create(
     return ("OK", "application/json", json.dumps(meta))
 
 
+def _optimize(mosaicid: str, mosaic_definition: Dict, max_assets: int = None) -> Dict:
+    """Remove redundant assets and log the optimizer report."""
+    mosaic_definition, report = optimize_mosaic(
+        mosaic_definition, max_assets=max_assets, max_threads=MOSAIC_CREATE_THREADS
+    )
+    app.log.info(
+        f"Mosaic {mosaicid} optimized: {report['assets']['before']} -> "
+        f"{report['assets']['after']} assets references ({report['removed']}), "
+        f"{len(report['unused'])} assets removed"
+    )
+    return mosaic_definition
+
+
 @app.route(
     "/add",
     methods=["POST"],
@@ -153,22 +468,39 @@ def _create(
     binary_b64encode=True,
     tag=["mosaic"],
 )
-def _add(body: str, mosaicid: str = None) -> Tuple[str, str, str]:
+def _add(
+    body: str,
+    mosaicid: str = None,
+    statistics: Union[str, bool] = True,
+    optimize: Union[str, bool] = False,
+    max_assets: Union[str, int] = None,
+) -> Tuple[str, str, str]:
     # TODO: Need validation
     mosaic_definition = json.loads(body)
+    if isinstance(statistics, str):
+        statistics = statistics.lower() in ["true", "1", "yes"]
+    if isinstance(optimize, str):
+        optimize = optimize.lower() in ["true", "1", "yes"]
+    max_assets = int(max_assets) if isinstance(max_assets, str) else max_assets
 
     if not mosaicid:
         mosaicid = get_hash(body=body)
 
-    key = f"mosaics/{mosaicid}.json.gz"
-    bucket = os.environ["MOSAIC_DEF_BUCKET"]
-    _aws_put_data(key, bucket, _compress_gz_json(mosaic_definition), client=s3_client)
+    if optimize:
+        with rasterio.Env(aws_session):
+            mosaic_definition = _optimize(mosaicid, mosaic_definition, max_assets)
 
-    return (
-        "OK",
-        "application/json",
-        json.dumps({"id": mosaicid, "url": f"s3://{bucket}/{key}"}),
-    )
+    if statistics and not mosaic_definition.get("statistics"):
+        with rasterio.Env(aws_session):
+            mosaic_definition["statistics"] = get_mosaic_stats(
+                get_assets_list(mosaic_definition)
+            )
+
+    url = get_storage().write(mosaicid, mosaic_definition)
+    invalidate_mosaic(url)
+    empty_tiles.invalidate(url)
+
+    return ("OK", "application/json", json.dumps({"id": mosaicid, "url": url}))
 
 
 @app.route(
@@ -214,7 +546,7 @@ def _info(mosaicid: str = None, url: str = None) -> Tuple[str, str, str]:
         "bounds": bounds,
         "center": center,
         "maxzoom": mosaic_def["maxzoom"],
-        "minzoom": mosaic_def["minzoom"],
+        "minzoom": get_minzoom(mosaic_def),
         "name": mosaicid if mosaicid else url,
         "quadkeys": quadkeys,
         "layers": layer_names,
@@ -316,7 +648,7 @@ def _tilejson(
         "bounds": bounds,
         "center": center,
         "maxzoom": mosaic_def["maxzoom"],
-        "minzoom": mosaic_def["minzoom"],
+        "minzoom": get_minzoom(mosaic_def),
         "name": url,
         "tilejson": "2.1.0",
         "tiles": [tile_url],
@@ -357,8 +689,6 @@ def _wmts(
     if tile_scale is not None and isinstance(tile_scale, str):
         tile_scale = int(tile_scale)
 
-    mosaic_def = fetch_mosaic_definition(url)
-
     kwargs.pop("SERVICE", None)
     kwargs.pop("REQUEST", None)
     kwargs.update(dict(url=url))
@@ -367,20 +697,54 @@ def _wmts(
         "&", "&amp;"
     )  # & is an invalid character in XML
 
-    return (
-        "OK",
-        "application/xml",
-        wmts_template(
+    # The summary is part of the key, so updated mosaics get new capabilities
+    summary = _mosaic_summary(url, mosaicid)
+    cache_key = get_hash(
+        endpoint="wmts",
+        host=app.host,
+        tile_format=tile_format,
+        tile_scale=tile_scale,
+        title=title,
+        query_string=query_string,
+        **summary,
+    )
+    content = capabilities_cache.get(cache_key)
+    if content is None:
+        content = wmts_template(
             f"{app.host}",
             query_string,
-            minzoom=mosaic_def["minzoom"],
-            maxzoom=mosaic_def["maxzoom"],
-            bounds=mosaic_def["bounds"],
+            minzoom=summary["minzoom"],
+            maxzoom=summary["maxzoom"],
+            bounds=summary["bounds"],
             tile_scale=tile_scale,
             tile_format=tile_format,
             title=title,
-        ),
-    )
+        )
+        ttl = None if mosaicid else MOSAIC_URL_CACHE_TTL
+        capabilities_cache.set(cache_key, content, ttl=ttl)
+
+    return ("OK", "application/xml", content)
+
+
+def _mosaic_summary(url: str, mosaicid: str = None) -> Dict:
+    """Return mosaic zooms and bounds."""
+    key = (url, get_revision(url))
+    summary = summary_cache.get(key)
+    if summary is None:
+        ttl = None
+        if not mosaicid:
+            ttl = MOSAIC_URL_CACHE_TTL
+            if refresh_mosaic(url):
+                key = (url, get_revision(url))
+
+        mosaic_def = fetch_mosaic_definition(url)
+        summary = dict(
+            minzoom=get_minzoom(mosaic_def),
+            maxzoom=mosaic_def["maxzoom"],
+            bounds=mosaic_def["bounds"],
+        )
+        summary_cache.set(key, summary, ttl=ttl)
+    return summary
 
 
 @app.route(
@@ -409,6 +773,7 @@ def _mvt(
     pixel_selection: str = "first",
     feature_type: str = "point",
     resampling_method: str = "nearest",
+    cell_size: Union[str, int] = 8,
 ) -> Tuple[str, str, BinaryIO]:
     """Handle MVT requests."""
     if mosaicid:
@@ -416,57 +781,130 @@ def _mvt(
     elif url is None:
         return ("NOK", "text/plain", "Missing 'URL' parameter")
 
-    assets = fetch_and_find_assets(url, x, y, z)
-    if not assets:
-        return ("EMPTY", "text/plain", f"No assets found for tile {z}-{x}-{y}")
-
     if tile_size is not None and isinstance(tile_size, str):
         tile_size = int(tile_size)
 
-    if pixel_selection == "last":
-        pixel_selection = "first"
-        assets = list(reversed(assets))
+    if feature_type not in ["point", "polygon", "polygonize", "grid"]:
+        return ("NOK", "text/plain", f"Invalid feature type: {feature_type}")
+
+    cell_size = int(cell_size)
+    if feature_type == "grid" and (cell_size < 1 or tile_size % cell_size):
+        return ("NOK", "text/plain", "Tile size should be a multiple of cell size")
+
+    cache_key = get_hash(
+        endpoint="mvt",
+        url=url,
+        revision=get_revision(url),
+        z=z,
+        x=x,
+        y=y,
+        tile_size=tile_size,
+        pixel_selection=pixel_selection,
+        feature_type=feature_type,
+        resampling_method=resampling_method,
+        cell_size=cell_size,
+    )
+    content = tile_cache.get(cache_key)
+    if content is not None:
+        return ("OK", "application/x-protobuf", content)
+
+    if empty_tiles.contains(url, z, x, y):
+        return ("EMPTY", "text/plain", "empty tiles")
+
+    return tile_flights.do(
+        cache_key,
+        _render_mvt,
+        cache_key,
+        url,
+        mosaicid,
+        z,
+        x,
+        y,
+        tile_size=tile_size,
+        pixel_selection=pixel_selection,
+        feature_type=feature_type,
+        resampling_method=resampling_method,
+        cell_size=cell_size,
+    )
+
+
+def _render_mvt(
+    cache_key: str,
+    url: str,
+    mosaicid: str,
+    z: int,
+    x: int,
+    y: int,
+    tile_size: int = 256,
+    pixel_selection: str = "first",
+    feature_type: str = "point",
+    resampling_method: str = "nearest",
+    cell_size: int = 8,
+) -> Tuple[str, str, BinaryIO]:
+    """Render and cache MVT."""
+    try:
+        assets, pixsel_method = _find_assets(url, x, y, z, pixel_selection)
+    except ValueError as err:
+        return ("NOK", "text/plain", str(err))
+    if not assets:
+        return ("EMPTY", "text/plain", f"No assets found for tile {z}-{x}-{y}")
 
     with rasterio.Env(aws_session):
-        pixsel_method = PIXSEL_METHODS[pixel_selection]
+        found = len(assets)
+        try:
+            assets, pixsel_method, chunk_size = _plan_read(
+                assets, pixel_selection, pixsel_method, tile_size
+            )
+        except TileMemoryError as err:
+            return ("NOK", "text/plain", str(err))
+
+        reader = _TileReader()
         tile, mask = mosaic_tiler(
             assets,
             x,
             y,
             z,
-            cogeoTiler,
+            reader,
             tilesize=tile_size,
-            pixel_selection=pixsel_method(),
+            pixel_selection=pixsel_method,
+            chunk_size=chunk_size,
             resampling_method=resampling_method,
         )
         if tile is None:
+            if len(assets) == found:
+                _record_empty(reader, url, mosaicid, z, x, y)
             return ("EMPTY", "text/plain", "empty tiles")
 
         with rasterio.open(assets[0]) as src_dst:
             band_descriptions = _get_layer_names(src_dst)
 
-        return (
-            "OK",
-            "application/x-protobuf",
-            mvtEncoder(
-                tile,
-                mask,
-                band_descriptions,
-                os.path.basename(url),
-                feature_type=feature_type,
-            ),
-        )
+        layer_name = os.path.basename(url)
+        if feature_type == "polygonize":
+            content = mvt.polygons_encoder(tile, mask, band_descriptions, layer_name)
+        elif feature_type == "grid":
+            content = mvt.grid_encoder(
+                tile, mask, band_descriptions, layer_name, cell_size=cell_size
+            )
+        else:
+            content = mvtEncoder(
+                tile, mask, band_descriptions, layer_name, feature_type=feature_type
+            )
+        tile_cache.set(cache_key, content)
+        return ("OK", "application/x-protobuf", content)
 
 
 def _postprocess(
     tile: numpy.ndarray,
     mask: numpy.ndarray,
-    rescale: str = None,
+    rescale: Union[str, Sequence[Tuple[float, float]]] = None,
     color_formula: str = None,
 ) -> numpy.ndarray:
     """Tile data post processing."""
     if rescale:
-        rescale_arr = (tuple(map(float, rescale.split(","))),) * tile.shape[0]
+        if isinstance(rescale, str):
+            rescale_arr = (tuple(map(float, rescale.split(","))),) * tile.shape[0]
+        else:
+            rescale_arr = rescale
         for bdx in range(tile.shape[0]):
             tile[bdx] = numpy.where(
                 mask,
@@ -560,11 +998,14 @@ def _img(
     ext: str = None,
     url: str = None,
     indexes: str = None,
+    expression: str = None,
     rescale: str = None,
     color_ops: str = None,
     color_map: str = None,
     pixel_selection: str = "first",
     resampling_method: str = "nearest",
+    compression: str = None,
+    profile: str = None,
 ) -> Tuple[str, str, BinaryIO]:
     """Handle tile requests."""
     if mosaicid:
@@ -572,37 +1013,166 @@ def _img(
     elif url is None:
         return ("NOK", "text/plain", "Missing 'URL' parameter")
 
-    assets = fetch_and_find_assets(url, x, y, z)
+    if expression:
+        if indexes:
+            return ("NOK", "text/plain", "Cannot pass indexes and expression")
+        if rescale == "auto":
+            return ("NOK", "text/plain", "Cannot use rescale=auto with expression")
+        try:
+            parse_expression(expression)
+        except ValueError as err:
+            return ("NOK", "text/plain", str(err))
+
+    profile = profile or TILE_ENCODING_PROFILE
+    if profile not in encoders.PROFILES:
+        return ("NOK", "text/plain", f"Invalid encoding profile: {profile}")
+
+    if ext == "bin" and compression and compression not in raw.compressions():
+        return ("NOK", "text/plain", f"Unsupported compression: {compression}")
+
+    cache_key = get_hash(
+        endpoint="img",
+        url=url,
+        revision=get_revision(url),
+        z=z,
+        x=x,
+        y=y,
+        scale=scale,
+        ext=ext,
+        indexes=indexes,
+        expression=expression,
+        rescale=rescale,
+        color_ops=color_ops,
+        color_map=color_map,
+        pixel_selection=pixel_selection,
+        resampling_method=resampling_method,
+        compression=compression,
+        profile=profile,
+    )
+    content = tile_cache.get(cache_key)
+    if content is not None:
+        return ("OK", *content)
+
+    if empty_tiles.contains(url, z, x, y):
+        return ("EMPTY", "text/plain", "empty tiles")
+
+    return tile_flights.do(
+        cache_key,
+        _render_img,
+        cache_key,
+        url,
+        mosaicid,
+        z,
+        x,
+        y,
+        scale=scale,
+        ext=ext,
+        indexes=indexes,
+        expression=expression,
+        rescale=rescale,
+        color_ops=color_ops,
+        color_map=color_map,
+        pixel_selection=pixel_selection,
+        resampling_method=resampling_method,
+        compression=compression,
+        profile=profile,
+    )
+
+
+def _render_img(
+    cache_key: str,
+    url: str,
+    mosaicid: str,
+    z: int,
+    x: int,
+    y: int,
+    scale: int = 1,
+    ext: str = None,
+    indexes: str = None,
+    expression: str = None,
+    rescale: str = None,
+    color_ops: str = None,
+    color_map: str = None,
+    pixel_selection: str = "first",
+    resampling_method: str = "nearest",
+    compression: str = None,
+    profile: str = "balanced",
+) -> Tuple[str, str, BinaryIO]:
+    """Render and cache image tile."""
+    try:
+        assets, pixsel_method = _find_assets(url, x, y, z, pixel_selection)
+    except ValueError as err:
+        return ("NOK", "text/plain", str(err))
     if not assets:
         return ("EMPTY", "text/plain", f"No assets found for tile {z}-{x}-{y}")
 
     if indexes:
         indexes = list(map(int, indexes.split(",")))
 
-    tilesize = 256 * scale
+    # Only read the bands used by the expression
+    expr = parse_expression(expression) if expression else None
+    if expr:
+        indexes = expr.bands
+
+    if rescale == "auto":
+        # Per-band percentiles from the (cached) mosaic definition
+        stats = fetch_mosaic_definition(url).get("statistics")
+        if not stats:
+            return ("NOK", "text/plain", "Mosaic definition has no statistics")
+        bands = indexes or sorted(map(int, stats))
+        if any(str(bidx) not in stats for bidx in bands):
+            return ("NOK", "text/plain", "Missing band statistics")
+        rescale = [tuple(stats[str(bidx)]["pc"]) for bidx in bands]
 
-    if pixel_selection == "last":
-        pixel_selection = "first"
-        assets = list(reversed(assets))
+    tilesize = 256 * scale
 
     with rasterio.Env(aws_session):
-        pixsel_method = PIXSEL_METHODS[pixel_selection]
+        found = len(assets)
+        try:
+            assets, pixsel_method, chunk_size = _plan_read(
+                assets,
+                pixel_selection,
+                pixsel_method,
+                tilesize,
+                bands=len(indexes) if indexes else None,
+            )
+        except TileMemoryError as err:
+            return ("NOK", "text/plain", str(err))
+
+        reader = _TileReader()
         tile, mask = mosaic_tiler(
             assets,
             x,
             y,
             z,
-            cogeoTiler,
+            reader,
             indexes=indexes,
             tilesize=tilesize,
-            pixel_selection=pixsel_method(),
+            pixel_selection=pixsel_method,
+            chunk_size=chunk_size,
             resampling_method=resampling_method,
         )
 
     if tile is None:
+        if len(assets) == found:
+            _record_empty(reader, url, mosaicid, z, x, y)
         return ("EMPTY", "text/plain", "empty tiles")
 
+    if expr:
+        tile = expr(tile)
+
     rtile = _postprocess(tile, mask, rescale=rescale, color_formula=color_ops)
+
+    # Raw array tile, serialized without GDAL
+    if ext == "bin":
+        tile_bounds = mercantile.xy_bounds(mercantile.Tile(x=x, y=y, z=z))
+        content = (
+            raw.CONTENT_TYPE,
+            raw.encode(rtile, mask, bounds=tile_bounds, compression=compression),
+        )
+        tile_cache.set(cache_key, content)
+        return ("OK", *content)
+
     if color_map:
         if color_map.startswith("custom_"):
             color_map = get_custom_cmap(color_map)
@@ -613,7 +1183,7 @@ def _img(
         ext = "jpg" if mask.all() else "png"
 
     driver = "jpeg" if ext == "jpg" else ext
-    options = img_profiles.get(driver, {})
+    options = {}
 
     if ext == "tif":
         ext = "tiff"
@@ -624,11 +1194,486 @@ def _img(
             transform=from_bounds(*tile_bounds, tilesize, tilesize),
         )
 
-    return (
-        "OK",
+    content = (
         f"image/{ext}",
-        array_to_image(rtile, mask, img_format=driver, color_map=color_map, **options),
+        encoders.encode(
+            rtile,
+            mask,
+            img_format=driver,
+            color_map=color_map,
+            encoder=TILE_ENCODER,
+            profile=profile,
+            **options,
+        ),
     )
+    tile_cache.set(cache_key, content)
+    return ("OK", *content)
+
+
+def _parse_tiles(tiles: str) -> Sequence[Tuple[int, int, int]]:
+    """Parse `z/x/y` tiles list (comma separated or JSON list)."""
+    if isinstance(tiles, str):
+        tiles = tiles.split(",")
+    return [
+        tuple(map(int, tile.strip().split("/") if isinstance(tile, str) else tile))
+        for tile in tiles
+    ]
+
+
+@app.route(
+    "/batch.<ext>",
+    methods=["GET", "POST"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/batch@<int:scale>x.<ext>",
+    methods=["GET", "POST"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/<regex([0-9A-Fa-f]{56}):mosaicid>/batch.<ext>",
+    methods=["GET", "POST"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/<regex([0-9A-Fa-f]{56}):mosaicid>/batch@<int:scale>x.<ext>",
+    methods=["GET", "POST"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+def _batch(
+    mosaicid: str = None,
+    scale: int = 1,
+    ext: str = None,
+    body: str = None,
+    url: str = None,
+    tiles: str = None,
+    indexes: str = None,
+    expression: str = None,
+    rescale: str = None,
+    color_ops: str = None,
+    color_map: str = None,
+    pixel_selection: str = "first",
+    resampling_method: str = "nearest",
+    compression: str = None,
+    profile: str = None,
+) -> Tuple[str, str, BinaryIO]:
+    """Handle multiple tiles requests."""
+    if mosaicid:
+        url = _create_path(mosaicid)
+    elif url is None:
+        return ("NOK", "text/plain", "Missing 'URL' parameter")
+
+    if ext == "pbf":
+        return ("NOK", "text/plain", "Unsupported batch format: pbf")
+
+    if body:
+        try:
+            tiles = json.loads(body).get("tiles")
+        except (ValueError, AttributeError):
+            return ("NOK", "text/plain", "Invalid body")
+    if not tiles:
+        return ("NOK", "text/plain", "Missing 'tiles' parameter")
+
+    try:
+        tiles = _parse_tiles(tiles)
+        if any(len(tile) != 3 for tile in tiles):
+            raise ValueError
+    except (ValueError, TypeError):
+        return ("NOK", "text/plain", "Invalid 'tiles' parameter, use z/x/y")
+
+    tiles = list(dict.fromkeys(tiles))
+    if len(tiles) > BATCH_MAX_TILES:
+        return (
+            "NOK",
+            "text/plain",
+            f"Too many tiles ({len(tiles)}, max {BATCH_MAX_TILES})",
+        )
+
+    # Fetch the mosaic definition once, before the concurrent renders
+    try:
+        fetch_mosaic_definition(url)
+    except (ClientError, FileNotFoundError, MosaicNotFoundError):
+        return ("NOK", "text/plain", "Mosaic definition not found")
+
+    def _render(tile):
+        z, x, y = tile
+        return _img(
+            mosaicid=mosaicid,
+            z=z,
+            x=x,
+            y=y,
+            scale=int(scale),
+            ext=ext,
+            url=url,
+            indexes=indexes,
+            expression=expression,
+            rescale=rescale,
+            color_ops=color_ops,
+            color_map=color_map,
+            pixel_selection=pixel_selection,
+            resampling_method=resampling_method,
+            compression=compression,
+            profile=profile,
+        )
+
+    with futures.ThreadPoolExecutor(max_workers=BATCH_THREADS) as executor:
+        results = list(executor.map(_render, tiles))
+
+    # Tiles in `{z}/{x}/{y}.{ext}` entries (stored, images are already
+    # compressed) and their status in `index.json`.
+    index = {}
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w", zipfile.ZIP_STORED) as archive:
+        for (z, x, y), (status, content_type, tile) in zip(tiles, results):
+            name = f"{z}/{x}/{y}"
+            if status == "OK":
+                archive.writestr(f"{name}.{ext}", tile)
+                index[name] = 200
+            elif status == "EMPTY":
+                index[name] = 204
+            else:
+                index[name] = tile
+        archive.writestr("index.json", json.dumps(index))
+
+    return ("OK", "application/zip", content.getvalue())
+
+
+@app.route(
+    "/preview",
+    methods=["GET"],
+    cors=True,
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/preview.<ext>",
+    methods=["GET"],
+    cors=True,
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/<regex([0-9A-Fa-f]{56}):mosaicid>/preview",
+    methods=["GET"],
+    cors=True,
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/<regex([0-9A-Fa-f]{56}):mosaicid>/preview.<ext>",
+    methods=["GET"],
+    cors=True,
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+def _preview(
+    mosaicid: str = None,
+    ext: str = None,
+    url: str = None,
+    max_size: Union[str, int] = 1024,
+    indexes: str = None,
+    expression: str = None,
+    rescale: str = None,
+    color_ops: str = None,
+    color_map: str = None,
+    pixel_selection: str = "first",
+    resampling_method: str = "nearest",
+    profile: str = None,
+) -> Tuple[str, str, BinaryIO]:
+    """Handle whole mosaic preview requests."""
+    if mosaicid:
+        url = _create_path(mosaicid)
+    elif url is None:
+        return ("NOK", "text/plain", "Missing 'URL' parameter")
+
+    max_size = int(max_size)
+    if not 0 < max_size <= PREVIEW_MAX_SIZE:
+        return ("NOK", "text/plain", f"Invalid max_size (1-{PREVIEW_MAX_SIZE})")
+
+    if ext in ["bin", "pbf"]:
+        return ("NOK", "text/plain", f"Unsupported preview format: {ext}")
+
+    if expression:
+        if indexes:
+            return ("NOK", "text/plain", "Cannot pass indexes and expression")
+        if rescale == "auto":
+            return ("NOK", "text/plain", "Cannot use rescale=auto with expression")
+        try:
+            parse_expression(expression)
+        except ValueError as err:
+            return ("NOK", "text/plain", str(err))
+
+    profile = profile or TILE_ENCODING_PROFILE
+    if profile not in encoders.PROFILES:
+        return ("NOK", "text/plain", f"Invalid encoding profile: {profile}")
+
+    cache_key = get_hash(
+        endpoint="preview",
+        url=url,
+        revision=get_revision(url),
+        ext=ext,
+        max_size=max_size,
+        indexes=indexes,
+        expression=expression,
+        rescale=rescale,
+        color_ops=color_ops,
+        color_map=color_map,
+        pixel_selection=pixel_selection,
+        resampling_method=resampling_method,
+        profile=profile,
+    )
+    content = preview_cache.get(cache_key)
+    if content is not None:
+        return ("OK", *content)
+
+    return tile_flights.do(
+        cache_key,
+        _render_preview,
+        cache_key,
+        url,
+        ext=ext,
+        max_size=max_size,
+        indexes=indexes,
+        expression=expression,
+        rescale=rescale,
+        color_ops=color_ops,
+        color_map=color_map,
+        pixel_selection=pixel_selection,
+        resampling_method=resampling_method,
+        profile=profile,
+    )
+
+
+def _render_preview(
+    cache_key: str,
+    url: str,
+    ext: str = None,
+    max_size: int = 1024,
+    indexes: str = None,
+    expression: str = None,
+    rescale: str = None,
+    color_ops: str = None,
+    color_map: str = None,
+    pixel_selection: str = "first",
+    resampling_method: str = "nearest",
+    profile: str = "balanced",
+) -> Tuple[str, str, BinaryIO]:
+    """Render and cache mosaic preview."""
+    mosaic_def = fetch_mosaic_definition(url)
+    try:
+        check_pixel_selection(mosaic_def, pixel_selection)
+    except ValueError as err:
+        return ("NOK", "text/plain", str(err))
+
+    # Pre-aggregated overviews (if any) cover the mosaic with a few files
+    assets = get_assets_list(mosaic_def, pixel_selection)
+    if pixel_selection == "last":
+        assets = list(reversed(assets))
+    pixsel_method = PIXSEL_METHODS[
+        "first" if pixel_selection == "last" else pixel_selection
+    ]()
+
+    if indexes:
+        indexes = list(map(int, indexes.split(",")))
+
+    expr = parse_expression(expression) if expression else None
+    if expr:
+        indexes = expr.bands
+
+    if rescale == "auto":
+        stats = mosaic_def.get("statistics")
+        if not stats:
+            return ("NOK", "text/plain", "Mosaic definition has no statistics")
+        bands = indexes or sorted(map(int, stats))
+        if any(str(bidx) not in stats for bidx in bands):
+            return ("NOK", "text/plain", "Missing band statistics")
+        rescale = [tuple(stats[str(bidx)]["pc"]) for bidx in bands]
+
+    with rasterio.Env(aws_session):
+        try:
+            assets, pixsel_method, chunk_size = _plan_read(
+                assets,
+                pixel_selection,
+                pixsel_method,
+                max_size,
+                bands=len(indexes) if indexes else None,
+            )
+        except TileMemoryError as err:
+            return ("NOK", "text/plain", str(err))
+
+        tile, mask, bounds = mosaic_preview(
+            assets,
+            mosaic_def["bounds"],
+            max_size=max_size,
+            pixel_selection=pixsel_method,
+            chunk_size=chunk_size,
+            indexes=indexes,
+            resampling_method=resampling_method,
+        )
+
+    if tile is None:
+        return ("EMPTY", "text/plain", "empty preview")
+
+    if expr:
+        tile = expr(tile)
+
+    rtile = _postprocess(tile, mask, rescale=rescale, color_formula=color_ops)
+
+    if color_map:
+        if color_map.startswith("custom_"):
+            color_map = get_custom_cmap(color_map)
+        else:
+            color_map = get_colormap(color_map, format="gdal")
+
+    if not ext:
+        ext = "jpg" if mask.all() else "png"
+
+    driver = "jpeg" if ext == "jpg" else ext
+    options = {}
+
+    if ext == "tif":
+        ext = "tiff"
+        driver = "GTiff"
+        options = dict(
+            crs={"init": "EPSG:3857"},
+            transform=from_bounds(*bounds, mask.shape[1], mask.shape[0]),
+        )
+
+    content = (
+        f"image/{ext}",
+        encoders.encode(
+            rtile,
+            mask,
+            img_format=driver,
+            color_map=color_map,
+            encoder=TILE_ENCODER,
+            profile=profile,
+            **options,
+        ),
+    )
+    preview_cache.set(cache_key, content)
+    return ("OK", *content)
+
+
+@app.route(
+    "/bbox/<regex([0-9eE.+-]+,[0-9eE.+-]+,[0-9eE.+-]+,[0-9eE.+-]+):bbox>.tif",
+    methods=["GET"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+@app.route(
+    "/<regex([0-9A-Fa-f]{56}):mosaicid>/bbox/<regex([0-9eE.+-]+,[0-9eE.+-]+,[0-9eE.+-]+,[0-9eE.+-]+):bbox>.tif",
+    methods=["GET"],
+    cors=True,
+    binary_b64encode=True,
+    tag=["tiles"],
+)
+def _bbox(
+    mosaicid: str = None,
+    bbox: str = None,
+    url: str = None,
+    resolution: Union[str, float] = None,
+    indexes: str = None,
+    pixel_selection: str = "first",
+    resampling_method: str = "nearest",
+) -> Tuple[str, str, BinaryIO]:
+    """Handle area extraction requests."""
+    if mosaicid:
+        url = _create_path(mosaicid)
+    elif url is None:
+        return ("NOK", "text/plain", "Missing 'URL' parameter")
+
+    try:
+        bounds = list(map(float, bbox.split(",")))
+    except ValueError:
+        return ("NOK", "text/plain", f"Invalid bbox: {bbox}")
+    if bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+        return ("NOK", "text/plain", f"Invalid bbox: {bbox}")
+
+    mosaic_def = fetch_mosaic_definition(url)
+    if resolution:
+        resolution = float(resolution)
+    else:
+        # Mosaic max zoom resolution
+        resolution = 2 * math.pi * 6378137 / 256 / 2 ** mosaic_def["maxzoom"]
+
+    _, width, height = get_bbox_grid(bounds, resolution)
+    if BBOX_MAX_PIXELS and width * height > BBOX_MAX_PIXELS:
+        return (
+            "NOK",
+            "text/plain",
+            f"Extract too large ({width}x{height} pixels, max {BBOX_MAX_PIXELS}):"
+            " use a smaller area or a lower resolution",
+        )
+
+    reverse = pixel_selection == "last"
+    method = "first" if reverse else pixel_selection
+    pixsel_method = PIXSEL_METHODS[method]()
+    try:
+        assets = fetch_and_find_assets_bbox(
+            url, bounds, reverse=reverse, pixel_selection=pixel_selection
+        )
+    except ValueError as err:
+        return ("NOK", "text/plain", str(err))
+    if not assets:
+        return ("EMPTY", "text/plain", f"No assets found for bbox {bbox}")
+
+    if indexes:
+        indexes = list(map(int, indexes.split(",")))
+
+    with rasterio.Env(aws_session):
+        try:
+            planned, planned_method, chunk_size = _plan_read(
+                assets,
+                pixel_selection,
+                pixsel_method,
+                WINDOW_SIZE,
+                bands=len(indexes) if indexes else None,
+            )
+        except TileMemoryError as err:
+            return ("NOK", "text/plain", str(err))
+        # A new method is created per window: use the registered factory (the
+        # planner only switches stacking methods to their streaming version).
+        if planned_method is not pixsel_method:
+            method = STREAMING_METHODS[method]
+        if len(planned) < len(assets):
+            return (
+                "NOK",
+                "text/plain",
+                f"Too many assets ({len(assets)}) for the memory budget with"
+                f" {pixel_selection}: use a smaller area",
+            )
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "bbox.tif")
+            profile = extract_bbox(
+                assets,
+                bounds,
+                resolution,
+                path,
+                pixel_selection=PIXSEL_METHODS[method],
+                chunk_size=chunk_size,
+                indexes=indexes,
+                resampling_method=resampling_method,
+            )
+            if profile is None:
+                return ("EMPTY", "text/plain", "empty extract")
+
+            with open(path, "rb") as f:
+                return ("OK", "image/tiff", f.read())
 
 
 @app.route(
@@ -648,7 +1693,11 @@ def _img(
     tag=["tiles"],
 )
 def _point(
-    mosaicid: str = None, lng: float = None, lat: float = None, url: str = None
+    mosaicid: str = None,
+    lng: float = None,
+    lat: float = None,
+    url: str = None,
+    expression: str = None,
 ) -> Tuple[str, str, str]:
     """Handle point requests."""
     if mosaicid:
@@ -665,13 +1714,27 @@ def _point(
     if isinstance(lat, str):
         lat = float(lat)
 
+    expr = None
+    if expression:
+        try:
+            expr = parse_expression(expression)
+        except ValueError as err:
+            return ("NOK", "text/plain", str(err))
+
     assets = fetch_and_find_assets_point(url, lng, lat)
     if not assets:
         return ("EMPTY", "text/plain", f"No assets found for lat/lng ({lat}, {lng})")
 
     with rasterio.Env(aws_session):
-        meta = {"coordinates": [lng, lat], "values": get_point_values(assets, lng, lat)}
-        return ("OK", "application/json", json.dumps(meta))
+        indexes = expr.bands if expr else None
+        values = get_point_values(assets, lng, lat, indexes=indexes)
+
+    if expr:
+        for point in values:
+            point["values"] = expr(numpy.array(point["values"])[:, None])[:, 0].tolist()
+
+    meta = {"coordinates": [lng, lat], "values": values}
+    return ("OK", "application/json", json.dumps(meta))
 
 
 @app.route("/favicon.ico", methods=["GET"], cors=True, tag=["other"])
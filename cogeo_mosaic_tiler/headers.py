@@ -0,0 +1,512 @@
+"""cogeo_mosaic_tiler.headers: Cloud Optimized GeoTIFF headers cache."""
+
+from typing import Any, Callable, Dict, Sequence, Tuple
+
+import io
+import os
+import re
+import time
+import socket
+import struct
+import logging
+import functools
+import urllib.error
+import urllib.request
+from urllib.parse import urlparse
+from concurrent import futures
+
+from boto3.session import Session as boto3_session
+
+import rasterio
+
+from cogeo_mosaic_tiler.cache import LRUCache
+
+try:
+    from rasterio.abc import MultiByteRangeResourceContainer
+except ImportError:  # pragma: nocover
+    # rasterio < 1.4: no Python openers, datasets are opened by GDAL
+    MultiByteRangeResourceContainer = object
+
+logger = logging.getLogger(__name__)
+
+# TIFF data offsets tags (StripOffsets, TileOffsets).
+_OFFSETS_TAGS = (273, 324)
+
+# TIFF field types size.
+_TYPE_SIZES = {
+    1: 1,
+    2: 1,
+    3: 2,
+    4: 4,
+    5: 8,
+    6: 1,
+    7: 1,
+    8: 2,
+    9: 4,
+    10: 8,
+    11: 4,
+    12: 8,
+    16: 8,
+    17: 8,
+    18: 8,
+}
+_TYPE_FORMATS = {3: "H", 4: "I", 16: "Q"}
+
+# First read size (GDAL_INGESTED_BYTES_AT_OPEN default).
+_FIRST_READ = 16384
+
+# Max header size.
+MAX_HEADER_SIZE = 4 * 1024 * 1024
+
+
+# Max concurrent range requests of a multi-range read.
+MAX_RANGE_THREADS = 8
+
+# HTTP errors worth a retry (GDAL_HTTP_MAX_RETRY).
+_RETRY_CODES = (429, 500, 502, 503, 504)
+
+
+class HeaderError(Exception):
+    """Dataset header cannot be cached."""
+
+
+def _get_config(name: str, default: str = None) -> str:
+    """Get a GDAL configuration option (rasterio environment or env variable)."""
+    if rasterio.env.hasenv():
+        value = rasterio.env.getenv().get(name)
+        if value is not None:
+            return str(value)
+    return os.environ.get(name, default)
+
+
+@functools.lru_cache(maxsize=None)
+def _default_session():
+    return boto3_session()
+
+
+@functools.lru_cache(maxsize=16)
+def _get_s3_client(session, endpoint_url: str = None):
+    return session.client("s3", endpoint_url=endpoint_url)
+
+
+def _get_s3_range(url_info, start: int, end: int, session=None) -> Tuple[bytes, int]:
+    """Read a S3 object range, with GDAL /vsis3/ endpoint and requester pays options."""
+    endpoint_url = None
+    endpoint = _get_config("AWS_S3_ENDPOINT")
+    if endpoint:
+        https = _get_config("AWS_HTTPS", "YES").upper() in ["YES", "TRUE", "ON"]
+        endpoint_url = f"{'https' if https else 'http'}://{endpoint}"
+
+    client = _get_s3_client(session or _default_session(), endpoint_url)
+    params = dict(
+        Bucket=url_info.netloc,
+        Key=url_info.path.strip("/"),
+        Range=f"bytes={start}-{end - 1}",
+    )
+    if (_get_config("AWS_REQUEST_PAYER") or "").lower() == "requester":
+        params["RequestPayer"] = "requester"
+
+    response = client.get_object(**params)
+    size = int(response["ContentRange"].split("/")[-1])
+    return response["Body"].read(), size
+
+
+def _get_http_range(url: str, start: int, end: int) -> Tuple[bytes, int]:
+    """Read a http(s) file range, with GDAL /vsicurl/ headers, timeout and retries."""
+    headers = {"Range": f"bytes={start}-{end - 1}"}
+    # Header lines, separated by new lines or commas
+    for line in re.split(
+        r"\r?\n|,(?=\s*[\w-]+\s*:)", _get_config("GDAL_HTTP_HEADERS", "")
+    ):
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip()] = value.strip()
+    user_agent = _get_config("GDAL_HTTP_USERAGENT")
+    if user_agent:
+        headers["User-Agent"] = user_agent
+
+    timeout = float(_get_config("GDAL_HTTP_TIMEOUT", 30))
+    retries = int(_get_config("GDAL_HTTP_MAX_RETRY", 0))
+    delay = float(_get_config("GDAL_HTTP_RETRY_DELAY", 30))
+
+    request = urllib.request.Request(url, headers=headers)
+    for attempt in range(retries + 1):
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                content_range = response.headers.get("Content-Range")
+                # A server ignoring the range would send the file from its start
+                if response.status != 206 or not content_range:
+                    raise OSError(f"{url}: range requests are not supported")
+                return response.read(), int(content_range.split("/")[-1])
+        except urllib.error.HTTPError as err:
+            if attempt == retries or err.code not in _RETRY_CODES:
+                raise
+        except (urllib.error.URLError, socket.timeout):
+            if attempt == retries:
+                raise
+        time.sleep(delay)
+
+
+def _get_range(url: str, start: int, end: int, session=None) -> Tuple[bytes, int]:
+    """Read bytes [start, end) of a S3, http(s) or local file, and its size."""
+    url_info = urlparse(url)
+    if url_info.scheme == "s3":
+        return _get_s3_range(url_info, start, end, session=session)
+
+    if url_info.scheme in ["http", "https"]:
+        return _get_http_range(url, start, end)
+
+    with open(url, "rb") as f:
+        f.seek(start)
+        return f.read(end - start), os.fstat(f.fileno()).st_size
+
+
+def parse_header(read: Callable[[int, int], bytes]) -> Tuple[int, int]:
+    """
+    Find the extent of a TIFF file metadata and the start of its data.
+
+    Walks the IFDs (classic TIFF and BigTIFF) and their tags values.
+
+    Attributes
+    ----------
+    read : callable, required
+        `read(start, end)` returning the file bytes [start, end).
+
+    Returns
+    -------
+    metadata_end, data_start : tuple
+        End of the last IFD or tag value, and first strip/tile data offset.
+
+    """
+    head = read(0, 16)
+    if head[:2] == b"II":
+        byteorder = "<"
+    elif head[:2] == b"MM":
+        byteorder = ">"
+    else:
+        raise HeaderError("Not a TIFF file")
+
+    (version,) = struct.unpack(byteorder + "H", head[2:4])
+    if version == 42:
+        count_format, entry_size, offset_format = "H", 12, "I"
+        (ifd_offset,) = struct.unpack(byteorder + "I", head[4:8])
+    elif version == 43:
+        count_format, entry_size, offset_format = "Q", 20, "Q"
+        (ifd_offset,) = struct.unpack(byteorder + "Q", head[8:16])
+    else:
+        raise HeaderError("Not a TIFF file")
+
+    count_size = struct.calcsize(count_format)
+    offset_size = struct.calcsize(offset_format)
+
+    metadata_end = 16
+    data_start = None
+    seen = set()
+    while ifd_offset and ifd_offset not in seen:
+        seen.add(ifd_offset)
+        (count,) = struct.unpack(
+            byteorder + count_format, read(ifd_offset, ifd_offset + count_size)
+        )
+        ifd_end = ifd_offset + count_size + count * entry_size + offset_size
+        ifd = read(ifd_offset + count_size, ifd_end)
+        metadata_end = max(metadata_end, ifd_end)
+
+        for idx in range(count):
+            entry = ifd[idx * entry_size : (idx + 1) * entry_size]
+            tag, field_type = struct.unpack(byteorder + "HH", entry[:4])
+            (values,) = struct.unpack(
+                byteorder + offset_format, entry[4 : 4 + offset_size]
+            )
+            size = _TYPE_SIZES.get(field_type, 1) * values
+            value = entry[4 + offset_size :]
+            if size > offset_size:
+                (value_offset,) = struct.unpack(byteorder + offset_format, value)
+                metadata_end = max(metadata_end, value_offset + size)
+                if tag in _OFFSETS_TAGS:
+                    value = read(value_offset, value_offset + size)
+
+            if tag in _OFFSETS_TAGS:
+                offsets = struct.unpack(
+                    byteorder + _TYPE_FORMATS[field_type] * values, value[:size]
+                )
+                offsets = [offset for offset in offsets if offset]
+                if offsets:
+                    data_start = min(data_start or offsets[0], min(offsets))
+
+        (ifd_offset,) = struct.unpack(byteorder + offset_format, ifd[-offset_size:])
+
+    if data_start is None:
+        raise HeaderError("No data offsets")
+
+    return metadata_end, data_start
+
+
+def read_header(
+    src_path: str, max_size: int = MAX_HEADER_SIZE, session=None
+) -> Tuple[bytes, int]:
+    """
+    Read the header of a Cloud Optimized GeoTIFF.
+
+    The header is every byte before the first strip/tile data, it must
+    contain all the IFDs and tags values (COG layout).
+
+    Attributes
+    ----------
+    src_path : str, required
+        Dataset url (s3://, http(s):// or local path).
+    max_size : int, optional (default: 4MB)
+        Max header size.
+    session : boto3.session.Session, optional
+        Session used for S3 datasets.
+
+    Returns
+    -------
+    header : bytes
+        Header bytes.
+    size : int
+        File size.
+
+    Raises
+    ------
+    HeaderError
+        When the metadata is not before the data, or the header is larger
+        than max_size.
+
+    """
+    buffer = bytearray()
+    file_size = None
+
+    def _read(start, end):
+        nonlocal file_size
+        if end > max_size:
+            raise HeaderError(f"Header larger than {max_size} bytes")
+        if end > len(buffer):
+            # Read ahead, headers are read in a few requests
+            length = max(end, 2 * len(buffer), _FIRST_READ)
+            data, file_size = _get_range(
+                src_path, len(buffer), min(length, max_size), session=session
+            )
+            buffer.extend(data)
+        return bytes(buffer[start:end])
+
+    metadata_end, data_start = parse_header(_read)
+    if metadata_end > data_start:
+        raise HeaderError("Metadata after the data (not a COG)")
+
+    return _read(0, data_start), file_size
+
+
+class _HeaderFile(io.RawIOBase):
+    """Read-only dataset file, with the header read from memory."""
+
+    def __init__(self, src_path: str, header: bytes, size: int, session=None):
+        """Initialize file."""
+        self.src_path = src_path
+        self.header = header
+        self.size = size
+        self.session = session
+        self.position = 0
+
+    def readable(self) -> bool:
+        """File is readable."""
+        return True
+
+    def seekable(self) -> bool:
+        """File is seekable."""
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """Change the file position."""
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def tell(self) -> int:
+        """Return the file position."""
+        return self.position
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        end = min(end, self.size)
+        if start >= end:
+            return b""
+
+        data = self.header[start:end]
+        if end > len(self.header):
+            data += _get_range(
+                self.src_path, max(start, len(self.header)), end, session=self.session
+            )[0]
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        """Read bytes from the file position."""
+        end = self.size if size is None or size < 0 else self.position + size
+        data = self._read_range(self.position, end)
+        self.position += len(data)
+        return data
+
+    def get_byte_ranges(
+        self, offsets: Sequence[int], sizes: Sequence[int]
+    ) -> Sequence[bytes]:
+        """Read multiple byte ranges (GDAL merges adjacent blocks), in parallel."""
+        ranges = [(offset, offset + size) for offset, size in zip(offsets, sizes)]
+        if len(ranges) == 1:
+            return [self._read_range(*ranges[0])]
+
+        max_workers = min(len(ranges), MAX_RANGE_THREADS)
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda r: self._read_range(*r), ranges))
+
+
+class _HeaderOpener(MultiByteRangeResourceContainer):
+    """rasterio opener serving one dataset (no sidecar files)."""
+
+    def __init__(self, src_path: str, header: bytes, size: int, session=None):
+        """Initialize opener."""
+        self.src_path = src_path
+        self.header = header
+        self.file_size = size
+        self.session = session
+
+    def _check(self, path: str) -> None:
+        if path != self.src_path:
+            raise FileNotFoundError(path)
+
+    def open(self, path: str, mode: str = "rb", **kwargs) -> _HeaderFile:
+        """Open the dataset (a new file object per call)."""
+        self._check(path)
+        if "r" not in mode or "+" in mode:
+            raise PermissionError(f"{path} is read-only")
+        return _HeaderFile(self.src_path, self.header, self.file_size, self.session)
+
+    def isfile(self, path: str) -> bool:
+        """Only the dataset exists."""
+        return path == self.src_path
+
+    def isdir(self, path: str) -> bool:
+        """No directories."""
+        return False
+
+    def ls(self, path: str) -> Sequence[str]:
+        """No directories."""
+        return []
+
+    def mtime(self, path: str) -> int:
+        """Dataset modification time (unknown)."""
+        self._check(path)
+        return 0
+
+    def rm(self, path: str) -> None:
+        """Datasets cannot be removed."""
+        raise PermissionError(f"{path} is read-only")
+
+    def size(self, path: str) -> int:
+        """Dataset size."""
+        self._check(path)
+        return self.file_size
+
+
+class HeaderCache(object):
+    """
+    Datasets headers cache.
+
+    Headers are read once (see `read_header`) and kept in memory and in an
+    optional persistent or shared `store` (e.g `SharedCache` in a local or
+    network directory), so new workers open the datasets without reading
+    their header again. Datasets which are not Cloud Optimized are recorded
+    as such and opened by GDAL.
+
+    Datasets are expected to be immutable: cached headers only expire with
+    the store `ttl`. Tiles data is then read with ranged GETs, using the
+    boto3 `session` for S3 and the GDAL `/vsis3/` and `/vsicurl/` options
+    (`AWS_S3_ENDPOINT`, `AWS_HTTPS`, `AWS_REQUEST_PAYER`, `GDAL_HTTP_HEADERS`,
+    `GDAL_HTTP_USERAGENT`, `GDAL_HTTP_TIMEOUT`, `GDAL_HTTP_MAX_RETRY` and
+    `GDAL_HTTP_RETRY_DELAY`).
+
+    Attributes
+    ----------
+    store : LRUCache or SharedCache, optional
+        Persistent store.
+    maxsize : int, optional (default: 1024)
+        Maximum number of headers kept in memory.
+    max_size : int, optional (default: 4MB)
+        Max header size.
+    session : boto3.session.Session, optional
+        Session used for S3 datasets (default: new session).
+
+    """
+
+    def __init__(
+        self,
+        store=None,
+        maxsize: int = 1024,
+        max_size: int = MAX_HEADER_SIZE,
+        session=None,
+    ):
+        """Initialize cache."""
+        self.store = store
+        self.max_size = max_size
+        self.session = session
+        self.reads = 0
+        self._headers = LRUCache(maxsize=maxsize)
+
+    def get(self, src_path: str) -> Any:
+        """Return dataset (header, size), or None if it cannot be cached."""
+        header = self._headers.get(src_path)
+        if header is None and self.store is not None:
+            header = self.store.get(src_path)
+            if header is not None:
+                self._headers.set(src_path, header)
+
+        if header is None:
+            try:
+                self.reads += 1
+                header = read_header(
+                    src_path, max_size=self.max_size, session=self.session
+                )
+            except HeaderError as err:
+                logger.info(f"{src_path} header not cached: {err}")
+                header = False
+            except Exception as err:
+                # Not recorded (e.g network error), GDAL will report it
+                logger.warning(f"{src_path} header could not be read: {err}")
+                return None
+
+            self._headers.set(src_path, header)
+            if self.store is not None:
+                self.store.set(src_path, header)
+
+        return header or None
+
+    def open(self, src_path: str):
+        """
+        Open a dataset with rasterio, using its cached header.
+
+        Attributes
+        ----------
+        src_path : str, required
+            Dataset url (s3://, http(s):// or local path).
+
+        Returns
+        -------
+        dataset : rasterio.io.DatasetReader
+
+        """
+        header = None
+        if MultiByteRangeResourceContainer is not object:
+            header = self.get(src_path)
+        if header is None:
+            return rasterio.open(src_path)
+
+        opener = _HeaderOpener(src_path, *header, session=self.session)
+        return rasterio.open(src_path, opener=opener)
+
+    @property
+    def stats(self) -> Dict:
+        """Return cache statistics."""
+        stats = dict(type="headers", items=len(self._headers), reads=self.reads)
+        if self.store is not None:
+            stats["store"] = self.store.stats
+        return stats
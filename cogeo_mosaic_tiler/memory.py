@@ -0,0 +1,172 @@
+"""cogeo_mosaic_tiler.memory: tile rendering working set estimation."""
+
+from typing import Tuple
+
+import numpy
+
+from cogeo_mosaic_tiler.custom_methods import STREAMING_PERCENTILES
+
+# Methods stacking every asset tile: bytes per band pixel and per asset, as
+# (a, b) for `a * tile + b` where `tile` is the bytes of a masked tile read.
+STACKING_METHODS = {"mean": (2, 2), "median": (3, 10), "stdev": (3, 14)}
+
+# Streaming replacements of the stacking methods.
+STREAMING_METHODS = {
+    "mean": "streaming_mean",
+    "median": "streaming_median",
+    "stdev": "streaming_stdev",
+}
+
+# Streaming methods state (running statistics and scratch buffers), in bytes
+# per band pixel.
+STREAMING_STATE = {"streaming_mean": 32, "streaming_median": 240, "streaming_stdev": 64}
+STREAMING_STATE.update({f"streaming_p{p}": 240 for p in STREAMING_PERCENTILES})
+
+
+class TileMemoryError(Exception):
+    """Tile cannot be rendered within the memory budget."""
+
+
+def estimate_tile_memory(
+    pixel_selection: str,
+    assets: int,
+    bands: int,
+    dtype: str,
+    tilesize: int,
+    chunk_size: int,
+) -> int:
+    """
+    Estimate the peak memory used by `mosaic_tiler` to create a tile.
+
+    `mosaic_tiler` holds up to `chunk_size` tiles being read (data, per band
+    mask and reader mask) and the pixel selection method keeps its own state:
+    a few tiles for `first`-like methods, running statistics for streaming
+    methods and every tile (plus the stacked copy and the computation
+    temporaries) for stacking methods. The coefficients were measured with
+    tracemalloc (`python benchmarks/tile_memory.py`).
+
+    Attributes
+    ----------
+    pixel_selection : str, required
+        Pixel selection method name.
+    assets : int, required
+        Number of assets.
+    bands : int, required
+        Number of bands read.
+    dtype : str, required
+        Assets data type.
+    tilesize : int, required
+        Tile width/height.
+    chunk_size : int, required
+        Number of assets read concurrently.
+
+    Returns
+    -------
+    size : int
+        Estimated peak memory in bytes.
+
+    """
+    tile = numpy.dtype(dtype).itemsize + 1 + 1 / bands
+    reading = min(chunk_size, assets) * tile
+
+    # Output tile and temporaries
+    state = 4 * tile + 8
+    if pixel_selection in STACKING_METHODS:
+        a, b = STACKING_METHODS[pixel_selection]
+        state += assets * (a * tile + b) + 8
+    elif pixel_selection in STREAMING_STATE:
+        state = STREAMING_STATE[pixel_selection]
+
+    return int(bands * tilesize * tilesize * (reading + state))
+
+
+def plan_tile_read(
+    pixel_selection: str,
+    assets: int,
+    bands: int,
+    dtype: str,
+    tilesize: int,
+    chunk_size: int,
+    budget: int,
+    streaming: bool = True,
+) -> Tuple[str, int, int]:
+    """
+    Degrade a tile read until its estimated working set fits in a budget.
+
+    In order: use the streaming version of stacking methods (`median`,
+    `mean`, `stdev`) when it uses less memory, read fewer assets
+    concurrently, and (for stacking methods) read fewer assets.
+
+    Attributes
+    ----------
+    pixel_selection : str, required
+        Pixel selection method name.
+    assets : int, required
+        Number of assets.
+    bands : int, required
+        Number of bands read.
+    dtype : str, required
+        Assets data type.
+    tilesize : int, required
+        Tile width/height.
+    chunk_size : int, required
+        Number of assets read concurrently.
+    budget : int, required
+        Memory budget in bytes.
+    streaming : bool, optional (default: True)
+        Allow switching to streaming methods.
+
+    Returns
+    -------
+    pixel_selection, assets, chunk_size : tuple
+        Method, number of assets and concurrent reads to use.
+
+    Raises
+    ------
+    TileMemoryError
+        When the tile cannot fit in the budget.
+
+    """
+
+    def _fits():
+        size = estimate_tile_memory(
+            pixel_selection, assets, bands, dtype, tilesize, chunk_size
+        )
+        return size <= budget
+
+    if _fits():
+        return pixel_selection, assets, chunk_size
+
+    requested = pixel_selection
+
+    # Streaming methods have a larger fixed state, only use them when smaller
+    if streaming and pixel_selection in STREAMING_METHODS:
+        method = STREAMING_METHODS[pixel_selection]
+        if estimate_tile_memory(
+            method, assets, bands, dtype, tilesize, chunk_size
+        ) < estimate_tile_memory(
+            pixel_selection, assets, bands, dtype, tilesize, chunk_size
+        ):
+            pixel_selection = method
+            if _fits():
+                return pixel_selection, assets, chunk_size
+
+    chunk_size = min(chunk_size, assets)
+    while chunk_size > 1 and not _fits():
+        chunk_size //= 2
+    if _fits():
+        return pixel_selection, assets, chunk_size
+
+    if requested in STACKING_METHODS:
+        pixel_selection = requested
+        while assets > 1 and not _fits():
+            assets -= 1
+        if _fits():
+            return pixel_selection, assets, chunk_size
+
+    size = estimate_tile_memory(pixel_selection, 1, bands, dtype, tilesize, 1)
+    raise TileMemoryError(
+        f"Tile requires at least {size / 1e6:.0f}MB ({bands} {dtype} bands of "
+        f"{tilesize}x{tilesize} pixels), over the {budget / 1e6:.0f}MB memory "
+        "budget: request a smaller tile scale or fewer bands"
+    )
@@ -0,0 +1,761 @@
+"""cogeo_mosaic_tiler.mosaic: mosaic definition helpers."""
+
+from typing import Dict, Sequence, Tuple
+
+import time
+import uuid
+import warnings
+import functools
+import itertools
+from concurrent import futures
+
+import numpy
+import pygeos
+import mercantile
+from supermercado import burntiles
+
+import rasterio
+from affine import Affine
+from rasterio.features import shapes
+from rasterio.warp import transform, transform_geom
+
+from cogeo_mosaic.utils import (
+    _filter_futures,
+    get_assets,
+    get_dataset_info,
+    get_mosaic_content,
+)
+
+from cogeo_mosaic_tiler.cache import LRUCache, get_cache
+from cogeo_mosaic_tiler.storage import read_sqlite_mosaic
+
+# Only used when the cache is shared between processes (see `get_cache`),
+# each process keeps its own decoded copy in `fetch_mosaic_definition` lru cache.
+definition_cache = get_cache("mosaics")
+
+# Mosaic definitions revisions, changed when a definition is overwritten (see
+# `invalidate_mosaic`). Caches keyed by revision (definitions, rendered tiles)
+# are not used after an overwrite, including in other processes when the cache
+# is shared.
+revision_cache = get_cache("revisions", maxsize=65536)
+
+# Parsed assets valid data footprints.
+footprint_cache = LRUCache(maxsize=4096)
+
+
+def get_revision(url: str) -> str:
+    """Return mosaic definition revision ("" until it is overwritten)."""
+    return revision_cache.get(url, "")
+
+
+def invalidate_mosaic(url: str) -> str:
+    """Change mosaic definition revision and drop cached copies."""
+    definition_cache.delete((url, get_revision(url)))
+    revision = uuid.uuid4().hex
+    revision_cache.set(url, revision)
+    return revision
+
+
+def refresh_mosaic(url: str) -> bool:
+    """
+    Download a mosaic definition again and drop its cached copies if changed.
+
+    Used for mosaics which can change outside of the application (`url=`).
+    Returns True when the definition changed.
+
+    """
+    if url.startswith("sqlite://"):
+        return False
+
+    if get_mosaic_content(url) == fetch_mosaic_definition(url):
+        return False
+
+    invalidate_mosaic(url)
+    return True
+
+
+def fetch_mosaic_definition(url: str) -> Dict:
+    """Get Mosaic definition info."""
+    return _fetch_mosaic_definition(url, get_revision(url))
+
+
+@functools.lru_cache(maxsize=512)
+def _fetch_mosaic_definition(url: str, revision: str) -> Dict:
+    # SQLite definitions are only partially loaded, tiles and assets are
+    # queried when needed (see `storage.SQLiteStorage`).
+    if url.startswith("sqlite://"):
+        return read_sqlite_mosaic(url)
+
+    mosaic_def = definition_cache.get((url, revision))
+    if mosaic_def is None:
+        mosaic_def = get_mosaic_content(url)
+        definition_cache.set((url, revision), mosaic_def)
+
+    return mosaic_def
+
+
+def _mask_footprint(src_dst, max_size: int = 64, erode: bool = False) -> Dict:
+    """Vectorize the dataset mask read at low resolution (see get_valid_footprint)."""
+    ratio = max(src_dst.width, src_dst.height) / max_size
+    width = max(1, round(src_dst.width / ratio))
+    height = max(1, round(src_dst.height / ratio))
+    valid = src_dst.dataset_mask(out_shape=(height, width)) > 0
+
+    # Pixels outside the dataset are considered invalid
+    padded = numpy.pad(valid, 1)
+    combine = numpy.logical_and if erode else numpy.logical_or
+    mask = valid.copy()
+    for dy, dx in itertools.product([-1, 0, 1], [-1, 0, 1]):
+        combine(
+            mask, padded[1 + dy : 1 + dy + height, 1 + dx : 1 + dx + width], out=mask
+        )
+    mask = mask.astype("uint8")
+
+    transform = src_dst.transform * Affine.scale(
+        src_dst.width / width, src_dst.height / height
+    )
+    polygons = [
+        geom["coordinates"]
+        for geom, _ in shapes(mask, mask=mask > 0, transform=transform)
+    ]
+    if not polygons:
+        return {"type": "MultiPolygon", "coordinates": []}
+
+    return transform_geom(
+        src_dst.crs,
+        "epsg:4326",
+        {"type": "MultiPolygon", "coordinates": polygons},
+        precision=6,
+    )
+
+
+def get_valid_footprint(src_path: str, max_size: int = 64, erode: bool = False) -> Dict:
+    """
+    Get the simplified valid data footprint of a dataset.
+
+    The dataset mask is read at low resolution (from overviews), dilated by one
+    pixel so the footprint always contains the valid data, and vectorized. The
+    mask resolution controls the footprint simplification.
+
+    Attributes
+    ----------
+    src_path : str, required
+        Dataset url.
+    max_size : int, optional (default: 64)
+        Mask max width/height.
+    erode : bool, optional (default: False)
+        Erode the mask by one pixel instead, so the footprint is contained in
+        the valid data (see `optimize.optimize_mosaic`).
+
+    Returns
+    -------
+    geometry : dict
+        GeoJSON MultiPolygon in EPSG:4326.
+
+    """
+    with rasterio.open(src_path) as src_dst:
+        return _mask_footprint(src_dst, max_size=max_size, erode=erode)
+
+
+def _get_footprint(src_path: str, valid_footprint: bool = False) -> Dict:
+    feature = get_dataset_info(src_path)
+    if valid_footprint:
+        feature["properties"]["footprint"] = get_valid_footprint(src_path)
+    return feature
+
+
+def get_footprints(
+    dataset_list: Sequence[str], max_threads: int = 20, valid_footprint: bool = False
+) -> Sequence[Dict]:
+    """Create footprint GeoJSON features."""
+    with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        future_work = [
+            executor.submit(_get_footprint, item, valid_footprint)
+            for item in dataset_list
+        ]
+    return list(_filter_futures(future_work))
+
+
+# Worker process state for `_assign_tiles` (see `_init_worker`).
+_worker_dataset = None
+
+
+def _init_worker(dataset: Sequence[Dict]) -> None:
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+def _assign_tiles(
+    tiles: Sequence[Tuple[int, int, int]],
+    dataset: Sequence[Dict] = None,
+    minimum_tile_cover: float = None,
+    tile_cover_sort: bool = False,
+) -> Sequence[Tuple[str, Sequence[int]]]:
+    """
+    Find the datasets intersecting each mercator tile.
+
+    Intersections (and coverages) are computed for all tiles at once with a
+    STRtree bulk query, datasets keep their input order (unless sorted by
+    coverage).
+
+    Returns
+    -------
+    tiles : list
+        (quadkey, dataset indexes) of tiles with at least one dataset.
+
+    """
+    dataset = dataset if dataset is not None else _worker_dataset
+    geoms = numpy.array([d["geometry"] for d in dataset])
+    tile_geoms = pygeos.box(*numpy.array([mercantile.bounds(*t) for t in tiles]).T)
+
+    tile_idx, data_idx = pygeos.STRtree(geoms).query_bulk(
+        tile_geoms, predicate="intersects"
+    )
+    order = numpy.lexsort((data_idx, tile_idx))
+    tile_idx, data_idx = tile_idx[order], data_idx[order]
+
+    coverage = None
+    if minimum_tile_cover is not None or tile_cover_sort:
+        # Same as `cogeo_mosaic.utils._intersect_percent`, for all pairs at once
+        pair_tiles = tile_geoms[tile_idx]
+        coverage = pygeos.area(
+            pygeos.intersection(pair_tiles, geoms[data_idx])
+        ) / pygeos.area(pair_tiles)
+
+    results = []
+    splits = numpy.flatnonzero(numpy.diff(tile_idx)) + 1
+    for idx in numpy.split(numpy.arange(len(tile_idx)), splits):
+        if not len(idx):
+            continue
+        if coverage is not None:
+            cover = coverage[idx]
+            if minimum_tile_cover is not None:
+                idx, cover = (
+                    idx[cover > minimum_tile_cover],
+                    cover[cover > minimum_tile_cover],
+                )
+            if tile_cover_sort:
+                idx = idx[numpy.argsort(-cover, kind="stable")]
+            if not len(idx):
+                continue
+
+        tile = tiles[tile_idx[idx[0]]]
+        results.append((mercantile.quadkey(*tile), data_idx[idx].tolist()))
+
+    return results
+
+
+def create_mosaic(
+    dataset_list: Sequence[str],
+    minzoom: int = None,
+    maxzoom: int = None,
+    max_threads: int = 20,
+    minimum_tile_cover: float = None,
+    tile_cover_sort: bool = False,
+    valid_footprint: bool = False,
+    version: str = "0.0.2",
+    max_processes: int = None,
+    timings: Dict = None,
+) -> Dict:
+    """
+    Create mosaic definition content.
+
+    Same as `cogeo_mosaic.utils.create_mosaic` but also stores each asset
+    bounds (and optionally valid data footprint) in the definition `assets`
+    key, so tile handlers can skip assets not intersecting a tile.
+
+    Attributes
+    ----------
+    dataset_list : tuple or list, required
+        Dataset urls.
+    minzoom: int, optional
+        Force mosaic min-zoom.
+    maxzoom: int, optional
+        Force mosaic max-zoom.
+    max_threads : int
+        Max threads to use to read the datasets footprints (default: 20).
+    minimum_tile_cover: float, optional (default: 0)
+        Filter files with low tile intersection coverage.
+    tile_cover_sort: bool, optional (default: None)
+        Sort intersecting files by coverage.
+    valid_footprint: bool, optional (default: False)
+        Store simplified valid data footprint.
+    version: str, optional
+        mosaicJSON definition version
+    max_processes: int, optional
+        Use a pool of processes to find the quadkeys datasets (default: None,
+        in the current process).
+    timings: dict, optional
+        Filled with each stage duration in seconds (`footprints`, `quadkeys`
+        and `assets`).
+
+    Returns
+    -------
+    mosaic_definition : dict
+        Mosaic definition.
+
+    """
+    if version not in ["0.0.1", "0.0.2"]:
+        raise Exception(f"Invalid mosaicJSON's version: {version}")
+
+    timings = timings if timings is not None else {}
+
+    t0 = time.perf_counter()
+    results = get_footprints(
+        dataset_list, max_threads=max_threads, valid_footprint=valid_footprint
+    )
+    timings["footprints"] = time.perf_counter() - t0
+
+    return create_mosaic_from_features(
+        results,
+        minzoom=minzoom,
+        maxzoom=maxzoom,
+        minimum_tile_cover=minimum_tile_cover,
+        tile_cover_sort=tile_cover_sort,
+        version=version,
+        max_processes=max_processes,
+        timings=timings,
+    )
+
+
+def create_mosaic_from_features(
+    results: Sequence[Dict],
+    minzoom: int = None,
+    maxzoom: int = None,
+    minimum_tile_cover: float = None,
+    tile_cover_sort: bool = False,
+    version: str = "0.0.2",
+    max_processes: int = None,
+    timings: Dict = None,
+) -> Dict:
+    """
+    Create mosaic definition content from datasets footprints.
+
+    Attributes
+    ----------
+    results : list, required
+        Datasets footprints (see `get_footprints`).
+
+    See `create_mosaic` for the other options.
+
+    Returns
+    -------
+    mosaic_definition : dict
+        Mosaic definition.
+
+    """
+    timings = timings if timings is not None else {}
+
+    if minzoom is None:
+        minzoom = list(set([feat["properties"]["minzoom"] for feat in results]))
+        if len(minzoom) > 1:
+            warnings.warn(
+                "Multiple MinZoom, Assets different minzoom values", UserWarning
+            )
+        minzoom = max(minzoom)
+
+    if maxzoom is None:
+        maxzoom = list(set([feat["properties"]["maxzoom"] for feat in results]))
+        if len(maxzoom) > 1:
+            warnings.warn(
+                "Multiple MaxZoom, Assets have multiple resolution values", UserWarning
+            )
+        maxzoom = max(maxzoom)
+
+    datatype = list(set([feat["properties"]["datatype"] for feat in results]))
+    if len(datatype) > 1:
+        raise Exception("Dataset should have the same data type")
+
+    quadkey_zoom = minzoom
+    bounds = burntiles.find_extrema(results)
+    mosaic_definition = dict(
+        mosaicjson=version,
+        minzoom=minzoom,
+        maxzoom=maxzoom,
+        bounds=bounds,
+        center=[(bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2, minzoom],
+        tiles={},
+        version="1.0.0",
+    )
+    if version == "0.0.2":
+        mosaic_definition.update(dict(quadkey_zoom=quadkey_zoom))
+
+    t0 = time.perf_counter()
+    dataset_geoms = pygeos.polygons(
+        [feat["geometry"]["coordinates"][0] for feat in results]
+    )
+    dataset = [
+        {"path": f["properties"]["path"], "geometry": geom}
+        for (f, geom) in zip(results, dataset_geoms)
+    ]
+
+    tiles = [tuple(tile) for tile in burntiles.burn(results, quadkey_zoom).tolist()]
+    options = dict(
+        minimum_tile_cover=minimum_tile_cover, tile_cover_sort=tile_cover_sort
+    )
+    if max_processes and max_processes > 1 and len(tiles) > 1:
+        chunksize = -(-len(tiles) // max_processes)
+        chunks = [tiles[i : i + chunksize] for i in range(0, len(tiles), chunksize)]
+        with futures.ProcessPoolExecutor(
+            max_workers=max_processes, initializer=_init_worker, initargs=(dataset,)
+        ) as executor:
+            assigned = itertools.chain.from_iterable(
+                executor.map(functools.partial(_assign_tiles, **options), chunks)
+            )
+            assigned = list(assigned)
+    else:
+        assigned = _assign_tiles(tiles, dataset, **options)
+
+    for quadkey, indexes in assigned:
+        mosaic_definition["tiles"][quadkey] = [dataset[i]["path"] for i in indexes]
+    timings["quadkeys"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    mosaic_definition["assets"] = {}
+    for feat in results:
+        coords = feat["geometry"]["coordinates"][0]
+        info = dict(bounds=[coords[0][0], coords[1][1], coords[2][0], coords[0][1]])
+        if feat["properties"].get("footprint"):
+            info["footprint"] = feat["properties"]["footprint"]
+        mosaic_definition["assets"][feat["properties"]["path"]] = info
+    timings["assets"] = time.perf_counter() - t0
+
+    return mosaic_definition
+
+
+def _to_geometry(geom: Dict) -> pygeos.Geometry:
+    """Convert a GeoJSON (Multi)Polygon to a pygeos geometry."""
+    polygons = geom["coordinates"]
+    if geom["type"] == "Polygon":
+        polygons = [polygons]
+
+    return pygeos.multipolygons(
+        [pygeos.polygons(rings[0], holes=rings[1:] or None) for rings in polygons]
+    )
+
+
+def filter_assets(
+    mosaic_def: Dict, assets: Sequence[str], bounds: Sequence[float]
+) -> Sequence[str]:
+    """
+    Remove assets not intersecting with bounds.
+
+    Uses the asset bounds (and valid data footprint when available) stored in
+    the mosaic definition `assets` key. Assets without metadata are kept.
+
+    Attributes
+    ----------
+    mosaic_def : dict, required
+        Mosaic definition.
+    assets : list, required
+        List of assets.
+    bounds : list, required
+        Bounds (west, south, east, north) in EPSG:4326.
+
+    Returns
+    -------
+    assets : list
+        Intersecting assets.
+
+    """
+    assets_info = mosaic_def.get("assets")
+    if not assets_info:
+        return assets
+
+    west, south, east, north = bounds
+    bbox = None
+
+    def _intersects(asset):
+        nonlocal bbox
+
+        info = assets_info.get(asset)
+        if not info:
+            return True
+
+        aw, as_, ae, an = info["bounds"]
+        if aw > east or ae < west or as_ > north or an < south:
+            return False
+
+        if info.get("footprint"):
+            if bbox is None:
+                bbox = pygeos.box(west, south, east, north)
+            footprint = footprint_cache.get(asset)
+            if footprint is None:
+                footprint = _to_geometry(info["footprint"])
+                footprint_cache.set(asset, footprint)
+            return bool(pygeos.intersects(footprint, bbox))
+
+        return True
+
+    return [asset for asset in assets if _intersects(asset)]
+
+
+def sort_assets_by_coverage(
+    mosaic_def: Dict, assets: Sequence[str], bounds: Sequence[float]
+) -> Sequence[str]:
+    """
+    Sort assets by decreasing coverage of bounds, keeping their priority.
+
+    The coverage is the area of the intersection between the bounds and the
+    asset valid data footprint (or bounds) stored in the mosaic definition
+    `assets` key. An asset is only moved ahead of higher priority assets
+    which do not intersect it within the bounds, so every pixel keeps the
+    same assets order and the pixel selection result does not change. Assets
+    with the same coverage keep their order, and assets without metadata are
+    not moved.
+
+    Attributes
+    ----------
+    mosaic_def : dict, required
+        Mosaic definition.
+    assets : list, required
+        List of assets.
+    bounds : list, required
+        Bounds (west, south, east, north) in EPSG:4326.
+
+    Returns
+    -------
+    assets : list
+        Sorted assets.
+
+    """
+    assets_info = mosaic_def.get("assets")
+    if not assets_info or len(assets) < 2:
+        return list(assets)
+
+    west, south, east, north = bounds
+    bbox = pygeos.box(west, south, east, north)
+
+    def _geometry(asset):
+        info = assets_info.get(asset)
+        if not info:
+            return None
+
+        if info.get("footprint"):
+            footprint = footprint_cache.get(asset)
+            if footprint is None:
+                footprint = _to_geometry(info["footprint"])
+                footprint_cache.set(asset, footprint)
+            return footprint
+
+        return pygeos.box(*info["bounds"])
+
+    geometries = [_geometry(asset) for asset in assets]
+    known = numpy.array([geom is not None for geom in geometries])
+    parts = pygeos.intersection(
+        numpy.array([geom if geom is not None else bbox for geom in geometries]), bbox,
+    )
+    areas = pygeos.area(parts)
+
+    # Coverage is rounded so small numerical differences do not break ties
+    coverage = numpy.where(known, numpy.round(areas / pygeos.area(bbox), 6), 0)
+
+    # Assets without metadata overlap every asset
+    overlaps = pygeos.area(pygeos.intersection(parts[:, None], parts[None, :])) > 0
+    overlaps |= ~known[:, None] | ~known[None, :]
+
+    remaining = list(range(len(assets)))
+    order = []
+    while remaining:
+        best = None
+        for idx, asset_idx in enumerate(remaining):
+            # Higher priority assets intersecting this one must be read first
+            if overlaps[asset_idx, remaining[:idx]].any():
+                continue
+            if best is None or coverage[asset_idx] > coverage[best]:
+                best = asset_idx
+        order.append(best)
+        remaining.remove(best)
+
+    return [assets[idx] for idx in order]
+
+
+def get_minzoom(mosaic_def: Dict) -> int:
+    """Return the mosaic minzoom, including overviews zoom levels."""
+    overviews = mosaic_def.get("overviews")
+    return overviews["minzoom"] if overviews else mosaic_def["minzoom"]
+
+
+def get_overviews(mosaic_def: Dict, pixel_selection: str = None) -> Dict:
+    """
+    Return the mosaic overviews definition, if usable with the pixel selection.
+
+    Overview COGs are built with one method (`first` when not recorded),
+    other methods (and `last`) read the mosaic assets.
+
+    """
+    overviews = mosaic_def.get("overviews")
+    if not overviews:
+        return None
+
+    method = overviews.get("pixel_selection", "first")
+    if pixel_selection and pixel_selection != method:
+        return None
+
+    return overviews
+
+
+def check_pixel_selection(mosaic_def: Dict, pixel_selection: str = None) -> None:
+    """
+    Check the pixel selection method is supported by the mosaic definition.
+
+    Optimized definitions (see `optimize.optimize_mosaic`) only render the
+    original tiles with the method they were optimized for.
+
+    Raises ValueError otherwise.
+
+    """
+    optimized = mosaic_def.get("optimized")
+    if pixel_selection and optimized and pixel_selection != optimized:
+        raise ValueError(
+            f"Optimized mosaic only supports '{optimized}' pixel selection"
+        )
+
+
+def fetch_and_find_assets(
+    mosaic_path: str,
+    x: int,
+    y: int,
+    z: int,
+    reverse: bool = False,
+    sort_by_coverage: bool = False,
+    pixel_selection: str = None,
+) -> Tuple[str]:
+    """
+    Fetch mosaic definition file and find assets.
+
+    Attributes
+    ----------
+    mosaic_path : str, required
+        Mosaic definition url.
+    x, y, z : int, required
+        Mercator tile.
+    reverse : bool, optional (default: False)
+        Reverse the stored assets order (e.g for `last` pixel selection).
+    sort_by_coverage : bool, optional (default: False)
+        Put the assets covering most of the tile first (see
+        `sort_assets_by_coverage`), so methods exiting when the tile is filled
+        read fewer assets.
+    pixel_selection : str, optional
+        Pixel selection method, checked with `check_pixel_selection`.
+
+    Returns
+    -------
+    assets : list
+        Tile assets.
+
+    """
+    mosaic_def = fetch_mosaic_definition(mosaic_path)
+    check_pixel_selection(mosaic_def, pixel_selection)
+
+    # Zooms below the mosaic minzoom are served from pre-aggregated overviews
+    overviews = get_overviews(mosaic_def, pixel_selection)
+    if overviews and overviews["minzoom"] <= z <= overviews["maxzoom"]:
+        assets = get_assets(overviews, x, y, z)
+        return list(reversed(assets)) if reverse else assets
+
+    bounds = mercantile.bounds(x, y, z)
+    assets = filter_assets(mosaic_def, get_assets(mosaic_def, x, y, z), bounds)
+    if reverse:
+        assets = list(reversed(assets))
+    if sort_by_coverage:
+        assets = sort_assets_by_coverage(mosaic_def, assets, bounds)
+    return assets
+
+
+def fetch_and_find_assets_point(mosaic_path: str, lng: float, lat: float) -> Tuple[str]:
+    """Fetch mosaic definition file and find assets."""
+    mosaic_def = fetch_mosaic_definition(mosaic_path)
+    min_zoom = mosaic_def["minzoom"]
+    quadkey_zoom = mosaic_def.get("quadkey_zoom", min_zoom)  # 0.0.2
+    tile = mercantile.tile(lng, lat, quadkey_zoom)
+
+    assets = get_assets(mosaic_def, tile.x, tile.y, tile.z)
+    return filter_assets(mosaic_def, assets, (lng, lat, lng, lat))
+
+
+def fetch_and_find_assets_bbox(
+    mosaic_path: str,
+    bounds: Sequence[float],
+    reverse: bool = False,
+    pixel_selection: str = None,
+) -> Tuple[str]:
+    """
+    Fetch mosaic definition file and find the assets intersecting bounds.
+
+    Attributes
+    ----------
+    mosaic_path : str, required
+        Mosaic definition url.
+    bounds : list, required
+        Bounds (west, south, east, north) in EPSG:4326.
+    reverse : bool, optional (default: False)
+        Reverse the stored assets order (e.g for `last` pixel selection).
+    pixel_selection : str, optional
+        Pixel selection method, checked with `check_pixel_selection`.
+
+    Returns
+    -------
+    assets : list
+        Unique assets, in mosaic order.
+
+    """
+    mosaic_def = fetch_mosaic_definition(mosaic_path)
+    check_pixel_selection(mosaic_def, pixel_selection)
+    min_zoom = mosaic_def["minzoom"]
+    quadkey_zoom = mosaic_def.get("quadkey_zoom", min_zoom)  # 0.0.2
+
+    assets = itertools.chain.from_iterable(
+        get_assets(mosaic_def, tile.x, tile.y, tile.z)
+        for tile in mercantile.tiles(*bounds, quadkey_zoom)
+    )
+    assets = filter_assets(mosaic_def, list(dict.fromkeys(assets)), bounds)
+    return list(reversed(assets)) if reverse else assets
+
+
+def _get_point(asset: str, lng: float, lat: float, indexes: Sequence[int] = None):
+    with rasterio.open(asset) as src_dst:
+        xs, ys = transform("epsg:4326", src_dst.crs, [lng], [lat])
+        west, south, east, north = src_dst.bounds
+        if not (west < xs[0] < east and south < ys[0] < north):
+            raise Exception("Outside bounds")
+
+        indexes = indexes or src_dst.indexes
+        values = list(src_dst.sample([(xs[0], ys[0])], indexes=indexes))[0]
+        return {"asset": asset, "values": values.tolist()}
+
+
+def get_point_values(
+    assets: Sequence[str],
+    lng: float,
+    lat: float,
+    indexes: Sequence[int] = None,
+    max_threads: int = 20,
+) -> Sequence[Dict]:
+    """
+    Read assets values at a point.
+
+    Same as `cogeo_mosaic.utils.get_point_values` but only reads `indexes`.
+
+    Attributes
+    ----------
+    assets : list, required
+        Dataset urls.
+    lng, lat : float, required
+        Point coordinates.
+    indexes : list, optional
+        Band indexes to read (default: all).
+    max_threads : int, optional (default: 20)
+        Max threads to use.
+
+    Returns
+    -------
+    values : list
+        Values of the assets covering the point ({"asset", "values"}).
+
+    """
+    with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        future_work = [
+            executor.submit(_get_point, asset, lng, lat, indexes) for asset in assets
+        ]
+    return list(_filter_futures(future_work))
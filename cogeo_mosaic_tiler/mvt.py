@@ -0,0 +1,140 @@
+"""cogeo_mosaic_tiler.mvt: polygonized and aggregated vector tile encoders."""
+
+from typing import Sequence
+
+import numpy
+
+from rasterio.features import shapes
+
+from vtzero.tile import Tile, Layer, Polygon
+
+# MVT tile extent
+EXTENT = 4096
+
+
+def _band_names(data: numpy.ndarray, band_names: Sequence[str] = None):
+    return band_names or [f"band{ix}" for ix in range(1, data.shape[0] + 1)]
+
+
+def polygons_encoder(
+    data: numpy.ndarray,
+    mask: numpy.ndarray,
+    band_names: Sequence[str] = None,
+    layer_name: str = "my_layer",
+) -> bytes:
+    """
+    Encode contiguous pixels with equal values as polygons.
+
+    Pixels are labeled by their (multi-band) value and the labels are
+    vectorized with GDAL polygonize, so each feature covers a region of
+    4-connected pixels sharing the same values on all bands.
+
+    Attributes
+    ----------
+    data : numpy.ndarray, required
+        Tile data (bands, height, width).
+    mask : numpy.ndarray, required
+        Tile mask (height, width).
+    band_names : list, optional
+        Band names used as feature property names (default: band{N}).
+    layer_name : str, optional (default: "my_layer")
+        MVT layer name.
+
+    Returns
+    -------
+    content : bytes
+        Mapbox Vector Tile.
+
+    """
+    band_names = _band_names(data, band_names)
+    nbands, height, width = data.shape
+    scale = EXTENT // max(height, width)
+
+    values, labels = numpy.unique(
+        data.reshape(nbands, -1).T, axis=0, return_inverse=True
+    )
+    labels = labels.reshape(height, width).astype(numpy.int32)
+    values = [[str(v).encode() for v in row] for row in values.tolist()]
+    names = [name.encode() for name in band_names]
+
+    mvt = Tile()
+    mvt_layer = Layer(mvt, layer_name.encode())
+    for geom, label in shapes(labels, mask=mask > 0, connectivity=4):
+        feature = Polygon(mvt_layer)
+        for ring in geom["coordinates"]:
+            # GDAL polygonize exterior rings are counter-clockwise in pixel
+            # space (y down), MVT wants them clockwise (and holes reversed).
+            feature.add_ring(len(ring))
+            for x, y in reversed(ring):
+                feature.set_point(int(x) * scale, int(y) * scale)
+
+        for name, value in zip(names, values[int(label)]):
+            feature.add_property(name, value)
+        feature.commit()
+
+    return mvt.serialize()
+
+
+def grid_encoder(
+    data: numpy.ndarray,
+    mask: numpy.ndarray,
+    band_names: Sequence[str] = None,
+    layer_name: str = "my_layer",
+    cell_size: int = 8,
+) -> bytes:
+    """
+    Encode the mean of valid pixels in `cell_size` x `cell_size` cells.
+
+    Attributes
+    ----------
+    data : numpy.ndarray, required
+        Tile data (bands, height, width).
+    mask : numpy.ndarray, required
+        Tile mask (height, width).
+    band_names : list, optional
+        Band names used as feature property names (default: band{N}).
+    layer_name : str, optional (default: "my_layer")
+        MVT layer name.
+    cell_size : int, optional (default: 8)
+        Grid cell size in pixels, should divide the tile size.
+
+    Returns
+    -------
+    content : bytes
+        Mapbox Vector Tile, with the band means and the number of valid
+        pixels (`count`) as properties of each cell.
+
+    """
+    band_names = _band_names(data, band_names)
+    nbands, height, width = data.shape
+    if height % cell_size or width % cell_size:
+        raise Exception(f"Tile size should be a multiple of cell size {cell_size}")
+
+    rows, cols = height // cell_size, width // cell_size
+    valid = (mask > 0).reshape(rows, cell_size, cols, cell_size)
+    count = valid.sum(axis=(1, 3))
+    sums = numpy.where(valid, data.reshape(nbands, rows, cell_size, cols, cell_size), 0)
+    sums = sums.sum(axis=(2, 4), dtype=numpy.float64)
+
+    cell_rows, cell_cols = numpy.nonzero(count)
+    means = sums[:, cell_rows, cell_cols] / count[cell_rows, cell_cols]
+
+    step = EXTENT // max(rows, cols)
+    names = [name.encode() for name in band_names]
+
+    mvt = Tile()
+    mvt_layer = Layer(mvt, layer_name.encode())
+    for idx, (row, col) in enumerate(zip(cell_rows.tolist(), cell_cols.tolist())):
+        x0, y0 = col * step, row * step
+        x1, y1 = x0 + step, y0 + step
+        feature = Polygon(mvt_layer)
+        feature.add_ring(5)
+        for px, py in [(x0, y0), (x1, y0), (x1, y1), (x0, y1), (x0, y0)]:
+            feature.set_point(px, py)
+
+        for name, value in zip(names, means[:, idx].tolist()):
+            feature.add_property(name, f"{value:g}".encode())
+        feature.add_property(b"count", str(count[row, col]).encode())
+        feature.commit()
+
+    return mvt.serialize()
@@ -0,0 +1,165 @@
+"""cogeo_mosaic_tiler.optimize: remove redundant assets from mosaic definitions."""
+
+from typing import Dict, Tuple
+
+import logging
+from concurrent import futures
+
+import pygeos
+import mercantile
+import rasterio
+
+from cogeo_mosaic_tiler.mosaic import _mask_footprint, _to_geometry
+
+logger = logging.getLogger(__name__)
+
+
+def get_asset_footprints(
+    src_path: str, max_size: int = 64
+) -> Tuple[pygeos.Geometry, pygeos.Geometry]:
+    """
+    Get the outer and inner valid data footprints of a dataset.
+
+    The outer footprint (mask dilated by one pixel) contains all the valid
+    data, the inner footprint (mask eroded by one pixel) only contains valid
+    data.
+
+    Attributes
+    ----------
+    src_path : str, required
+        Dataset url.
+    max_size : int, optional (default: 64)
+        Mask max width/height.
+
+    Returns
+    -------
+    outer, inner : pygeos.Geometry
+        Footprints in EPSG:4326.
+
+    """
+    with rasterio.open(src_path) as src_dst:
+        return tuple(
+            _to_geometry(_mask_footprint(src_dst, max_size=max_size, erode=erode))
+            for erode in [False, True]
+        )
+
+
+def _get_footprints(src_path: str, max_size: int):
+    try:
+        return get_asset_footprints(src_path, max_size=max_size)
+    except Exception as e:
+        logger.warning(f"Cannot read {src_path} footprints, asset is kept: {e}")
+        return None
+
+
+def optimize_mosaic(
+    mosaic_def: Dict, max_assets: int = None, max_threads: int = 20, max_size: int = 64,
+) -> Tuple[Dict, Dict]:
+    """
+    Remove the assets which cannot contribute to tiles with `first` selection.
+
+    For each quadkey, assets are walked in order while keeping the union of
+    the area already covered by valid data. An asset is removed when its
+    valid data footprint does not intersect the quadkey or is fully covered
+    by the previous assets. The area covered is built from the inner (eroded)
+    footprints and compared to the outer (dilated) footprints, so an asset is
+    only removed when its pixels are known to be hidden. Assets which cannot
+    be read are kept and do not cover the following ones.
+
+    The optimized definition renders the same tiles with the `first` pixel
+    selection. Other methods (e.g `mean`, `highest`) use every asset of a
+    pixel: the definition is marked with `"optimized": "first"` so they can
+    be rejected. Metadata of assets no longer listed in any quadkey are
+    dropped.
+
+    Attributes
+    ----------
+    mosaic_def : dict, required
+        Mosaic definition.
+    max_assets : int, optional
+        Maximum number of assets per quadkey (after pruning).
+    max_threads : int, optional (default: 20)
+        Max threads to use for reading the assets masks.
+    max_size : int, optional (default: 64)
+        Masks max width/height.
+
+    Returns
+    -------
+    mosaic_def : dict
+        Optimized mosaic definition (the input is not modified).
+    report : dict
+        Number of assets references before/after, removed references by
+        reason ("outside", "occluded", "capped"), assets no longer used by
+        any quadkey and assets removed by quadkey.
+
+    """
+    tiles = {quadkey: list(assets) for quadkey, assets in mosaic_def["tiles"].items()}
+    assets_list = list(dict.fromkeys(a for assets in tiles.values() for a in assets))
+
+    with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        footprints = dict(
+            zip(
+                assets_list,
+                executor.map(lambda a: _get_footprints(a, max_size), assets_list),
+            )
+        )
+
+    removed = {"outside": 0, "occluded": 0, "capped": 0}
+    removed_by_quadkey = {}
+    optimized = {}
+    for quadkey, assets in tiles.items():
+        tile_geom = pygeos.box(*mercantile.bounds(mercantile.quadkey_to_tile(quadkey)))
+        covered = None
+        kept = []
+        for asset in assets:
+            if footprints[asset] is None:
+                kept.append(asset)
+                continue
+
+            outer, inner = footprints[asset]
+            part = pygeos.intersection(outer, tile_geom)
+            if pygeos.area(part) == 0:
+                removed["outside"] += 1
+                continue
+
+            if covered is not None and pygeos.covers(covered, part):
+                removed["occluded"] += 1
+                continue
+
+            kept.append(asset)
+            inner = pygeos.intersection(inner, tile_geom)
+            if pygeos.is_empty(inner):
+                continue
+            covered = inner if covered is None else pygeos.union(covered, inner)
+
+        if max_assets and len(kept) > max_assets:
+            removed["capped"] += len(kept) - max_assets
+            kept = kept[:max_assets]
+
+        if len(kept) < len(assets):
+            kept_set = set(kept)
+            removed_by_quadkey[quadkey] = [a for a in assets if a not in kept_set]
+        if kept:
+            optimized[quadkey] = kept
+
+    used = set(a for assets in optimized.values() for a in assets)
+
+    mosaic_def = dict(mosaic_def)
+    mosaic_def["tiles"] = optimized
+    mosaic_def["optimized"] = "first"
+    if mosaic_def.get("assets"):
+        mosaic_def["assets"] = {
+            asset: info for asset, info in mosaic_def["assets"].items() if asset in used
+        }
+
+    report = {
+        "quadkeys": {"before": len(tiles), "after": len(optimized)},
+        "assets": {
+            "before": sum(len(assets) for assets in tiles.values()),
+            "after": sum(len(assets) for assets in optimized.values()),
+        },
+        "removed": removed,
+        "unused": [asset for asset in assets_list if asset not in used],
+        "tiles": removed_by_quadkey,
+    }
+    return mosaic_def, report
@@ -0,0 +1,226 @@
+"""cogeo_mosaic_tiler.overviews: low resolution overviews for mosaic coarse zooms."""
+
+from typing import Dict, Sequence
+
+import numpy
+
+import mercantile
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.enums import Resampling
+from rasterio.shutil import copy as rio_copy
+from rasterio.transform import from_bounds
+from rasterio.windows import Window
+
+from rio_tiler.main import tile as cogeoTiler
+from rio_tiler_mosaic.mosaic import mosaic_tiler
+from rio_tiler_mosaic.methods.base import MosaicMethodBase
+from rio_tiler_mosaic.methods.defaults import FirstMethod
+
+from cogeo_mosaic.utils import get_assets
+
+from cogeo_mosaic_tiler.utils import _put_data
+
+from boto3.session import Session as boto3_session
+
+
+def _get_children(tile: mercantile.Tile, zoom: int) -> Sequence[mercantile.Tile]:
+    tiles = [tile]
+    while tiles[0].z < zoom:
+        tiles = sum([mercantile.children(t) for t in tiles], [])
+    return tiles
+
+
+def create_overview(
+    mosaic_def: Dict,
+    tile: mercantile.Tile,
+    maxzoom: int,
+    tilesize: int = 256,
+    indexes: Sequence[int] = None,
+    pixel_selection: MosaicMethodBase = FirstMethod,
+    resampling_method: str = "nearest",
+) -> bytes:
+    """
+    Create a COG covering a mercator tile from the mosaic assets.
+
+    Attributes
+    ----------
+    mosaic_def : dict, required
+        Mosaic definition.
+    tile : mercantile.Tile, required
+        Mercator tile covered by the overview.
+    maxzoom : int, required
+        Zoom level of the overview full resolution.
+    tilesize : int, optional (default: 256)
+        Tile and COG internal block size.
+    indexes : tuple, optional
+        Dataset band indexes (default: all bands).
+    pixel_selection : MosaicMethodBase, optional (default: FirstMethod)
+        Mosaic pixel selection method class.
+    resampling_method : str, optional (default: "nearest")
+        Tiler and overviews resampling method.
+
+    Returns
+    -------
+    content : bytes
+        COG content, or None if the tile does not contain any data.
+
+    """
+    first_asset = next(iter(mosaic_def["tiles"].values()))[0]
+    with rasterio.open(first_asset) as src_dst:
+        count = len(indexes) if indexes else src_dst.count
+        dtype = src_dst.dtypes[0]
+
+    width = tilesize * 2 ** (maxzoom - tile.z)
+    profile = dict(
+        driver="GTiff",
+        width=width,
+        height=width,
+        count=count,
+        dtype=dtype,
+        crs="epsg:3857",
+        transform=from_bounds(*mercantile.xy_bounds(tile), width, width),
+        tiled=True,
+        blockxsize=tilesize,
+        blockysize=tilesize,
+        compress="deflate",
+    )
+
+    x_origin = tile.x * 2 ** (maxzoom - tile.z)
+    y_origin = tile.y * 2 ** (maxzoom - tile.z)
+
+    with rasterio.Env(GDAL_TIFF_INTERNAL_MASK=True), MemoryFile() as mem:
+        has_data = False
+        with mem.open(**profile) as dst:
+            dst.write_mask(numpy.zeros((width, width), dtype="uint8"))
+            for child in _get_children(tile, maxzoom):
+                assets = get_assets(mosaic_def, child.x, child.y, child.z)
+                if not assets:
+                    continue
+
+                data, mask = mosaic_tiler(
+                    assets,
+                    child.x,
+                    child.y,
+                    child.z,
+                    cogeoTiler,
+                    indexes=indexes,
+                    tilesize=tilesize,
+                    pixel_selection=pixel_selection(),
+                    resampling_method=resampling_method,
+                )
+                if data is None:
+                    continue
+
+                window = Window(
+                    (child.x - x_origin) * tilesize,
+                    (child.y - y_origin) * tilesize,
+                    tilesize,
+                    tilesize,
+                )
+                dst.write(data.astype(dtype), window=window)
+                dst.write_mask(mask.astype("uint8"), window=window)
+                has_data = True
+
+            if not has_data:
+                return None
+
+            factors = []
+            while width // 2 ** (len(factors) + 1) >= tilesize:
+                factors.append(2 ** (len(factors) + 1))
+            if factors:
+                dst.build_overviews(factors, Resampling[resampling_method])
+
+        with mem.open() as src_dst, MemoryFile() as cog:
+            rio_copy(
+                src_dst,
+                cog.name,
+                driver="GTiff",
+                copy_src_overviews=True,
+                tiled=True,
+                blockxsize=tilesize,
+                blockysize=tilesize,
+                compress="deflate",
+            )
+            return cog.read()
+
+
+def create_overviews(
+    mosaic_def: Dict,
+    prefix: str,
+    levels: int = 3,
+    tilesize: int = 256,
+    indexes: Sequence[int] = None,
+    pixel_selection: MosaicMethodBase = FirstMethod,
+    resampling_method: str = "nearest",
+    client: boto3_session.client = None,
+    method: str = "first",
+) -> Dict:
+    """
+    Create overview COGs for the zoom levels below the mosaic minzoom.
+
+    One COG is created per mercator tile at `minzoom - levels`, with a
+    resolution matching `minzoom - 1`, so that the coarse zoom levels
+    can be served from a handful of files instead of every asset.
+
+    Attributes
+    ----------
+    mosaic_def : dict, required
+        Mosaic definition.
+    prefix : str, required
+        Output location prefix (s3 url or local directory).
+    levels : int, optional (default: 3)
+        Number of zoom levels to create.
+    tilesize : int, optional (default: 256)
+        Tile size.
+    indexes : tuple, optional
+        Dataset band indexes (default: all bands).
+    pixel_selection : MosaicMethodBase, optional (default: FirstMethod)
+        Mosaic pixel selection method class.
+    resampling_method : str, optional (default: "nearest")
+        Tiler and overviews resampling method.
+    client : boto3.session.client, optional
+        S3 client.
+    method : str, optional (default: "first")
+        Pixel selection method name, recorded in the overviews definition:
+        tiles using other methods are read from the assets.
+
+    Returns
+    -------
+    overviews : dict
+        Overviews definition (quadkey index), to be stored in the mosaic
+        definition `overviews` key.
+
+    """
+    maxzoom = mosaic_def["minzoom"] - 1
+    if maxzoom < 0:
+        raise Exception("Mosaic minzoom should be greater than 0")
+
+    minzoom = max(0, maxzoom - levels + 1)
+
+    overviews = dict(
+        minzoom=minzoom,
+        maxzoom=maxzoom,
+        quadkey_zoom=minzoom,
+        pixel_selection=method,
+        tiles={},
+    )
+    for tile in mercantile.tiles(*mosaic_def["bounds"], zooms=minzoom):
+        content = create_overview(
+            mosaic_def,
+            tile,
+            maxzoom,
+            tilesize=tilesize,
+            indexes=indexes,
+            pixel_selection=pixel_selection,
+            resampling_method=resampling_method,
+        )
+        if content is None:
+            continue
+
+        quadkey = mercantile.quadkey(tile)
+        path = f"{prefix}/{quadkey}.tif"
+        _put_data(path, content, client=client)
+        overviews["tiles"][quadkey] = [path]
+
+    return overviews
@@ -0,0 +1,256 @@
+"""cogeo_mosaic_tiler.preview: whole mosaic low resolution image."""
+
+from typing import Sequence, Tuple
+
+import os
+import math
+import multiprocessing
+from concurrent import futures
+
+import numpy
+
+import mercantile
+import rasterio
+from rasterio import windows
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler.utils import _chunks, get_vrt_transform, has_alpha_band
+from rio_tiler_mosaic.mosaic import _filter_futures
+from rio_tiler_mosaic.methods.defaults import FirstMethod
+
+WEB_MERCATOR = CRS.from_epsg(3857)
+
+
+def get_preview_grid(
+    bounds: Sequence[float], max_size: int = 1024
+) -> Tuple[Tuple[float, float, float, float], int, int]:
+    """
+    Get the Web Mercator grid of a mosaic preview.
+
+    Attributes
+    ----------
+    bounds : list, required
+        Mosaic bounds (west, south, east, north) in EPSG:4326.
+    max_size : int, optional (default: 1024)
+        Preview max width/height.
+
+    Returns
+    -------
+    bounds, width, height : tuple
+        Preview bounds in EPSG:3857 and size.
+
+    """
+    west, south = mercantile.xy(bounds[0], max(bounds[1], -85.051129))
+    east, north = mercantile.xy(bounds[2], min(bounds[3], 85.051129))
+    res = max(east - west, north - south) / max_size
+    width = max(1, round((east - west) / res))
+    height = max(1, round((north - south) / res))
+    return (west, south, east, north), width, height
+
+
+def read_grid(
+    src_path: str,
+    bounds: Sequence[float],
+    width: int,
+    height: int,
+    indexes: Sequence[int] = None,
+    resampling_method: str = "nearest",
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Read a dataset on a Web Mercator grid.
+
+    Only the part of the grid covered by the dataset is read. The dataset is
+    warped at its native resolution and read decimated, so GDAL reads the
+    smallest overview matching the grid resolution.
+
+    Attributes
+    ----------
+    src_path : str, required
+        Dataset url.
+    bounds : list, required
+        Grid bounds in EPSG:3857.
+    width : int, required
+        Grid width.
+    height : int, required
+        Grid height.
+    indexes : list of ints, optional
+        Bands to read (default: all).
+    resampling_method : str, optional (default: "nearest")
+        Resampling algorithm.
+
+    Returns
+    -------
+    data : numpy ndarray
+    mask: numpy array
+        Grid size arrays (mask is 0 outside the dataset).
+
+    """
+    transform = rasterio.transform.from_bounds(*bounds, width, height)
+    with rasterio.open(src_path) as src_dst:
+        src_bounds = transform_bounds(
+            src_dst.crs, WEB_MERCATOR, *src_dst.bounds, densify_pts=21
+        )
+
+        # Preview pixels covered by the dataset
+        window = windows.from_bounds(*src_bounds, transform=transform)
+        col_off = max(0, math.floor(window.col_off))
+        row_off = max(0, math.floor(window.row_off))
+        col_max = min(width, math.ceil(window.col_off + window.width))
+        row_max = min(height, math.ceil(window.row_off + window.height))
+        if col_off >= col_max or row_off >= row_max:
+            raise TileOutsideBounds(f"{src_path} does not intersect the grid")
+
+        window = windows.Window(col_off, row_off, col_max - col_off, row_max - row_off)
+        window_bounds = windows.bounds(window, transform)
+
+        vrt_transform, vrt_width, vrt_height = get_vrt_transform(
+            src_dst, window_bounds, dst_crs=WEB_MERCATOR
+        )
+        vrt_params = dict(
+            crs=WEB_MERCATOR,
+            transform=vrt_transform,
+            width=vrt_width,
+            height=vrt_height,
+            add_alpha=not has_alpha_band(src_dst),
+            resampling=Resampling[resampling_method],
+        )
+        if src_dst.nodata is not None:
+            vrt_params.update(
+                dict(nodata=src_dst.nodata, src_nodata=src_dst.nodata, add_alpha=False)
+            )
+
+        indexes = indexes if indexes is not None else src_dst.indexes
+        shape = (window.height, window.width)
+        with WarpedVRT(src_dst, **vrt_params) as vrt:
+            part = vrt.read(
+                indexes=indexes,
+                out_shape=(len(indexes), *shape),
+                resampling=Resampling[resampling_method],
+            )
+            # Decimated reads of the mask band can use another overview level
+            # than the data: derive the nodata mask from the data read.
+            if src_dst.nodata is not None:
+                if numpy.isnan(src_dst.nodata):
+                    valid = ~numpy.isnan(part)
+                else:
+                    valid = part != src_dst.nodata
+                part_mask = valid.any(axis=0).astype("uint8") * 255
+            else:
+                part_mask = vrt.dataset_mask(out_shape=shape)
+
+    data = numpy.zeros((len(indexes), height, width), dtype=part.dtype)
+    mask = numpy.zeros((height, width), dtype=numpy.uint8)
+    slices = window.toslices()
+    data[(slice(None), *slices)] = part
+    mask[slices] = part_mask
+    return data, mask
+
+
+def mosaic_grid(
+    assets: Sequence[str],
+    bounds: Sequence[float],
+    width: int,
+    height: int,
+    pixel_selection=None,
+    chunk_size: int = None,
+    **kwargs,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Create a Web Mercator grid image from multiple datasets.
+
+    Assets are read in parallel on the grid (see `read_grid`) and combined
+    with the pixel selection method, like `mosaic_tiler` does for tiles.
+
+    Attributes
+    ----------
+    assets : list, required
+        Dataset urls, in mosaic order.
+    bounds : list, required
+        Grid bounds in EPSG:3857.
+    width : int, required
+        Grid width.
+    height : int, required
+        Grid height.
+    pixel_selection : MosaicMethodBase, optional
+        Pixel selection method (default: FirstMethod).
+    chunk_size : int, optional
+        Number of assets read concurrently (default: MAX_THREADS).
+    kwargs : dict, optional
+        `read_grid` options.
+
+    Returns
+    -------
+    data, mask : numpy ndarray
+        Grid data and mask (None when no asset could be read).
+
+    """
+    pixel_selection = pixel_selection or FirstMethod()
+
+    max_threads = int(os.environ.get("MAX_THREADS", multiprocessing.cpu_count() * 5))
+    chunk_size = chunk_size or max_threads
+    for chunks in _chunks(assets, chunk_size):
+        with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+            future_tasks = [
+                executor.submit(read_grid, asset, bounds, width, height, **kwargs)
+                for asset in chunks
+            ]
+
+        for data, mask in _filter_futures(future_tasks):
+            data = numpy.ma.array(data)
+            data.mask = mask == 0
+            pixel_selection.feed(data)
+            if pixel_selection.is_done:
+                return pixel_selection.data
+
+    return pixel_selection.data
+
+
+def mosaic_preview(
+    assets: Sequence[str],
+    bounds: Sequence[float],
+    max_size: int = 1024,
+    pixel_selection=None,
+    chunk_size: int = None,
+    **kwargs,
+) -> Tuple[numpy.ndarray, numpy.ndarray, Tuple[float, float, float, float]]:
+    """
+    Create a preview image of a whole mosaic.
+
+    Attributes
+    ----------
+    assets : list, required
+        Dataset urls, in mosaic order.
+    bounds : list, required
+        Mosaic bounds (west, south, east, north) in EPSG:4326.
+    max_size : int, optional (default: 1024)
+        Preview max width/height.
+    pixel_selection : MosaicMethodBase, optional
+        Pixel selection method (default: FirstMethod).
+    chunk_size : int, optional
+        Number of assets read concurrently (default: MAX_THREADS).
+    kwargs : dict, optional
+        `read_grid` options.
+
+    Returns
+    -------
+    data, mask : numpy ndarray
+        Preview data and mask (None when no asset could be read).
+    bounds : tuple
+        Preview bounds in EPSG:3857.
+
+    """
+    preview_bounds, width, height = get_preview_grid(bounds, max_size)
+    data, mask = mosaic_grid(
+        assets,
+        preview_bounds,
+        width,
+        height,
+        pixel_selection=pixel_selection,
+        chunk_size=chunk_size,
+        **kwargs,
+    )
+    return data, mask, preview_bounds
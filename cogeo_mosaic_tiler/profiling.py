@@ -0,0 +1,278 @@
+"""cogeo_mosaic_tiler.profiling: opt-in requests profiling."""
+
+from typing import Dict, Optional
+
+import os
+import sys
+import hmac
+import logging
+import time
+import uuid
+import random
+import marshal
+import cProfile
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+
+from cogeo_mosaic_tiler.utils import _put_data
+
+logger = logging.getLogger(__name__)
+
+# Query parameter requesting a profile (see `sign`).
+PROFILE_PARAM = "profile_token"
+
+# Response header with the profile location.
+PROFILE_HEADER = "X-Profile-Key"
+
+
+def sign(path: str, expires: int, secret: str) -> str:
+    """
+    Create a `profile_token` query parameter value for a request path.
+
+    Attributes
+    ----------
+    path : str, required
+        Request path (e.g "/{mosaicid}/9/150/187.png").
+    expires : int, required
+        Expiration time (Unix timestamp).
+    secret : str, required
+        Profiling secret (`PROFILE_SECRET`).
+
+    Returns
+    -------
+    token : str
+        "{expires}.{signature}".
+
+    """
+    message = f"{path}:{expires}".encode()
+    signature = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify(path: str, token: str, secret: str) -> bool:
+    """Check a `profile_token` query parameter value (see `sign`)."""
+    expires, _, _ = token.partition(".")
+    try:
+        if int(expires) < time.time():
+            return False
+    except ValueError:
+        return False
+
+    return hmac.compare_digest(sign(path, int(expires), secret), token)
+
+
+class SamplingProfiler(object):
+    """
+    Statistical profiler sampling the threads stacks at a fixed interval.
+
+    The profiled code runs at full speed between samples (the sampler thread
+    only holds the GIL while walking the stacks). All threads are sampled so
+    the reads done in thread pools are included. The output uses the
+    "collapsed stacks" format (`{thread};{frame};{frame} {count}` lines) read
+    by flamegraph.pl or speedscope.
+
+    Attributes
+    ----------
+    interval : float, optional (default: 0.005)
+        Sampling interval in seconds.
+
+    """
+
+    extension = "txt"
+
+    def __init__(self, interval: float = 0.005):
+        """Initialize profiler."""
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        """Start sampling."""
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def dumps(self) -> bytes:
+        """Return the collapsed stacks."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        ).encode()
+
+
+class DeterministicProfiler(object):
+    """
+    cProfile profiler (all function calls of the request thread).
+
+    The output is a marshalled `pstats` dump, read with `pstats.Stats(path)`
+    or snakeviz.
+
+    """
+
+    extension = "prof"
+
+    def __init__(self):
+        """Initialize profiler."""
+        self.profile = cProfile.Profile()
+
+    def __enter__(self):
+        """Start profiling."""
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *args):
+        """Stop profiling."""
+        self.profile.disable()
+
+    def dumps(self) -> bytes:
+        """Return the pstats dump."""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+class RequestProfiler(object):
+    """
+    Profile requests with a signed `profile_token` flag or a random sample of them.
+
+    Attributes
+    ----------
+    output : str, required
+        Profiles location (s3://{bucket}/{prefix} or local directory).
+    secret : str, optional
+        Secret used to sign `profile_token` query parameters (see `sign`). Requests
+        are only profiled on demand when set.
+    sample_rate : float, optional (default: 0)
+        Fraction of requests profiled without flag.
+    mode : str, optional (default: "sample")
+        "sample" (SamplingProfiler) or "deterministic" (DeterministicProfiler).
+    interval : float, optional (default: 0.005)
+        SamplingProfiler interval in seconds.
+
+    """
+
+    def __init__(
+        self,
+        output: str,
+        secret: str = None,
+        sample_rate: float = 0.0,
+        mode: str = "sample",
+        interval: float = 0.005,
+    ):
+        """Initialize request profiler."""
+        if mode not in ["sample", "deterministic"]:
+            raise ValueError(f"Invalid profiling mode: {mode}")
+
+        self.output = output.rstrip("/")
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+
+    @classmethod
+    def from_env(cls) -> Optional["RequestProfiler"]:
+        """
+        Create profiler from environment variables.
+
+        Profiling is enabled with `PROFILE_SECRET` and/or `PROFILE_SAMPLE_RATE`,
+        profiles are written in `PROFILE_OUTPUT` (default:
+        `s3://$MOSAIC_DEF_BUCKET/profiles` or a temporary directory), with the
+        `PROFILE_MODE` profiler sampling every `PROFILE_INTERVAL` ms.
+
+        """
+        secret = os.environ.get("PROFILE_SECRET")
+        sample_rate = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+        if not secret and not sample_rate:
+            return None
+
+        output = os.environ.get("PROFILE_OUTPUT")
+        if not output:
+            if os.environ.get("MOSAIC_DEF_BUCKET"):
+                output = f"s3://{os.environ['MOSAIC_DEF_BUCKET']}/profiles"
+            else:
+                output = os.path.join(tempfile.gettempdir(), "cogeo-mosaic-profiles")
+
+        return cls(
+            output,
+            secret=secret,
+            sample_rate=sample_rate,
+            mode=os.environ.get("PROFILE_MODE", "sample"),
+            interval=float(os.environ.get("PROFILE_INTERVAL", 5)) / 1000,
+        )
+
+    def should_profile(self, path: str, token: str = None) -> bool:
+        """Check if a request should be profiled."""
+        if token is not None and self.secret and verify(path, token, self.secret):
+            return True
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def profiler(self):
+        """Return a new profiler."""
+        if self.mode == "deterministic":
+            return DeterministicProfiler()
+        return SamplingProfiler(interval=self.interval)
+
+    def save(self, profiler, path: str, elapsed: float) -> str:
+        """Write profile and return its location."""
+        name = path.strip("/").replace("/", "_")[:100] or "root"
+        filename = (
+            f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}_{int(elapsed * 1000)}ms"
+            f"_{name}_{uuid.uuid4().hex[:8]}.{profiler.extension}"
+        )
+        if self.output.startswith("s3://"):
+            url = f"{self.output}/{filename}"
+        else:
+            url = os.path.join(self.output, filename)
+
+        _put_data(url, profiler.dumps())
+        return url
+
+    def __call__(self, handler, event: Dict, context) -> Dict:
+        """Run handler (`API.__call__`), profiling the request if requested."""
+        params = event.get("queryStringParameters") or {}
+        token = params.pop(PROFILE_PARAM, None)
+        path = event.get("path", "")
+        if not self.should_profile(path, token):
+            return handler(event, context)
+
+        profiler = self.profiler()
+        t0 = time.perf_counter()
+        with profiler:
+            response = handler(event, context)
+        elapsed = time.perf_counter() - t0
+
+        try:
+            url = self.save(profiler, path, elapsed)
+        except Exception as e:
+            logger.error(f"Cannot write {path} profile: {e}")
+            return response
+
+        logger.info(f"Profiled {path} ({elapsed:.3f}s): {url}")
+        response.setdefault("headers", {})[PROFILE_HEADER] = url
+        return response
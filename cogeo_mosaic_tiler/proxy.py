@@ -0,0 +1,161 @@
+"""cogeo_mosaic_tiler.proxy: lambda-proxy API with content-aware compression."""
+
+from typing import Any, Sequence, Set, Union
+
+import os
+import zlib
+import hashlib
+
+from lambda_proxy.proxy import API as ProxyAPI
+
+from cogeo_mosaic_tiler import raw
+from cogeo_mosaic_tiler.cache import LRUCache
+from cogeo_mosaic_tiler.profiling import RequestProfiler
+
+try:
+    import brotli
+except ImportError:  # pragma: nocover
+    brotli = None
+
+# Formats with their own compression, gzipping them only costs CPU.
+COMPRESSED_TYPES = [
+    "image/png",
+    "image/jpeg",
+    "image/jpg",
+    "image/webp",
+    "image/jp2",
+    "application/zip",
+    "application/gzip",
+]
+
+# Metadata responses, compressed with the strongest settings and cached.
+CACHED_TYPES = ["application/json", "application/geo+json", "application/xml"]
+
+
+def is_compressed(content_type: str, body: Any) -> bool:
+    """Check if a response body is already compressed."""
+    if content_type in COMPRESSED_TYPES:
+        return True
+
+    # Raw tiles payload can be compressed with zstd or lz4
+    if content_type == raw.CONTENT_TYPE:
+        return raw.get_compression(body) != "none"
+
+    return False
+
+
+def accepted_encodings(header: str) -> Set[str]:
+    """Parse an Accept-Encoding header (ignoring codings with q=0)."""
+    encodings = set()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            encodings.add(coding.lower())
+    return encodings
+
+
+def compress(body: bytes, encoding: str, strong: bool = False) -> bytes:
+    """Compress body with `br`, `gzip`, `zlib` or `deflate`."""
+    if encoding == "br":
+        return brotli.compress(body, quality=11 if strong else 5)
+
+    level = 9 if strong else 6
+    wbits = {"gzip": zlib.MAX_WBITS | 16, "zlib": zlib.MAX_WBITS, "deflate": -15}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, wbits[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+class API(ProxyAPI):
+    """
+    lambda-proxy API with content-type aware response compression.
+
+    For routes declared with a `payload_compression_method`:
+    - already compressed formats (PNG, JPEG, WEBP, compressed raw tiles...)
+      are sent as is,
+    - Brotli is used instead of the route method when the client accepts it,
+    - compressed JSON/XML metadata responses are cached.
+
+    Requests can be profiled (see `profiling.RequestProfiler.from_env`).
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize API."""
+        super().__init__(*args, **kwargs)
+        self.compressed_cache = LRUCache(
+            maxsize=int(os.environ.get("COMPRESSED_CACHE_SIZE", 256))
+        )
+        self.profiler = RequestProfiler.from_env()
+
+    def __call__(self, event, context):
+        """Handle request (profiled when requested)."""
+        if self.profiler is None:
+            return super().__call__(event, context)
+
+        return self.profiler(super().__call__, event, context)
+
+    def _encode(self, body: Union[str, bytes], content_type: str, encoding: str):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        if content_type.split(";")[0] not in CACHED_TYPES:
+            return compress(body, encoding)
+
+        key = (hashlib.sha1(body).digest(), encoding)
+        content = self.compressed_cache.get(key)
+        if content is None:
+            content = compress(body, encoding, strong=True)
+            self.compressed_cache.set(key, content)
+        return content
+
+    def response(
+        self,
+        status: Union[int, str],
+        content_type: str,
+        response_body: Any,
+        cors: bool = False,
+        accepted_methods: Sequence = [],
+        accepted_compression: str = "",
+        compression: str = "",
+        b64encode: bool = False,
+        ttl: int = None,
+        cache_control: str = None,
+    ):
+        """Return HTTP response, compressed depending on the content type."""
+        encoding = None
+        if (
+            compression
+            and response_body
+            and not is_compressed(content_type, response_body)
+        ):
+            accepted = accepted_encodings(accepted_compression)
+            if brotli is not None and "br" in accepted:
+                encoding = "br"
+            elif compression in accepted:
+                encoding = compression
+
+        if encoding:
+            response_body = self._encode(response_body, content_type, encoding)
+
+        message = super().response(
+            status,
+            content_type,
+            response_body,
+            cors=cors,
+            accepted_methods=accepted_methods,
+            b64encode=b64encode,
+            ttl=ttl,
+            cache_control=cache_control,
+        )
+        if encoding:
+            message["headers"]["Content-Encoding"] = encoding
+            message["headers"]["Vary"] = "Accept-Encoding"
+
+        return message
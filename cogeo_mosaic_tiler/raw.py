@@ -0,0 +1,164 @@
+"""cogeo_mosaic_tiler.raw: raw array tile format.
+
+Layout
+------
+    magic       4 bytes   b"CMRT"
+    length      uint32    header length (little endian)
+    header      JSON      dtype, shape, bounds, crs, compression
+    payload               tile buffer (C order) followed by the bit-packed mask,
+                          optionally compressed with zstd or lz4
+
+`decode` only needs numpy (and the compression module when used), so this
+module can be copied as is to client applications.
+
+"""
+
+from typing import Dict, Sequence, Tuple
+
+import json
+import struct
+
+import numpy
+
+try:
+    import zstandard
+except ImportError:  # pragma: nocover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # pragma: nocover
+    lz4_frame = None
+
+MAGIC = b"CMRT"
+
+CONTENT_TYPE = "application/x-cogeo-mosaic-tile"
+
+
+def compressions() -> Sequence[str]:
+    """Return the available payload compressions."""
+    available = ["none"]
+    if zstandard is not None:
+        available.append("zstd")
+    if lz4_frame is not None:
+        available.append("lz4")
+    return available
+
+
+def _compress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    elif compression == "lz4":
+        return lz4_frame.compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    elif compression == "lz4":
+        return lz4_frame.decompress(data)
+    return data
+
+
+def get_compression(content: bytes) -> str:
+    """Return the payload compression of an encoded tile (without decoding it)."""
+    if content[:4] != MAGIC:
+        raise Exception("Invalid raw tile")
+
+    (length,) = struct.unpack("<I", content[4:8])
+    return json.loads(content[8 : 8 + length].decode())["compression"]
+
+
+def encode(
+    tile: numpy.ndarray,
+    mask: numpy.ndarray,
+    bounds: Sequence[float] = None,
+    crs: str = "EPSG:3857",
+    compression: str = None,
+) -> bytes:
+    """
+    Serialize a tile and its mask.
+
+    Attributes
+    ----------
+    tile : numpy.ndarray, required
+        Tile data (bands, height, width).
+    mask : numpy.ndarray, required
+        Tile mask (height, width), non-zero for valid pixels.
+    bounds : list, optional
+        Tile bounds.
+    crs : str, optional (default: "EPSG:3857")
+        Bounds coordinate reference system.
+    compression : str, optional
+        Payload compression ("zstd" or "lz4", default: no compression).
+
+    Returns
+    -------
+    content : bytes
+        Encoded tile.
+
+    """
+    compression = compression or "none"
+    if compression not in compressions():
+        raise Exception(f"Unsupported raw tile compression: {compression}")
+
+    tile = numpy.ascontiguousarray(tile)
+    header = json.dumps(
+        dict(
+            dtype=tile.dtype.str,
+            shape=tile.shape,
+            bounds=list(bounds) if bounds is not None else None,
+            crs=crs,
+            compression=compression,
+        )
+    ).encode()
+
+    # Buffers are passed without copy, only the final join (or compression)
+    # writes the response bytes.
+    payload = [memoryview(tile).cast("B"), numpy.packbits(mask > 0).data]
+    if compression != "none":
+        payload = [_compress(b"".join(payload), compression)]
+
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header, *payload])
+
+
+def decode(content: bytes) -> Tuple[numpy.ndarray, numpy.ndarray, Dict]:
+    """
+    Deserialize a raw tile.
+
+    Attributes
+    ----------
+    content : bytes, required
+        Encoded tile.
+
+    Returns
+    -------
+    tile : numpy.ndarray
+        Tile data (bands, height, width).
+    mask : numpy.ndarray
+        Tile mask (height, width), 255 for valid pixels.
+    header : dict
+        Tile header (dtype, shape, bounds, crs, compression).
+
+    """
+    if content[:4] != MAGIC:
+        raise Exception("Invalid raw tile")
+
+    (length,) = struct.unpack("<I", content[4:8])
+    header = json.loads(content[8 : 8 + length].decode())
+    payload = _decompress(memoryview(content)[8 + length :], header["compression"])
+
+    dtype = numpy.dtype(header["dtype"])
+    shape = tuple(header["shape"])
+    size = dtype.itemsize * int(numpy.prod(shape))
+    tile = numpy.frombuffer(payload, dtype=dtype, count=int(numpy.prod(shape)))
+    tile = tile.reshape(shape)
+
+    mask = numpy.unpackbits(
+        numpy.frombuffer(payload, dtype=numpy.uint8, offset=size),
+        count=shape[-2] * shape[-1],
+    )
+    mask = mask.reshape(shape[-2:]) * numpy.uint8(255)
+
+    return tile, mask, header
@@ -0,0 +1 @@
+"""cogeo_mosaic_tiler: cli."""
@@ -0,0 +1,187 @@
+"""cogeo_mosaic_tiler.scripts.cli: cogeo-mosaic-tiler command line interface."""
+
+import os
+import json
+import logging
+
+import click
+
+from cogeo_mosaic_tiler import version as tiler_version
+from cogeo_mosaic_tiler.utils import _compress_gz_json, _put_data
+
+
+def _write_mosaic(mosaic_def, output=None):
+    """Write mosaic definition to a file or to stdout."""
+    if not output:
+        click.echo(json.dumps(mosaic_def))
+    elif output.endswith(".gz"):
+        _put_data(output, _compress_gz_json(mosaic_def))
+    else:
+        _put_data(output, json.dumps(mosaic_def).encode("utf-8"))
+
+
+@click.group(short_help="cogeo-mosaic-tiler CLI")
+@click.version_option(version=tiler_version, message="%(version)s")
+def cogeo_mosaic_tiler_cli():
+    """cogeo-mosaic-tiler subcommands."""
+    pass
+
+
+@cogeo_mosaic_tiler_cli.command(short_help="Run the tiler as an HTTP server.")
+@click.option("--host", type=str, default="127.0.0.1", help="Bind address.")
+@click.option("--port", type=int, default=8000, help="Bind port.")
+@click.option(
+    "--workers", "-w", type=int, help="Number of worker processes (default: CPUs)."
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Shared cache directory (default: temporary directory in /dev/shm).",
+)
+@click.option(
+    "--preload",
+    type=str,
+    multiple=True,
+    help="Mosaic definition url or id to load once and share between workers.",
+)
+def serve(host, port, workers, cache_dir, preload):
+    """Serve the application with pre-forked workers sharing one cache."""
+    from cogeo_mosaic_tiler.server import serve as run_server
+
+    logging.basicConfig(level=logging.INFO)
+    run_server(
+        host=host, port=port, workers=workers, cache_dir=cache_dir, preload=preload
+    )
+
+
+@cogeo_mosaic_tiler_cli.command(short_help="Create overviews for a mosaic.")
+@click.argument("mosaic_path", type=str)
+@click.option(
+    "--prefix",
+    type=str,
+    required=True,
+    help="Overviews output location (s3 url or local directory).",
+)
+@click.option(
+    "--levels", type=int, default=3, help="Number of zoom levels (default: 3)."
+)
+@click.option("--tilesize", type=int, default=256, help="Tile size (default: 256).")
+@click.option(
+    "--pixel-selection",
+    type=str,
+    default="first",
+    help="Mosaic pixel selection method (default: first).",
+)
+@click.option(
+    "--resampling-method",
+    type=str,
+    default="nearest",
+    help="Resampling method (default: nearest).",
+)
+@click.option("--output", "-o", type=str, help="Output mosaic definition.")
+def overviews(
+    mosaic_path, prefix, levels, tilesize, pixel_selection, resampling_method, output
+):
+    """Create overview COGs for the zooms below the mosaic minzoom."""
+    from cogeo_mosaic.utils import get_mosaic_content
+
+    from cogeo_mosaic_tiler.handlers.app import PIXSEL_METHODS
+    from cogeo_mosaic_tiler.overviews import create_overviews
+
+    mosaic_def = get_mosaic_content(mosaic_path)
+    mosaic_def["overviews"] = create_overviews(
+        mosaic_def,
+        prefix.rstrip("/"),
+        levels=levels,
+        tilesize=tilesize,
+        pixel_selection=PIXSEL_METHODS[pixel_selection],
+        resampling_method=resampling_method,
+        method=pixel_selection,
+    )
+    _write_mosaic(mosaic_def, output)
+
+
+@cogeo_mosaic_tiler_cli.command(short_help="Remove redundant assets from a mosaic.")
+@click.argument("mosaic_path", type=str)
+@click.option("--max-assets", type=int, help="Maximum number of assets per quadkey.")
+@click.option(
+    "--threads", type=int, default=20, help="Max threads reading the assets masks."
+)
+@click.option("--report", type=click.Path(dir_okay=False), help="JSON report output.")
+@click.option("--output", "-o", type=str, help="Output mosaic definition.")
+def optimize(mosaic_path, max_assets, threads, report, output):
+    """Remove assets hidden by previous assets (`first` pixel selection)."""
+    from cogeo_mosaic.utils import get_mosaic_content
+
+    from cogeo_mosaic_tiler.optimize import optimize_mosaic
+
+    mosaic_def, mosaic_report = optimize_mosaic(
+        get_mosaic_content(mosaic_path), max_assets=max_assets, max_threads=threads
+    )
+    click.echo(
+        f"{mosaic_report['assets']['before']} -> {mosaic_report['assets']['after']}"
+        f" assets references, removed: {mosaic_report['removed']},"
+        f" unused assets: {len(mosaic_report['unused'])}",
+        err=True,
+    )
+    if report:
+        with open(report, "w") as f:
+            json.dump(mosaic_report, f)
+
+    _write_mosaic(mosaic_def, output)
+
+
+@cogeo_mosaic_tiler_cli.command(short_help="Cache the headers of a mosaic assets.")
+@click.argument("mosaic_path", type=str)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    envvar="HEADER_CACHE_DIR",
+    required=True,
+    help="Headers cache directory (default: $HEADER_CACHE_DIR).",
+)
+@click.option(
+    "--threads", type=int, default=20, help="Max threads reading the assets headers."
+)
+def headers(mosaic_path, cache_dir, threads):
+    """Read the assets headers (and overviews headers) into the headers cache."""
+    from concurrent import futures
+
+    from cogeo_mosaic.utils import get_mosaic_content
+
+    from cogeo_mosaic_tiler.cache import SharedCache
+    from cogeo_mosaic_tiler.headers import HeaderCache
+
+    mosaic_def = get_mosaic_content(mosaic_path)
+    assets = set()
+    for definition in [mosaic_def, mosaic_def.get("overviews") or {}]:
+        for quadkey_assets in definition.get("tiles", {}).values():
+            assets.update(quadkey_assets)
+
+    max_bytes = int(os.environ.get("HEADER_CACHE_MAX_BYTES", 536870912))
+    cache = HeaderCache(store=SharedCache(cache_dir, max_bytes=max_bytes), maxsize=0)
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        cached = sum(1 for header in executor.map(cache.get, assets) if header)
+
+    click.echo(f"{cached}/{len(assets)} assets headers cached", err=True)
+
+
+@cogeo_mosaic_tiler_cli.command(short_help="Create a signed profiling flag.")
+@click.argument("path", type=str)
+@click.option(
+    "--secret",
+    type=str,
+    envvar="PROFILE_SECRET",
+    required=True,
+    help="Profiling secret (default: $PROFILE_SECRET).",
+)
+@click.option(
+    "--ttl", type=int, default=3600, help="Flag validity in seconds (default: 3600)."
+)
+def profile_token(path, secret, ttl):
+    """Print the `profile_token` query parameter value for a request path."""
+    import time
+
+    from cogeo_mosaic_tiler.profiling import sign
+
+    click.echo(sign(path, int(time.time()) + ttl, secret))
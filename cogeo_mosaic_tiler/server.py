@@ -0,0 +1,271 @@
+"""cogeo_mosaic_tiler.server: pre-fork HTTP server for long-running deployments."""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import gc
+import os
+import re
+import sys
+import json
+import base64
+import shutil
+import signal
+import socket
+import logging
+import resource
+import tempfile
+import multiprocessing
+from socketserver import ThreadingMixIn
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+
+def request_to_event(method: str, path: str, headers: Dict, body: bytes = None) -> Dict:
+    """
+    Translate an HTTP request to an API Gateway proxy event.
+
+    Attributes
+    ----------
+    method : str, required
+        HTTP method.
+    path : str, required
+        Request path, including query string.
+    headers : dict, required
+        Request headers.
+    body : bytes, optional
+        Request body.
+
+    Returns
+    -------
+    event : dict
+        API Gateway proxy event.
+
+    """
+    url = urlsplit(path)
+    event: Dict[str, Any] = {
+        "path": url.path,
+        "httpMethod": method,
+        "headers": dict(headers),
+        "queryStringParameters": dict(parse_qsl(url.query)),
+    }
+    if body:
+        event["body"] = base64.b64encode(body).decode()
+        event["isBase64Encoded"] = True
+
+    return event
+
+
+def event_response(response: Dict) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    """Translate an API Gateway proxy response to status, headers and body."""
+    body = response.get("body") or b""
+    if response.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+
+    headers = list(response.get("headers", {}).items())
+    headers.append(("Content-Length", str(len(body))))
+    return response["statusCode"], headers, body
+
+
+def get_metrics() -> Dict:
+    """Return the process cache, coalescing and memory statistics."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+    from cogeo_mosaic_tiler.mosaic import definition_cache
+
+    return dict(
+        pid=os.getpid(),
+        caches=dict(
+            tiles=handlers.tile_cache.stats,
+            mosaics=definition_cache.stats,
+            empty_tiles=handlers.empty_tiles.stats,
+            compressed=handlers.app.compressed_cache.stats,
+            summaries=handlers.summary_cache.stats,
+            capabilities=handlers.capabilities_cache.stats,
+            previews=handlers.preview_cache.stats,
+        ),
+        headers=handlers.header_cache.stats if handlers.header_cache else None,
+        coalescing=handlers.tile_flights.stats,
+        # Peak resident set size (kB on Linux)
+        maxrss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Forward HTTP requests to the lambda-proxy application."""
+
+    protocol_version = "HTTP/1.1"
+
+    def _handle(self):
+        app = self.server.app
+        if urlsplit(self.path).path == "/_metrics":
+            status, headers, body = event_response(
+                app.response(
+                    "OK", "application/json", json.dumps(self.server.metrics())
+                )
+            )
+        else:
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length) if length else None
+            event = request_to_event(self.command, self.path, self.headers, body)
+            status, headers, body = event_response(app(event, {}))
+
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_HEAD = _handle
+
+    def log_message(self, format, *args):
+        """Log requests with the module logger."""
+        logger.info("%s - %s" % (self.address_string(), format % args))
+
+
+class WorkerServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server running in one worker on a shared listening socket."""
+
+    daemon_threads = True
+
+    def __init__(self, sock: socket.socket, app):
+        """Initialize server with an already bound socket."""
+        HTTPServer.__init__(
+            self, sock.getsockname(), RequestHandler, bind_and_activate=False
+        )
+        self.socket = sock
+        self.app = app
+
+    def metrics(self) -> Dict:
+        """Return worker cache statistics."""
+        return get_metrics()
+
+
+def preload_mosaics(mosaics: Sequence[str]) -> None:
+    """
+    Load mosaic definitions in the current process, before forking workers.
+
+    The decoded definitions (`mosaic.fetch_mosaic_definition` lru cache) are
+    inherited by the workers and their memory pages shared copy-on-write until
+    written. Pages holding objects a worker reads are still copied when their
+    reference counts change, the garbage collector is kept from touching the
+    others with `gc.freeze`.
+
+    Attributes
+    ----------
+    mosaics : list, required
+        Mosaic definition urls or ids (in the configured storage).
+
+    """
+    from cogeo_mosaic_tiler.mosaic import fetch_mosaic_definition
+    from cogeo_mosaic_tiler.utils import _create_path
+
+    for mosaic in mosaics:
+        url = (
+            _create_path(mosaic) if re.fullmatch("[0-9A-Fa-f]{56}", mosaic) else mosaic
+        )
+        fetch_mosaic_definition(url)
+        logger.info(f"Mosaic definition {url} preloaded")
+
+    gc.freeze()
+
+
+def _run_worker(sock: socket.socket) -> None:
+    """Import the application and serve requests forever."""
+    # The application (boto3 clients, GDAL environment) is created after the fork
+    # so that nothing holding sockets or threads is shared between workers.
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    app.https = False
+    server = WorkerServer(sock, app)
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    workers: int = None,
+    cache_dir: str = None,
+    preload: Sequence[str] = None,
+) -> None:
+    """
+    Run the application with N pre-forked worker processes.
+
+    Workers accept connections on a shared listening socket and share mosaic
+    definitions and rendered tiles through a cache stored in `cache_dir`
+    (a directory in `/dev/shm` by default). The shared cache saves the
+    definitions downloads, but each worker decodes and keeps its own copy:
+    `preload` definitions are decoded once, before forking, and shared by the
+    workers memory (see `preload_mosaics`).
+
+    Attributes
+    ----------
+    host : str, optional (default: "127.0.0.1")
+        Bind address.
+    port : int, optional (default: 8000)
+        Bind port.
+    workers : int, optional
+        Number of worker processes (default: number of CPUs).
+    cache_dir : str, optional
+        Shared cache directory (default: temporary directory in /dev/shm).
+    preload : list, optional
+        Mosaic definition urls or ids to load before forking the workers.
+
+    """
+    workers = workers or multiprocessing.cpu_count()
+
+    tmp_cache = None
+    if not cache_dir:
+        shm = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        cache_dir = tmp_cache = tempfile.mkdtemp(prefix="cogeo-mosaic-", dir=shm)
+
+    os.environ["CACHE_DIR"] = cache_dir
+    os.environ.setdefault("TILE_CACHE_SIZE", "1024")
+    os.environ.setdefault("BBOX_MAX_PIXELS", "0")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+
+    if preload:
+        preload_mosaics(preload)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(sock)
+            os._exit(0)
+        children.append(pid)
+
+    logger.info(f"Listening on http://{host}:{port} with {workers} workers")
+
+    def _shutdown(*args):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        _shutdown()
+        for pid in children:
+            os.waitpid(pid, 0)
+    finally:
+        sock.close()
+        if tmp_cache:
+            shutil.rmtree(tmp_cache, ignore_errors=True)
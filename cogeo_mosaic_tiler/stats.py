@@ -0,0 +1,114 @@
+"""cogeo_mosaic_tiler.stats: mosaic per-band statistics."""
+
+from typing import Dict, Sequence
+
+from concurrent import futures
+
+import numpy
+
+import rasterio
+
+from cogeo_mosaic.utils import _filter_futures
+
+from cogeo_mosaic_tiler.mosaic import get_overviews
+
+
+def get_assets_list(mosaic_def: Dict, pixel_selection: str = None) -> Sequence[str]:
+    """
+    Return the assets to compute the mosaic statistics from.
+
+    Pre-aggregated overviews (if any, and built with the `pixel_selection`
+    method, see `mosaic.get_overviews`) are used instead of the mosaic assets,
+    they cover the whole mosaic with a few files.
+
+    """
+    tiles = (get_overviews(mosaic_def, pixel_selection) or mosaic_def)["tiles"]
+    return list(dict.fromkeys(asset for assets in tiles.values() for asset in assets))
+
+
+def _sample_values(
+    src_path: str, max_size: int = 256, max_values: int = None
+) -> Sequence[numpy.ndarray]:
+    """Read valid pixel values of each band from the dataset overviews."""
+    with rasterio.open(src_path) as src_dst:
+        ratio = max(1, max(src_dst.width, src_dst.height) / max_size)
+        out_shape = (
+            src_dst.count,
+            max(1, round(src_dst.height / ratio)),
+            max(1, round(src_dst.width / ratio)),
+        )
+        data = src_dst.read(out_shape=out_shape, masked=True)
+
+    values = []
+    for band in data:
+        band = band.compressed()
+        if max_values and band.size > max_values:
+            band = band[:: int(numpy.ceil(band.size / max_values))]
+        values.append(band)
+
+    return values
+
+
+def get_mosaic_stats(
+    assets: Sequence[str],
+    percentiles: Sequence[float] = (2, 98),
+    max_size: int = 256,
+    max_threads: int = 20,
+    max_samples: int = 1000000,
+) -> Dict:
+    """
+    Compute per-band statistics of a mosaic.
+
+    Datasets are read in parallel at low resolution (from overviews), and the
+    statistics are computed from their valid pixels.
+
+    Attributes
+    ----------
+    assets : list, required
+        Dataset urls.
+    percentiles : tuple, optional (default: (2, 98))
+        Percentiles to compute.
+    max_size : int, optional (default: 256)
+        Max width/height of the arrays read from each dataset.
+    max_threads : int, optional (default: 20)
+        Max threads to use.
+    max_samples : int, optional (default: 1000000)
+        Max number of values per band kept across all datasets.
+
+    Returns
+    -------
+    statistics : dict
+        Per-band (index as str) statistics, in rio-tiler metadata format
+        e.g {"1": {"pc": [38, 147], "min": 20, "max": 180, "std": 28.1}}.
+
+    """
+    if not assets:
+        return {}
+
+    # Limit the number of values kept per dataset, as soon as it is read, so
+    # memory use does not grow with the number of datasets.
+    per_asset = max(1, max_samples // len(assets))
+
+    with futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
+        future_work = [
+            executor.submit(_sample_values, asset, max_size, per_asset)
+            for asset in assets
+        ]
+    results = list(_filter_futures(future_work))
+    if not results:
+        return {}
+
+    statistics = {}
+    for bidx in range(len(results[0])):
+        values = numpy.concatenate([bands[bidx] for bands in results])
+        if not values.size:
+            continue
+
+        statistics[str(bidx + 1)] = {
+            "pc": numpy.percentile(values, percentiles).astype(values.dtype).tolist(),
+            "min": values.min().item(),
+            "max": values.max().item(),
+            "std": values.std().item(),
+        }
+
+    return statistics
@@ -0,0 +1,310 @@
+"""cogeo_mosaic_tiler.storage: mosaic definitions storage backends."""
+
+from typing import Dict, Iterator, Tuple
+
+import os
+import abc
+import json
+import sqlite3
+import functools
+import threading
+from collections.abc import Mapping
+from urllib.parse import urlparse
+
+from boto3.session import Session as boto3_session
+
+from cogeo_mosaic_tiler.utils import _aws_put_data, _compress_gz_json
+
+
+class MosaicNotFoundError(Exception):
+    """Mosaic definition not found in storage."""
+
+
+class MosaicStorage(abc.ABC):
+    """Mosaic definitions storage backend."""
+
+    @abc.abstractmethod
+    def path(self, mosaicid: str) -> str:
+        """Return the mosaic definition url (readable by `fetch_mosaic_definition`)."""
+
+    @abc.abstractmethod
+    def overviews_path(self, mosaicid: str) -> str:
+        """Return the mosaic overviews directory."""
+
+    @abc.abstractmethod
+    def write(self, mosaicid: str, mosaic_def: Dict) -> str:
+        """Write mosaic definition and return its url."""
+
+
+class S3Storage(MosaicStorage):
+    """
+    Store mosaic definitions as gzipped JSON documents on S3.
+
+    Attributes
+    ----------
+    bucket : str, required
+        S3 bucket.
+    prefix : str, optional (default: "mosaics")
+        S3 key prefix.
+
+    """
+
+    def __init__(self, bucket: str, prefix: str = "mosaics"):
+        """Initialize storage."""
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = None
+
+    @property
+    def client(self):
+        """S3 client (created on first use)."""
+        if self._client is None:
+            self._client = boto3_session().client("s3")
+        return self._client
+
+    def key(self, mosaicid: str) -> str:
+        """Return the mosaic definition S3 key."""
+        return f"{self.prefix}/{mosaicid}.json.gz"
+
+    def path(self, mosaicid: str) -> str:
+        """Return the mosaic definition url."""
+        return f"s3://{self.bucket}/{self.key(mosaicid)}"
+
+    def overviews_path(self, mosaicid: str) -> str:
+        """Return the mosaic overviews directory."""
+        return f"s3://{self.bucket}/{self.prefix}/{mosaicid}/overviews"
+
+    def write(self, mosaicid: str, mosaic_def: Dict) -> str:
+        """Write mosaic definition and return its url."""
+        _aws_put_data(
+            self.key(mosaicid),
+            self.bucket,
+            _compress_gz_json(mosaic_def),
+            client=self.client,
+        )
+        return self.path(mosaicid)
+
+
+class FileStorage(MosaicStorage):
+    """
+    Store mosaic definitions as gzipped JSON documents in a local directory.
+
+    Attributes
+    ----------
+    directory : str, required
+        Local directory.
+
+    """
+
+    def __init__(self, directory: str):
+        """Initialize storage."""
+        self.directory = directory
+
+    def path(self, mosaicid: str) -> str:
+        """Return the mosaic definition file path."""
+        return os.path.join(self.directory, f"{mosaicid}.json.gz")
+
+    def overviews_path(self, mosaicid: str) -> str:
+        """Return the mosaic overviews directory."""
+        return os.path.join(self.directory, mosaicid, "overviews")
+
+    def write(self, mosaicid: str, mosaic_def: Dict) -> str:
+        """Write mosaic definition (atomically) and return its path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(mosaicid)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_compress_gz_json(mosaic_def))
+        os.replace(tmp_path, path)
+        return path
+
+
+class _SQLiteTable(Mapping):
+    """Read-only mapping over the rows of a mosaic in a SQLite table."""
+
+    def __init__(self, storage: "SQLiteStorage", table: str, mosaicid: str):
+        self._storage = storage
+        self._table = table
+        self._mosaicid = mosaicid
+
+    def __getitem__(self, key: str):
+        row = (
+            self._storage.connection()
+            .execute(
+                f"SELECT value FROM {self._table} WHERE mosaic = ? AND key = ?",
+                (self._mosaicid, key),
+            )
+            .fetchone()
+        )
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._storage.connection().execute(
+            f"SELECT key FROM {self._table} WHERE mosaic = ? ORDER BY key",
+            (self._mosaicid,),
+        )
+        return (row[0] for row in rows.fetchall())
+
+    def __bool__(self) -> bool:
+        return (
+            self._storage.connection()
+            .execute(
+                f"SELECT 1 FROM {self._table} WHERE mosaic = ? LIMIT 1",
+                (self._mosaicid,),
+            )
+            .fetchone()
+            is not None
+        )
+
+    def __len__(self) -> int:
+        return (
+            self._storage.connection()
+            .execute(
+                f"SELECT COUNT(*) FROM {self._table} WHERE mosaic = ?",
+                (self._mosaicid,),
+            )
+            .fetchone()[0]
+        )
+
+
+class SQLiteStorage(MosaicStorage):
+    """
+    Store mosaic definitions in a SQLite database.
+
+    The quadkey -> assets index and the assets metadata are stored one row per
+    quadkey/asset in tables indexed by (mosaic, key). `read` returns the
+    definition with `tiles` and `assets` as read-only mappings querying only
+    the rows they need, so finding the assets of a tile does not load the
+    whole document.
+
+    Mosaic urls are `sqlite://{database path}:{mosaicid}`.
+
+    Attributes
+    ----------
+    database : str, required
+        SQLite database path.
+
+    """
+
+    def __init__(self, database: str):
+        """Initialize storage."""
+        self.database = database
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """Return the current thread database connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            dirname = os.path.dirname(self.database)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            conn = sqlite3.connect(self.database, timeout=30)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS mosaics (
+                    id TEXT PRIMARY KEY, header TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tiles (
+                    mosaic TEXT, key TEXT, value TEXT NOT NULL,
+                    PRIMARY KEY (mosaic, key)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS assets (
+                    mosaic TEXT, key TEXT, value TEXT NOT NULL,
+                    PRIMARY KEY (mosaic, key)
+                ) WITHOUT ROWID;
+                """
+            )
+            self._local.conn = conn
+        return conn
+
+    def path(self, mosaicid: str) -> str:
+        """Return the mosaic definition url."""
+        return f"sqlite://{self.database}:{mosaicid}"
+
+    def overviews_path(self, mosaicid: str) -> str:
+        """Return the mosaic overviews directory (next to the database)."""
+        root, _ = os.path.splitext(self.database)
+        return os.path.join(f"{root}_overviews", mosaicid)
+
+    def write(self, mosaicid: str, mosaic_def: Dict) -> str:
+        """Write (or replace) mosaic definition and return its url."""
+        header = {k: v for k, v in mosaic_def.items() if k not in ["tiles", "assets"]}
+        tiles = mosaic_def.get("tiles", {})
+        assets = mosaic_def.get("assets", {})
+
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO mosaics (id, header) VALUES (?, ?)",
+                (mosaicid, json.dumps(header)),
+            )
+            for table, rows in [("tiles", tiles), ("assets", assets)]:
+                conn.execute(f"DELETE FROM {table} WHERE mosaic = ?", (mosaicid,))
+                conn.executemany(
+                    f"INSERT INTO {table} (mosaic, key, value) VALUES (?, ?, ?)",
+                    ((mosaicid, k, json.dumps(v)) for k, v in rows.items()),
+                )
+
+        return self.path(mosaicid)
+
+    def read(self, mosaicid: str) -> Dict:
+        """Read mosaic definition (with lazy `tiles` and `assets`)."""
+        row = (
+            self.connection()
+            .execute("SELECT header FROM mosaics WHERE id = ?", (mosaicid,))
+            .fetchone()
+        )
+        if row is None:
+            raise MosaicNotFoundError(f"Mosaic {mosaicid} not found in {self.database}")
+
+        mosaic_def = json.loads(row[0])
+        mosaic_def["tiles"] = _SQLiteTable(self, "tiles", mosaicid)
+        mosaic_def["assets"] = _SQLiteTable(self, "assets", mosaicid)
+        return mosaic_def
+
+
+def parse_sqlite_url(url: str) -> Tuple[str, str]:
+    """Return database path and mosaic id from a `sqlite://` url."""
+    database, _, mosaicid = url[len("sqlite://") :].rpartition(":")
+    if not database or not mosaicid:
+        raise ValueError(f"Invalid SQLite mosaic url: {url}")
+    return database, mosaicid
+
+
+@functools.lru_cache(maxsize=16)
+def _get_storage(config: str) -> MosaicStorage:
+    parsed = urlparse(config)
+    if parsed.scheme == "s3":
+        return S3Storage(parsed.netloc, parsed.path.strip("/") or "mosaics")
+    if parsed.scheme == "sqlite":
+        return SQLiteStorage(config[len("sqlite://") :])
+    if parsed.scheme == "file":
+        return FileStorage(parsed.path)
+    if not parsed.scheme:
+        return FileStorage(config)
+
+    raise ValueError(f"Unsupported mosaic storage: {config}")
+
+
+def get_storage() -> MosaicStorage:
+    """
+    Return the mosaic storage backend.
+
+    Set with the `MOSAIC_STORAGE` environment variable:
+    - `s3://{bucket}/{prefix}` (default: `s3://$MOSAIC_DEF_BUCKET/mosaics`)
+    - `file://{directory}` or `{directory}`
+    - `sqlite://{database path}` (e.g `sqlite:///data/mosaics.db`)
+
+    """
+    config = os.environ.get("MOSAIC_STORAGE")
+    if not config:
+        config = f"s3://{os.environ['MOSAIC_DEF_BUCKET']}/mosaics"
+    return _get_storage(config)
+
+
+def read_sqlite_mosaic(url: str) -> Dict:
+    """Read a mosaic definition from a `sqlite://{database path}:{mosaicid}` url."""
+    database, mosaicid = parse_sqlite_url(url)
+    return _get_storage(f"sqlite://{database}").read(mosaicid)
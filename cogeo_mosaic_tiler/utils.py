@@ -7,6 +7,7 @@ import zlib
 import json
 import logging
 import hashlib
+from urllib.parse import urlparse
 
 from boto3.session import Session as boto3_session
 
@@ -37,6 +38,22 @@ def _aws_put_data(
     return key
 
 
+def _put_data(url: str, body: BinaryIO, client: boto3_session.client = None) -> str:
+    """Write data to S3 or to a local file."""
+    url_info = urlparse(url)
+    if url_info.scheme == "s3":
+        return _aws_put_data(
+            url_info.path.strip("/"), url_info.netloc, body, client=client
+        )
+
+    dirname = os.path.dirname(url)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    with open(url, "wb") as f:
+        f.write(body)
+    return url
+
+
 def get_hash(**kwargs: Any) -> str:
     """Create hash from a dict."""
     return hashlib.sha224(
@@ -45,7 +62,7 @@ def get_hash(**kwargs: Any) -> str:
 
 
 def _create_path(mosaicid: str) -> str:
-    """Get Mosaic definition info."""
-    key = f"mosaics/{mosaicid}.json.gz"
-    bucket = os.environ["MOSAIC_DEF_BUCKET"]
-    return f"s3://{bucket}/{key}"
+    """Get Mosaic definition url in the configured storage."""
+    from cogeo_mosaic_tiler.storage import get_storage
+
+    return get_storage().path(mosaicid)
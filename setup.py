@@ -4,9 +4,19 @@ from setuptools import setup, find_packages
 
 
 # Runtime requirements.
-inst_reqs = ["cogeo-mosaic>=2.0.1", "rio-color", "rio_tiler_mvt", "lambda-proxy~=5.0"]
+inst_reqs = [
+    "click",
+    "cogeo-mosaic>=2.0.1",
+    "rio-color",
+    "rio_tiler_mvt",
+    "vtzero",
+    "lambda-proxy~=5.0",
+]
 extra_reqs = {
-    "test": ["pytest", "pytest-cov", "mock"],
+    "raw": ["zstandard", "lz4"],
+    "pillow": ["Pillow"],
+    "brotli": ["brotli"],
+    "test": ["pytest", "pytest-cov", "mock", "zstandard", "lz4", "Pillow", "brotli"],
     "dev": ["pytest", "pytest-cov", "pre-commit", "mock"],
 }
 
@@ -33,4 +43,8 @@ setup(
     zip_safe=False,
     install_requires=inst_reqs,
     extras_require=extra_reqs,
+    entry_points="""
+      [console_scripts]
+      cogeo-mosaic-tiler=cogeo_mosaic_tiler.scripts.cli:cogeo_mosaic_tiler_cli
+      """,
 )
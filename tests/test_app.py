@@ -3,15 +3,28 @@
 import os
 import re
 import json
+import gzip
+import io
+import time
 import base64
 import urllib
+import zipfile
+from concurrent import futures
 
+import numpy
 import pytest
+import mercantile
 from mock import patch
 from botocore.exceptions import ClientError
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
 
 from cogeo_mosaic.utils import create_mosaic
 from cogeo_mosaic import version
+from rio_tiler_mosaic.methods import defaults
+
+from cogeo_mosaic_tiler.custom_methods import StreamingMedianMethod
 
 
 asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
@@ -76,7 +89,7 @@ def test_favicon(event):
     assert res == resp
 
 
-@patch("cogeo_mosaic_tiler.handlers.app._aws_put_data")
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
 def test_add_mosaic(aws_put_data, event):
     """Test /add route."""
     from cogeo_mosaic_tiler.handlers.app import app
@@ -120,8 +133,110 @@ def test_add_mosaic(aws_put_data, event):
     aws_put_data.assert_called()
 
 
+def test_add_mosaic_overwrite(event, monkeypatch, tmpdir):
+    """Should not serve cached content after a mosaic is overwritten."""
+    from cogeo_mosaic_tiler.cache import EmptyTileCache, LRUCache, SharedCache
+    from cogeo_mosaic_tiler.handlers import app as handlers
+
+    monkeypatch.setenv("MOSAIC_STORAGE", str(tmpdir))
+    store = SharedCache(str(tmpdir.join("empty_tiles")))
+    monkeypatch.setattr(handlers, "empty_tiles", EmptyTileCache(store=store))
+    mosaicid = "b99dd7e8cc284c6da4d2899e16b6ff85c8ab97041ae7b459eb67e5ff"
+
+    def _add(assets):
+        event["path"] = "/add"
+        event["httpMethod"] = "POST"
+        event["body"] = json.dumps(create_mosaic(assets)).encode()
+        event["queryStringParameters"] = dict(mosaicid=mosaicid, statistics="false")
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 200
+
+    def _get(path, **params):
+        event["path"] = f"/{mosaicid}/{path}"
+        event["httpMethod"] = "GET"
+        event.pop("body", None)
+        event["queryStringParameters"] = params
+        return handlers.app(event, {})
+
+    with patch.object(handlers, "tile_cache", LRUCache(maxsize=16)):
+        _add([asset1])
+        info = json.loads(_get("info")["body"])
+        assert info["quadkeys"]
+        tile = _get("9/152/182.png", rescale="0,10000")["body"]
+
+        _add([asset2])
+        assert _get("9/149/181.png")["statusCode"] == 204
+        # Other (or restarted) worker persisting empty tiles in the same store
+        worker = EmptyTileCache(store=store)
+        url = handlers._create_path(mosaicid)
+        assert worker.contains(url, 9, 149, 181)
+
+        _add([asset1, asset2])
+        assert not worker.contains(url, 9, 149, 181)
+        # Tiles recorded as empty for the previous definition
+        assert _get("9/149/181.png")["statusCode"] == 200
+        new_info = json.loads(_get("info")["body"])
+        assert new_info["bounds"] != info["bounds"]
+        assert _get("9/152/182.png", rescale="0,10000")["body"] != tile
+
+
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
+def test_add_mosaic_optimize(aws_put_data, event):
+    """Test /add route with optimizer."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    event["path"] = "/add"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps(mosaic_content).encode()
+    event["queryStringParameters"] = dict(
+        optimize="true", max_assets="1", statistics="false"
+    )
+
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    body = json.loads(gzip.decompress(aws_put_data.call_args[0][2]))
+    assert body["tiles"]
+    assert all(len(assets) == 1 for assets in body["tiles"].values())
+    assert any(len(assets) > 1 for assets in mosaic_content["tiles"].values())
+
+
+def test_API_optimized_pixel_selection(event, monkeypatch, tmpdir):
+    """Should reject pixel selection methods optimized mosaics do not support."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    monkeypatch.setenv("MOSAIC_STORAGE", str(tmpdir))
+    mosaicid = "c99dd7e8cc284c6da4d2899e16b6ff85c8ab97041ae7b459eb67e5ff"
+    event["path"] = "/add"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps(create_mosaic([asset1, asset2])).encode()
+    event["queryStringParameters"] = dict(
+        mosaicid=mosaicid, optimize="true", statistics="false"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+
+    event["httpMethod"] = "GET"
+    event.pop("body")
+    paths = [
+        "9/150/182.png",
+        "9/150/182.pbf",
+        "preview.png",
+        "bbox/-75.9,45,-75.5,45.5.tif",
+    ]
+    for path in paths:
+        event["path"] = f"/{mosaicid}/{path}"
+        event["queryStringParameters"] = dict(pixel_selection="mean")
+        res = app(event, {})
+        assert res["statusCode"] == 400
+        assert "Optimized mosaic" in res["body"]
+
+        event["queryStringParameters"] = dict(pixel_selection="first")
+        res = app(event, {})
+        assert res["statusCode"] == 200
+
+
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
-@patch("cogeo_mosaic_tiler.handlers.app._aws_put_data")
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
 def test_create_mosaic(aws_put_data, get_mosaic, event):
     """Test /create route."""
     from cogeo_mosaic_tiler.handlers.app import app
@@ -160,7 +275,7 @@ def test_create_mosaic(aws_put_data, get_mosaic, event):
 
 
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
-@patch("cogeo_mosaic_tiler.handlers.app._aws_put_data")
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
 def test_create_mosaicPNG(aws_put_data, get_mosaic, event):
     """Test /create route."""
     from cogeo_mosaic_tiler.handlers.app import app
@@ -200,7 +315,7 @@ def test_create_mosaicPNG(aws_put_data, get_mosaic, event):
 
 
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
-@patch("cogeo_mosaic_tiler.handlers.app._aws_put_data")
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
 def test_create_mosaicMVT(aws_put_data, get_mosaic, event):
     """Test /create route."""
     from cogeo_mosaic_tiler.handlers.app import app
@@ -239,6 +354,65 @@ def test_create_mosaicMVT(aws_put_data, get_mosaic, event):
     aws_put_data.assert_called()
 
 
+@patch("cogeo_mosaic_tiler.handlers.app.create_overviews")
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
+def test_create_mosaic_overviews(aws_put_data, get_mosaic, create_overviews, event):
+    """Test /create route with overviews."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    event["path"] = "/create"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps([asset1, asset2])
+    event["queryStringParameters"] = dict(overview_levels="2")
+
+    get_mosaic.side_effect = ClientError(
+        {"Error": {"Code": "404", "Message": "Not Found"}}, "get_object"
+    )
+    create_overviews.return_value = dict(
+        minzoom=5, maxzoom=6, quadkey_zoom=5, tiles={"03023": ["overview.tif"]}
+    )
+
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    tilejson = json.loads(res["body"])
+    assert tilejson["minzoom"] == 5
+    assert tilejson["maxzoom"] == 9
+    create_overviews.assert_called_once()
+    args, kwargs = create_overviews.call_args
+    assert re.match(r"s3://my-bucket/mosaics/[0-9A-Fa-f]{56}/overviews", args[1])
+    assert kwargs["levels"] == 2
+    aws_put_data.assert_called()
+
+    # Options are part of the mosaic id
+    event["queryStringParameters"] = dict()
+    res = app(event, {})
+    assert json.loads(res["body"])["name"] != tilejson["name"]
+    event["queryStringParameters"] = dict(valid_footprint="true")
+    res = app(event, {})
+    assert json.loads(res["body"])["name"] != tilejson["name"]
+
+    get_mosaic.side_effect = None
+    get_mosaic.return_value = dict(
+        mosaic_content, overviews=create_overviews.return_value
+    )
+    event["path"] = f"/{tilejson['name']}/info"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict()
+    event.pop("body")
+    res = app(event, {})
+    assert json.loads(res["body"])["minzoom"] == 5
+
+    event["path"] = "/create"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps([asset1, asset2])
+    for levels in ["5", "-1"]:
+        event["queryStringParameters"] = dict(overview_levels=levels)
+        res = app(event, {})
+        assert res["statusCode"] == 400
+        assert res["body"].startswith("Invalid overview_levels")
+
+
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
 def test_get_mosaic_info(get_data, event):
     """Test /info route."""
@@ -331,8 +505,9 @@ def test_get_mosaic_geojson_mosaicid(get_data, event):
     get_data.assert_called_once()
 
 
+@patch("cogeo_mosaic_tiler.handlers.app.refresh_mosaic", return_value=False)
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
-def test_get_mosaic_wmts(get_data):
+def test_get_mosaic_wmts(get_data, refresh):
     """Test /wmts route."""
     from cogeo_mosaic_tiler.handlers.app import app
 
@@ -362,10 +537,12 @@ def test_get_mosaic_wmts(get_data):
     body = res["body"]
     assert "https://somewhere-over-the-rainbow.com/wmts" in body
     get_data.assert_called_once()
+    refresh.assert_called_once_with("http://mymosaic.json")
 
 
+@patch("cogeo_mosaic_tiler.handlers.app.refresh_mosaic")
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
-def test_get_mosaic_wmts_mosaicid(get_data):
+def test_get_mosaic_wmts_mosaicid(get_data, refresh):
     """Test /wmts route."""
     from cogeo_mosaic_tiler.handlers.app import app
 
@@ -398,6 +575,62 @@ def test_get_mosaic_wmts_mosaicid(get_data):
     assert "https://somewhere-over-the-rainbow.com/wmts" in body
     assert "99dd7e8cc284c6da4d2899e16b6ff85c8ab97041ae7b459eb67e516" in body
     get_data.assert_called_once()
+    refresh.assert_not_called()
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.refresh_mosaic", return_value=False)
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+def test_get_mosaic_wmts_cache(get_data, refresh, event):
+    """Should cache WMTS capabilities and mosaic summary."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_data.return_value = mosaic_content
+
+    event["path"] = "/wmts"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(url="http://mycachedwmts.json")
+
+    with patch.object(
+        handlers, "wmts_template", wraps=handlers.wmts_template
+    ) as template:
+        body = app(event, {})["body"]
+        assert app(event, {})["body"] == body
+        get_data.assert_called_once()
+        template.assert_called_once()
+
+        # Other parameters, same mosaic summary
+        event["queryStringParameters"]["tile_format"] = "jpg"
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        assert "image/jpg" in res["body"]
+        get_data.assert_called_once()
+        assert template.call_count == 2
+
+
+@patch("cogeo_mosaic_tiler.mosaic.get_mosaic_content")
+def test_get_mosaic_wmts_cache_ttl(get_content, event, monkeypatch):
+    """Should expire WMTS capabilities of url= mosaics."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    monkeypatch.setattr(handlers, "MOSAIC_URL_CACHE_TTL", 0.01)
+    get_content.return_value = dict(mosaic_content)
+
+    event["path"] = "/wmts"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(url="http://myexpiringwmts.json")
+
+    body = app(event, {})["body"]
+    assert app(event, {})["body"] == body
+
+    # Mosaic updated outside of the application
+    get_content.return_value = dict(mosaic_content, maxzoom=10)
+    time.sleep(0.02)
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert "<ows:Identifier>10</ows:Identifier>" not in body
+    assert "<ows:Identifier>10</ows:Identifier>" in res["body"]
 
 
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
@@ -743,6 +976,35 @@ def test_API_MVTtiles(get_assets, event):
     assert headers["Content-Type"] == "application/x-protobuf"
     assert res["body"]
 
+    event["path"] = f"/9/150/182.pbf"
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", feature_type="grid", cell_size="16"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "application/x-protobuf"
+    assert res["body"]
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", tile_size="64", feature_type="polygonize"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["body"]
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", feature_type="grid", cell_size="100"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", feature_type="line"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Invalid feature type: line"
+
 
 @patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets_point")
 def test_API_points(get_assets, event):
@@ -765,3 +1027,760 @@ def test_API_points(get_assets, event):
     assert body["coordinates"]
     assert body["values"]
     assert len(body["values"]) == 2
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_empty_tiles(get_assets, event):
+    """Test empty tiles negative cache."""
+    from cogeo_mosaic_tiler.handlers.app import app, empty_tiles
+
+    # Tile outside the assets bounds
+    get_assets.return_value = [asset1, asset2]
+    event["path"] = f"/9/0/0.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(url="http://myemptymosaic.json")
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    assert res["body"] == "empty tiles"
+    assert get_assets.call_count == 1
+    assert empty_tiles.contains("http://myemptymosaic.json", 9, 0, 0)
+
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    assert res["body"] == "empty tiles"
+    assert get_assets.call_count == 1
+
+    event["path"] = f"/9/0/0.pbf"
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    assert get_assets.call_count == 1
+
+    # Read errors are not cached
+    get_assets.return_value = ["/tmp/missing.tif"]
+    event["path"] = f"/9/1/0.png"
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    res = app(event, {})
+    assert res["statusCode"] == 204
+    assert get_assets.call_count == 3
+    assert not empty_tiles.contains("http://myemptymosaic.json", 9, 1, 0)
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_coalescing(get_assets, event):
+    """Concurrent requests for the same tile should share one render."""
+    from cogeo_mosaic_tiler.handlers.app import app, tile_flights
+
+    def _assets(*args, **kwargs):
+        time.sleep(0.5)
+        return [asset1, asset2]
+
+    get_assets.side_effect = _assets
+    event["path"] = f"/9/150/182.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(url="http://mycoalescedmosaic.json")
+
+    coalesced = tile_flights.coalesced
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        responses = list(executor.map(lambda e: app(dict(e), {}), [event] * 4))
+
+    assert get_assets.call_count == 1
+    assert tile_flights.coalesced == coalesced + 3
+    assert all(res["statusCode"] == 200 for res in responses)
+    assert len(set(res["body"] for res in responses)) == 1
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_raw(get_assets, event):
+    """Test raw array tiles."""
+    from cogeo_mosaic_tiler.handlers.app import app
+    from cogeo_mosaic_tiler import raw
+
+    get_assets.return_value = [asset1, asset2]
+
+    event["path"] = f"/9/150/182.bin"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(url="http://mymosaic.json", indexes="1")
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "application/x-cogeo-mosaic-tile"
+    tile, mask, header = raw.decode(base64.b64decode(res["body"]))
+    assert tile.shape == (1, 256, 256)
+    assert mask.shape == (256, 256)
+    assert mask.any()
+    assert header["compression"] == "none"
+    assert header["bounds"] == list(mercantile.xy_bounds(150, 182, 9))
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", indexes="1", compression="lz4"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    _, _, header = raw.decode(base64.b64decode(res["body"]))
+    assert header["compression"] == "lz4"
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", compression="gzip"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Unsupported compression: gzip"
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_profile(get_assets, event):
+    """Test image encoding profiles."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_assets.return_value = [asset1, asset2]
+
+    event["path"] = f"/9/150/182.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", rescale="0,10000", profile="speed"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    speed = base64.b64decode(res["body"])
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", rescale="0,10000", profile="size"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert len(base64.b64decode(res["body"])) < len(speed)
+
+    event["queryStringParameters"] = dict(url="http://mymosaic.json", profile="best")
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Invalid encoding profile: best"
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_profile_profiling(get_assets, event, tmpdir):
+    """Encoding profiles should not be taken by the request profiler."""
+    from cogeo_mosaic_tiler import profiling
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_assets.return_value = [asset1, asset2]
+
+    event["path"] = f"/9/150/182.png"
+    event["queryStringParameters"] = dict(
+        url="http://myprofiledmosaic.json", rescale="0,10000", profile="speed"
+    )
+    res = app(event, {})
+    speed = base64.b64decode(res["body"])
+
+    profiler = profiling.RequestProfiler(str(tmpdir), secret="secret")
+    with patch.object(app, "profiler", profiler):
+        token = profiling.sign("/9/150/182.png", int(time.time()) + 60, "secret")
+        event["queryStringParameters"] = dict(
+            url="http://myprofiledmosaic.json",
+            rescale="0,10000",
+            profile="size",
+            profile_token=token,
+        )
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        assert profiling.PROFILE_HEADER in res["headers"]
+        assert len(base64.b64decode(res["body"])) < len(speed)
+
+
+@patch("cogeo_mosaic_tiler.storage._aws_put_data")
+def test_add_mosaic_statistics(aws_put_data, event):
+    """Test /add route statistics."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    event["path"] = "/add"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps(mosaic_content).encode()
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    mosaic_def = json.loads(gzip.decompress(aws_put_data.call_args[0][2]))
+    assert list(mosaic_def["statistics"]) == ["1", "2", "3"]
+
+    event["queryStringParameters"] = dict(statistics="false")
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    mosaic_def = json.loads(gzip.decompress(aws_put_data.call_args[0][2]))
+    assert "statistics" not in mosaic_def
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_rescale_auto(get_assets, get_mosaic, event):
+    """Test rescale=auto."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_assets.return_value = [asset1, asset2]
+    get_mosaic.return_value = dict(mosaic_content)
+
+    event["path"] = f"/9/150/182.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(
+        url="http://myautomosaic.json", rescale="auto"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Mosaic definition has no statistics"
+
+    get_mosaic.return_value = dict(
+        mosaic_content,
+        statistics={
+            "1": {"pc": [0, 10000]},
+            "2": {"pc": [0, 10000]},
+            "3": {"pc": [0, 10000]},
+        },
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    auto = res["body"]
+
+    event["queryStringParameters"] = dict(
+        url="http://myautomosaic.json", rescale="0,10000"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["body"] == auto
+
+    event["queryStringParameters"] = dict(
+        url="http://myautomosaic.json", rescale="auto", indexes="4"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_asset_order(get_assets, event):
+    """Should sort assets by coverage only for methods exiting when filled."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_assets.return_value = [asset1, asset2]
+    event["path"] = f"/9/150/182.png"
+    event["httpMethod"] = "GET"
+
+    expected = {
+        "first": dict(reverse=False, sort_by_coverage=True),
+        "last": dict(reverse=True, sort_by_coverage=True),
+        "bdix_stdev": dict(reverse=False, sort_by_coverage=True),
+        "mean": dict(reverse=False, sort_by_coverage=False),
+    }
+    for pixel_selection, kwargs in expected.items():
+        kwargs["pixel_selection"] = pixel_selection
+        event["queryStringParameters"] = dict(
+            url="http://myorderedmosaic.json",
+            pixel_selection=pixel_selection,
+            rescale="0,1000",
+        )
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        assert get_assets.call_args[1] == kwargs
+
+
+def _constant_cog(path, bounds, value):
+    """Create a one band EPSG:4326 dataset filled with a value."""
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=256,
+        height=256,
+        count=1,
+        dtype="uint8",
+        nodata=0,
+        crs="epsg:4326",
+        transform=from_bounds(*bounds, 256, 256),
+        tiled=True,
+    ) as dst:
+        dst.write(numpy.full((1, 256, 256), value, dtype="uint8"))
+
+
+@patch("cogeo_mosaic_tiler.mosaic.fetch_mosaic_definition")
+def test_API_tiles_asset_order_overlap(get_mosaic, event, tmpdir):
+    """Should keep the pixel selection result with overlapping assets."""
+    from cogeo_mosaic_tiler.handlers.app import app
+    from cogeo_mosaic_tiler import raw
+    from cogeo_mosaic_tiler.mosaic import create_mosaic as create_tiler_mosaic
+
+    # `large` covers most of the tile and overlaps `small`
+    small = str(tmpdir.join("small.tif"))
+    large = str(tmpdir.join("large.tif"))
+    _constant_cog(small, (0, 0, 2, 6), 1)
+    _constant_cog(large, (0, 0, 6, 6), 2)
+    get_mosaic.return_value = create_tiler_mosaic([small, large], minzoom=6)
+
+    event["path"] = f"/6/32/31.bin"
+    for pixel_selection, expected in [("first", 1), ("last", 2)]:
+        event["queryStringParameters"] = dict(
+            url="http://myoverlapmosaic.json", pixel_selection=pixel_selection
+        )
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        data, mask, _ = raw.decode(base64.b64decode(res["body"]))
+        overlap = data[0, :, :16]
+        assert (overlap == expected).all()
+        assert (data[0, :, -16:] == 2).all()
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_streaming_percentile(get_assets, event, tmpdir):
+    """Should render tiles with the streaming percentile methods."""
+    from cogeo_mosaic_tiler.handlers.app import app
+    from cogeo_mosaic_tiler import raw
+
+    assets = []
+    for value in [10, 20, 30]:
+        path = str(tmpdir.join(f"cog_{value}.tif"))
+        _constant_cog(path, (0, 0, 6, 6), value)
+        assets.append(path)
+    get_assets.return_value = assets
+
+    event["path"] = f"/6/32/31.bin"
+    event["httpMethod"] = "GET"
+    for pixel_selection, expected in [
+        ("streaming_p10", 12),
+        ("streaming_median", 20),
+        ("streaming_p90", 28),
+    ]:
+        event["queryStringParameters"] = dict(
+            url="http://mypercentilemosaic.json", pixel_selection=pixel_selection
+        )
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        data, mask, _ = raw.decode(base64.b64decode(res["body"]))
+        assert (data[0, mask > 0] == expected).all()
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_expression(get_assets, event):
+    """Test band math expression on tiles."""
+    from cogeo_mosaic_tiler.handlers.app import app
+    from cogeo_mosaic_tiler import raw
+
+    get_assets.return_value = [asset1, asset2]
+    event["path"] = f"/9/150/182.bin"
+    event["httpMethod"] = "GET"
+
+    event["queryStringParameters"] = dict(url="http://mymosaic.json", indexes="1,3")
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    bands, mask, _ = raw.decode(base64.b64decode(res["body"]))
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", expression="(b3 - b1) / (b3 + b1), b1 * 2"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    tile, emask, header = raw.decode(base64.b64decode(res["body"]))
+    assert numpy.dtype(header["dtype"]) == numpy.float64
+    assert tile.shape == (2, 256, 256)
+    numpy.testing.assert_array_equal(mask, emask)
+    b1, b3 = bands[:, mask > 0].astype("float64")
+    numpy.testing.assert_allclose(tile[0, mask > 0], (b3 - b1) / (b3 + b1))
+    numpy.testing.assert_allclose(tile[1, mask > 0], b1 * 2)
+
+    event["path"] = f"/9/150/182.png"
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", expression="(b3 - b1) / (b3 + b1)", rescale="-1,1"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/png"
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", expression="b1", indexes="1"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Cannot pass indexes and expression"
+
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", expression="__import__('os')"
+    )
+    res = app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Unsupported function: __import__"
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_memory_budget(get_assets, event, monkeypatch):
+    """Should degrade or reject tiles over the memory budget."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+    from cogeo_mosaic_tiler.memory import estimate_tile_memory
+
+    monkeypatch.setenv("MAX_THREADS", "4")
+    get_assets.return_value = [asset1, asset2] * 10
+    event["path"] = f"/9/150/182.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(
+        url="http://mymemorymosaic.json", pixel_selection="median", rescale="0,1000"
+    )
+    # 20 uint16 RGB assets: 87MB with median, 50MB with streaming_median
+    assert estimate_tile_memory("median", 20, 3, "uint16", 256, 4) > 80e6
+
+    with patch.object(
+        handlers, "mosaic_tiler", wraps=handlers.mosaic_tiler
+    ) as tiler, patch.object(handlers, "TILE_MEMORY_BUDGET", 60):
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 200
+        kwargs = tiler.call_args[1]
+        assert isinstance(kwargs["pixel_selection"], StreamingMedianMethod)
+        assert len(tiler.call_args[0][0]) == 20
+
+        with patch.object(handlers, "TILE_MEMORY_STREAMING", False):
+            event["queryStringParameters"]["rescale"] = "0,2000"
+            res = handlers.app(event, {})
+            assert res["statusCode"] == 200
+            kwargs = tiler.call_args[1]
+            assert isinstance(kwargs["pixel_selection"], defaults.MedianMethod)
+            assert kwargs["chunk_size"] == 1
+            assert 1 < len(tiler.call_args[0][0]) < 20
+
+        tiler.reset_mock()
+        event["path"] = f"/9/150/182@4x.png"
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 400
+        assert "over the 60MB memory budget" in res["body"]
+        tiler.assert_not_called()
+
+    # no budget
+    with patch.object(
+        handlers, "mosaic_tiler", wraps=handlers.mosaic_tiler
+    ) as tiler, patch.object(handlers, "TILE_MEMORY_BUDGET", 0):
+        event["path"] = f"/9/150/182.png"
+        event["queryStringParameters"]["rescale"] = "0,3000"
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 200
+        kwargs = tiler.call_args[1]
+        assert isinstance(kwargs["pixel_selection"], defaults.MedianMethod)
+        assert kwargs["chunk_size"] is None
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets_point")
+def test_API_points_expression(get_assets, event):
+    """Test band math expression on points."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    get_assets.return_value = [asset1, asset2]
+    event["path"] = f"/point"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(
+        url="http://mymosaic.json", lng="-73", lat="45"
+    )
+    res = app(event, {})
+    values = json.loads(res["body"])["values"]
+
+    event["queryStringParameters"]["expression"] = "b1 + b3, b2"
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    body = json.loads(res["body"])
+    assert len(body["values"]) == 2
+    for point, expected in zip(body["values"], values):
+        b1, b2, b3 = expected["values"]
+        assert point["asset"] == expected["asset"]
+        assert point["values"] == [b1 + b3, b2]
+
+    event["queryStringParameters"]["expression"] = "b1 +"
+    res = app(event, {})
+    assert res["statusCode"] == 400
+
+
+def test_sqlite_storage(event, monkeypatch, tmpdir):
+    """Should store and serve mosaics from SQLite."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    database = str(tmpdir.join("mosaics.db"))
+    monkeypatch.setenv("MOSAIC_STORAGE", f"sqlite://{database}")
+
+    event["path"] = "/add"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps(mosaic_content).encode()
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    body = json.loads(res["body"])
+    assert body["url"] == f"sqlite://{database}:{body['id']}"
+
+    event["path"] = f"/{body['id']}/9/150/182.png"
+    event["httpMethod"] = "GET"
+    event["body"] = None
+    event["queryStringParameters"] = dict(rescale="0,10000")
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/png"
+
+    event["path"] = f"/{body['id']}/info"
+    event["queryStringParameters"] = {}
+    res = app(event, {})
+    assert res["statusCode"] == 200
+    assert json.loads(res["body"])["quadkeys"]
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+def test_API_preview(get_mosaic, event):
+    """Test /preview routes."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+
+    get_mosaic.return_value = dict(mosaic_content)
+    mosaicid = "b99dd7e8cc284c6da4d2899e5e0ea3e4f0e6fcf3e16eb0e2a4e0a0f1"
+
+    event["path"] = f"/{mosaicid}/preview.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(max_size="128", rescale="0,10000")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/png"
+    body = res["body"]
+    get_mosaic.assert_called_once()
+
+    # cached by mosaic and parameters
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["body"] == body
+    get_mosaic.assert_called_once()
+
+    event["path"] = f"/{mosaicid}/preview.tif"
+    event["queryStringParameters"] = dict(max_size="64", indexes="1")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/tiff"
+
+    event["path"] = f"/preview"
+    event["queryStringParameters"] = dict(
+        url="http://mypreviewmosaic.json",
+        max_size="64",
+        expression="b1/b2",
+        rescale="0,2",
+        color_map="cfastie",
+        pixel_selection="mean",
+    )
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/png"
+    get_mosaic.assert_called_with("http://mypreviewmosaic.json")
+
+    event["queryStringParameters"] = dict(max_size="64")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Missing 'URL' parameter"
+
+    event["queryStringParameters"] = dict(url="http://mypreviewmosaic.json")
+    for max_size in ["0", "100000"]:
+        event["queryStringParameters"]["max_size"] = max_size
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 400
+        assert res["body"].startswith("Invalid max_size")
+
+    with patch.object(handlers, "mosaic_preview", return_value=(None, None, None)):
+        event["queryStringParameters"] = dict(
+            url="http://myemptypreviewmosaic.json", max_size="64"
+        )
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 204
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets_bbox")
+def test_API_bbox(get_assets, get_mosaic, event):
+    """Test /bbox routes."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+
+    get_assets.return_value = [asset1, asset2]
+    get_mosaic.return_value = dict(mosaic_content)
+    mosaicid = "b99dd7e8cc284c6da4d2899e5e0ea3e4f0e6fcf3e16eb0e2a4e0a0f1"
+
+    event["path"] = f"/{mosaicid}/bbox/-75.9,45,-72,46.5.tif"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(resolution="1000")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "image/tiff"
+    assert get_assets.call_args[0][1] == [-75.9, 45, -72, 46.5]
+    with MemoryFile(base64.b64decode(res["body"])) as mem:
+        with mem.open() as src_dst:
+            assert src_dst.count == 3
+            assert src_dst.crs.to_epsg() == 3857
+            assert src_dst.res == (1000, 1000)
+            assert src_dst.dataset_mask().any()
+
+    event["path"] = f"/bbox/-75.9,45,-72,46.5.tif"
+    event["queryStringParameters"] = dict(
+        url="http://mybboxmosaic.json", indexes="1", pixel_selection="last"
+    )
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert get_assets.call_args[1] == dict(reverse=True, pixel_selection="last")
+    with MemoryFile(base64.b64decode(res["body"])) as mem:
+        with mem.open() as src_dst:
+            assert src_dst.count == 1
+            # mosaic maxzoom resolution
+            tile = mercantile.xy_bounds(0, 0, mosaic_content["maxzoom"])
+            assert src_dst.res[0] == pytest.approx((tile.right - tile.left) / 256)
+
+    with patch.object(handlers, "BBOX_MAX_PIXELS", 1000):
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 400
+        assert res["body"].startswith("Extract too large")
+
+    with patch.object(handlers, "BBOX_MAX_PIXELS", 0):
+        event["queryStringParameters"]["resolution"] = "250"
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 200
+
+    event["path"] = f"/bbox/-72,45,-75.9,46.5.tif"
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"].startswith("Invalid bbox")
+
+    event["path"] = f"/bbox/0,0,1,1.tif"
+    event["queryStringParameters"]["resolution"] = "1000"
+    get_assets.return_value = []
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 204
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets_bbox")
+def test_API_bbox_streaming_percentile(get_assets, get_mosaic, event, tmpdir):
+    """Should extract areas with the streaming percentile methods."""
+    from cogeo_mosaic_tiler.handlers.app import app
+
+    assets = []
+    for value in [10, 20, 30]:
+        path = str(tmpdir.join(f"cog_{value}.tif"))
+        _constant_cog(path, (0, 0, 6, 6), value)
+        assets.append(path)
+    get_assets.return_value = assets
+    get_mosaic.return_value = dict(mosaic_content)
+
+    event["path"] = f"/bbox/1,1,5,5.tif"
+    event["httpMethod"] = "GET"
+    for pixel_selection, expected in [
+        ("streaming_p10", 12),
+        ("streaming_median", 20),
+        ("streaming_p90", 28),
+    ]:
+        event["queryStringParameters"] = dict(
+            url="http://mypercentilemosaic.json",
+            resolution="10000",
+            pixel_selection=pixel_selection,
+        )
+        res = app(event, {})
+        assert res["statusCode"] == 200
+        with MemoryFile(base64.b64decode(res["body"])) as mem:
+            with mem.open() as src_dst:
+                data = src_dst.read(1, masked=True)
+        assert data.count()
+        assert (data.compressed() == expected).all()
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_mosaic_definition")
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_batch(get_assets, get_mosaic, event):
+    """Test /batch routes."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+
+    get_mosaic.return_value = dict(mosaic_content)
+
+    def _assets(url, x, y, z, **kwargs):
+        return [asset1, asset2] if (z, x, y) != (9, 0, 0) else []
+
+    get_assets.side_effect = _assets
+
+    event["path"] = f"/batch.png"
+    event["httpMethod"] = "GET"
+    event["queryStringParameters"] = dict(
+        url="http://mybatchmosaic.json",
+        tiles="9/150/182,9/151/182,9/0/0",
+        rescale="0,10000",
+    )
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    assert res["headers"]["Content-Type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(base64.b64decode(res["body"]))) as archive:
+        assert sorted(archive.namelist()) == [
+            "9/150/182.png",
+            "9/151/182.png",
+            "index.json",
+        ]
+        index = json.loads(archive.read("index.json"))
+        assert index == {"9/150/182": 200, "9/151/182": 200, "9/0/0": 204}
+        batch_tile = archive.read("9/150/182.png")
+
+    # Same tiles as individual requests
+    event["path"] = f"/9/150/182.png"
+    event["queryStringParameters"] = dict(
+        url="http://mybatchmosaic.json", rescale="0,10000"
+    )
+    res = handlers.app(event, {})
+    assert base64.b64decode(res["body"]) == batch_tile
+
+    mosaicid = "b99dd7e8cc284c6da4d2899e5e0ea3e4f0e6fcf3e16eb0e2a4e0a0f1"
+    event["path"] = f"/{mosaicid}/batch@2x.jpg"
+    event["httpMethod"] = "POST"
+    event["body"] = json.dumps(dict(tiles=[[9, 150, 182], "9/150/183"]))
+    event["queryStringParameters"] = dict(rescale="0,10000")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    with zipfile.ZipFile(io.BytesIO(base64.b64decode(res["body"]))) as archive:
+        assert sorted(archive.namelist()) == [
+            "9/150/182.jpg",
+            "9/150/183.jpg",
+            "index.json",
+        ]
+        with MemoryFile(archive.read("9/150/182.jpg")) as mem:
+            with mem.open() as src_dst:
+                assert src_dst.width == 512
+
+    event["path"] = f"/batch.png"
+    event["httpMethod"] = "GET"
+    event.pop("body")
+    event["queryStringParameters"] = dict(url="http://mybatchmosaic.json")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Missing 'tiles' parameter"
+
+    event["queryStringParameters"]["tiles"] = "9/150"
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 400
+    assert res["body"] == "Invalid 'tiles' parameter, use z/x/y"
+
+    event["queryStringParameters"]["tiles"] = "9/150/182,9/151/182"
+    with patch.object(handlers, "BATCH_MAX_TILES", 1):
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 400
+        assert res["body"].startswith("Too many tiles")
+
+    event["httpMethod"] = "POST"
+    event["queryStringParameters"] = dict(url="http://mybatchmosaic.json")
+    for body in ["9/150/182", json.dumps([[9, 150, 182]])]:
+        event["body"] = body
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 400
+        assert res["body"] == "Invalid body"
+
+
+@patch("cogeo_mosaic_tiler.handlers.app.fetch_and_find_assets")
+def test_API_tiles_header_cache(get_assets, event):
+    """Should read the tiles with the assets cached headers."""
+    from cogeo_mosaic_tiler.handlers import app as handlers
+    from cogeo_mosaic_tiler.headers import HeaderCache
+
+    get_assets.return_value = [asset1, asset2]
+
+    event["path"] = f"/9/150/182.png"
+    event["queryStringParameters"] = dict(url="http://mymosaic.json", rescale="0,10000")
+    res = handlers.app(event, {})
+    assert res["statusCode"] == 200
+    expected = base64.b64decode(res["body"])
+
+    header_cache = HeaderCache()
+    with patch.object(handlers, "header_cache", header_cache):
+        event["queryStringParameters"]["url"] = "http://myheadersmosaic.json"
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 200
+        assert base64.b64decode(res["body"]) == expected
+        assert header_cache.stats["items"] == 2
+
+        event["path"] = f"/9/0/0.png"
+        res = handlers.app(event, {})
+        assert res["statusCode"] == 204
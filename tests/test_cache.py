@@ -0,0 +1,159 @@
+"""tests cogeo_mosaic_tiler.cache."""
+
+import time
+import threading
+import multiprocessing
+from concurrent import futures
+
+import pytest
+
+from cogeo_mosaic_tiler import cache
+
+
+def test_lru_cache():
+    """Should store, evict and expire items."""
+    c = cache.LRUCache(maxsize=2)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)  # evict least recently used ("b")
+    assert "b" not in c
+    assert c.get("b") is None
+    assert c.get("c") == 3
+    assert c.stats["hits"] == 2
+    assert c.stats["misses"] == 1
+
+    c = cache.LRUCache(maxsize=0)
+    c.set("a", 1)
+    assert c.get("a") is None
+
+    c = cache.LRUCache(maxsize=2, ttl=0.01)
+    c.set("a", 1)
+    time.sleep(0.02)
+    assert c.get("a") is None
+
+    # per item ttl
+    c = cache.LRUCache(maxsize=2)
+    c.set("a", 1, ttl=0.01)
+    c.set("b", 2)
+    time.sleep(0.02)
+    assert c.get("a") is None
+    assert c.get("b") == 2
+
+
+def _child_set(path):
+    cache.SharedCache(path).set(("tile", 1, 2, 3), b"data")
+
+
+def test_shared_cache(tmpdir):
+    """Should share items between processes."""
+    path = str(tmpdir.join("tiles"))
+    c = cache.SharedCache(path)
+    assert c.get(("tile", 1, 2, 3)) is None
+
+    proc = multiprocessing.Process(target=_child_set, args=(path,))
+    proc.start()
+    proc.join()
+    assert c.get(("tile", 1, 2, 3)) == b"data"
+    assert len(c) == 1
+
+    c.delete(("tile", 1, 2, 3))
+    assert ("tile", 1, 2, 3) not in c
+
+    c.set("a", b"data", ttl=0.01)
+    time.sleep(0.02)
+    assert c.get("a") is None
+
+    c = cache.SharedCache(path, max_bytes=1000)
+    for ix in range(10):
+        c.set(ix, b"0" * 200)
+    c.evict()
+    assert len(c) < 10
+
+
+def test_get_cache(monkeypatch, tmpdir):
+    """Should return a shared cache when CACHE_DIR is set."""
+    monkeypatch.delenv("CACHE_DIR", raising=False)
+    assert isinstance(cache.get_cache("tiles"), cache.LRUCache)
+
+    monkeypatch.setenv("CACHE_DIR", str(tmpdir))
+    c = cache.get_cache("tiles")
+    assert isinstance(c, cache.SharedCache)
+    assert c.path == str(tmpdir.join("tiles"))
+
+
+def test_empty_tile_cache(tmpdir):
+    """Should record empty tiles per mosaic and zoom."""
+    empty = cache.EmptyTileCache(maxsize=2)
+    assert not empty.contains("mosaic", 9, 150, 182)
+    empty.add("mosaic", 9, 150, 182)
+    assert empty.contains("mosaic", 9, 150, 182)
+    assert not empty.contains("mosaic", 9, 151, 182)
+    assert not empty.contains("mosaic", 10, 150, 182)
+    assert not empty.contains("other", 9, 150, 182)
+
+    # Tiles in the same block share 512 bytes
+    empty.add("mosaic", 9, 151, 182)
+    assert empty.contains("mosaic", 9, 151, 182)
+    assert empty.stats["blocks"] == 1
+
+    empty.add("mosaic", 9, 0, 0, ttl=0.1)
+    assert empty.contains("mosaic", 9, 0, 0)
+    time.sleep(0.2)
+    assert not empty.contains("mosaic", 9, 0, 0)
+    assert empty.stats["hits"] == 3
+
+    # Persistent store
+    store = cache.SharedCache(str(tmpdir))
+    empty = cache.EmptyTileCache(store=store)
+    empty.add("mosaic", 9, 150, 182)
+    empty = cache.EmptyTileCache(store=store)
+    assert empty.contains("mosaic", 9, 150, 182)
+    assert not empty.contains("mosaic", 9, 151, 182)
+
+    # Invalidated by another process
+    cache.EmptyTileCache(store=store).invalidate("mosaic")
+    assert not empty.contains("mosaic", 9, 150, 182)
+    assert not cache.EmptyTileCache(store=store).contains("mosaic", 9, 150, 182)
+
+    empty = cache.EmptyTileCache()
+    empty.add("mosaic", 9, 150, 182)
+    empty.invalidate("mosaic")
+    assert not empty.contains("mosaic", 9, 150, 182)
+
+
+def test_single_flight():
+    """Should run concurrent calls with the same key once."""
+    flights = cache.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def _render(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value
+
+    with futures.ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(flights.do, "key", _render, "a")
+        started.wait(5)
+        followers = [executor.submit(flights.do, "key", _render, "b") for _ in range(3)]
+        while flights.coalesced < 3:
+            time.sleep(0.01)
+        other = executor.submit(flights.do, "other", lambda: "c")
+        assert other.result() == "c"
+        release.set()
+        assert leader.result() == "a"
+        assert [f.result() for f in followers] == ["a", "a", "a"]
+
+    assert calls == ["a"]
+    assert flights.stats == dict(calls=5, coalesced=3, in_flight=0)
+
+    # Exceptions are shared and the key is released
+    def _fail():
+        raise ValueError("nope")
+
+    with pytest.raises(ValueError):
+        flights.do("key", _fail)
+    assert flights.do("key", _render, "d") == "d"
@@ -0,0 +1,127 @@
+"""tests cogeo_mosaic_tiler.custom_methods."""
+
+import numpy
+import pytest
+
+from rio_tiler_mosaic.methods import defaults
+
+from cogeo_mosaic_tiler import custom_methods
+
+
+def _tiles(count, shape=(3, 32, 32), seed=0):
+    rng = numpy.random.RandomState(seed)
+    tiles = []
+    for _ in range(count):
+        data = rng.normal(1000, 200, size=shape).astype(numpy.uint16)
+        mask = rng.rand(*shape[1:]) < 0.2
+        tiles.append(
+            numpy.ma.array(data, mask=numpy.repeat(mask[None], shape[0], axis=0))
+        )
+    return tiles
+
+
+def _run(method, tiles):
+    for tile in tiles:
+        method.feed(tile.copy())
+    return method.data
+
+
+@pytest.mark.parametrize("count", [1, 2, 5, 20])
+def test_streaming_stdev(count):
+    """Should match the stacked stdev method."""
+    tiles = _tiles(count)
+    data, mask = _run(defaults.StdevMethod(), tiles)
+    sdata, smask = _run(custom_methods.StreamingStdevMethod(), tiles)
+    numpy.testing.assert_array_equal(mask, smask)
+    valid = mask > 0
+    numpy.testing.assert_allclose(data[:, valid], sdata[:, valid], atol=1e-6)
+
+
+@pytest.mark.parametrize("count", [1, 2, 5, 20])
+def test_streaming_mean(count):
+    """Should match the stacked mean method."""
+    tiles = _tiles(count)
+    data, mask = _run(defaults.MeanMethod(), tiles)
+    sdata, smask = _run(custom_methods.StreamingMeanMethod(), tiles)
+    numpy.testing.assert_array_equal(mask, smask)
+    valid = mask > 0
+    assert sdata.dtype == numpy.uint16
+    numpy.testing.assert_allclose(data[:, valid], sdata[:, valid], atol=1)
+
+
+@pytest.mark.parametrize("count", [1, 3, 4])
+def test_streaming_median_exact(count):
+    """Should match the stacked median method with less than 5 values."""
+    tiles = _tiles(count)
+    data, mask = _run(defaults.MedianMethod(), tiles)
+    sdata, smask = _run(custom_methods.StreamingMedianMethod(), tiles)
+    numpy.testing.assert_array_equal(mask, smask)
+    valid = mask > 0
+    numpy.testing.assert_array_equal(data[:, valid], sdata[:, valid])
+    assert sdata.dtype == numpy.uint16
+
+
+def test_streaming_percentile():
+    """Should approximate percentiles."""
+    rng = numpy.random.RandomState(1)
+    values = rng.exponential(100, size=(1000, 1, 8, 8))
+    for percentile in [10, 50, 90]:
+        method = custom_methods.StreamingPercentileMethod(
+            percentile, enforce_data_type=False
+        )
+        data, mask = _run(method, [numpy.ma.array(v, mask=False) for v in values])
+        assert mask.all()
+        exact = numpy.percentile(values, percentile, axis=0)
+        assert numpy.abs(data - exact).mean() / exact.mean() < 0.05
+
+    method = custom_methods.StreamingMedianMethod()
+    assert method.data == (None, None)
+
+
+def _bidx_stddev(tiles):
+    """Reference: first available bands stddev, with numpy.ma."""
+    result = None
+    for tile in tiles:
+        std = numpy.ma.std(tile, axis=0, keepdims=True)
+        if result is None:
+            result = std
+        pidex = result.mask & ~std.mask
+        mask = numpy.where(pidex, std.mask, result.mask)
+        result = numpy.ma.where(pidex, std, result)
+        result.mask = mask
+    return result.data, ~result.mask[0] * 255
+
+
+def test_bidx_stddev():
+    """Should fill the tile in place with the first bands stddev."""
+    tiles = _tiles(5)
+    data, mask = _bidx_stddev(tiles)
+
+    method = custom_methods.bidx_stddev()
+    assert method.data == (None, None)
+    assert not method.is_done
+    sdata, smask = _run(method, tiles)
+    numpy.testing.assert_array_equal(mask, smask)
+    valid = mask > 0
+    numpy.testing.assert_allclose(data[:, valid], sdata[:, valid])
+    assert sdata.shape == (1, 32, 32)
+    assert sdata.dtype == numpy.float64
+
+
+def test_bidx_stddev_inplace():
+    """Should reuse its buffers and stop once every pixel is filled."""
+    tiles = _tiles(3)
+    tiles[1].mask = False
+
+    method = custom_methods.bidx_stddev()
+    method.feed(tiles[0])
+    buffer = method.tile
+    assert not method.is_done
+    method.feed(tiles[1])
+    assert method.tile is buffer
+    assert method.is_done
+
+    # Filled pixels are not updated
+    before = method.tile.copy()
+    method.feed(tiles[2])
+    numpy.testing.assert_array_equal(before, method.tile)
@@ -0,0 +1,81 @@
+"""tests cogeo_mosaic_tiler.encoders."""
+
+import numpy
+import pytest
+
+from rasterio.io import MemoryFile
+from rio_tiler.utils import get_colormap
+
+from cogeo_mosaic_tiler import encoders
+
+pillow = pytest.importorskip("PIL")
+
+
+def _read(content):
+    with MemoryFile(content) as mem:
+        with mem.open() as src_dst:
+            return src_dst.read()
+
+
+@pytest.fixture
+def tile():
+    """Create a RGB tile with a mask."""
+    x, y = numpy.meshgrid(numpy.arange(256), numpy.arange(256))
+    arr = numpy.stack([x, y, (x + y) // 2]).astype(numpy.uint8)
+    mask = numpy.zeros((256, 256), dtype=numpy.uint8)
+    mask[:, 128:] = 255
+    return arr, mask
+
+
+def test_pillow_png(tile):
+    """Pillow and GDAL PNG should be identical once decoded."""
+    arr, mask = tile
+    gdal = encoders.encode(arr, mask, "png", encoder="gdal")
+    pil = encoders.encode(arr, mask, "png", encoder="pillow")
+    assert pil[:8] == b"\x89PNG\r\n\x1a\n"
+    numpy.testing.assert_array_equal(_read(gdal), _read(pil))
+
+    gdal = encoders.encode(arr[0], mask, "png", encoder="gdal")
+    pil = encoders.encode(arr[0:1], mask, "png", encoder="pillow")
+    numpy.testing.assert_array_equal(_read(gdal), _read(pil))
+
+    cmap = get_colormap("cfastie", format="gdal")
+    gdal = encoders.encode(arr[0:1], mask, "png", color_map=cmap, encoder="gdal")
+    pil = encoders.encode(arr[0:1], mask, "png", color_map=cmap, encoder="pillow")
+    numpy.testing.assert_array_equal(_read(gdal), _read(pil))
+
+
+@pytest.mark.parametrize("img_format", ["jpeg", "webp"])
+def test_pillow_lossy(tile, img_format):
+    """Pillow lossy encoding should have the same shape than GDAL's."""
+    arr, mask = tile
+    gdal = _read(encoders.encode(arr, mask, img_format, encoder="gdal"))
+    pil = _read(encoders.encode(arr, mask, img_format, encoder="pillow"))
+    assert gdal.shape == pil.shape
+    assert numpy.abs(gdal.astype("int16") - pil.astype("int16")).mean() < 5
+
+
+def test_encoder_fallback(tile):
+    """Unsupported arrays or formats should be encoded with GDAL."""
+    arr, mask = tile
+    arr = arr.astype(numpy.uint16)
+    pil = encoders.encode(arr, mask, "png", encoder="pillow")
+    assert _read(pil).dtype == numpy.uint16
+
+    content = encoders.encode(arr, mask, "GTiff", encoder="pillow")
+    assert content[:2] in [b"II", b"MM"]
+
+
+def test_profiles(tile):
+    """Compression profiles should trade size for speed."""
+    arr, mask = tile
+    speed = encoders.encode(arr, mask, "png", profile="speed")
+    size = encoders.encode(arr, mask, "png", profile="size")
+    assert len(size) < len(speed)
+
+    speed = encoders.encode(arr, mask, "jpeg", encoder="pillow", profile="speed")
+    balanced = encoders.encode(arr, mask, "jpeg", encoder="pillow")
+    assert len(speed) < len(balanced)
+
+    with pytest.raises(KeyError):
+        encoders.encode(arr, mask, "png", profile="best")
@@ -0,0 +1,52 @@
+"""tests cogeo_mosaic_tiler.expression."""
+
+import numpy
+import pytest
+
+from cogeo_mosaic_tiler import expression
+
+
+def test_expression():
+    """Should parse, compile and evaluate expressions."""
+    expr = expression.parse_expression("(b3 - b1) / (b3 + b1), sqrt(b1)")
+    assert expr.bands == [1, 3]
+    assert expr.count == 2
+    assert expression.parse_expression("(b3 - b1) / (b3 + b1), sqrt(b1)") is expr
+
+    data = numpy.array([[[1, 0]], [[3, 0]]], dtype=numpy.uint16)
+    result = expr(data)
+    assert result.shape == (2, 1, 2)
+    assert result.dtype == numpy.float64
+    # Division by zero returns 0
+    numpy.testing.assert_array_equal(result[0], [[0.5, 0]])
+    numpy.testing.assert_array_equal(result[1], [[1, 0]])
+
+    expr = expression.parse_expression("where(B2 > 2, 1, 0)")
+    assert expr.bands == [2]
+    numpy.testing.assert_array_equal(expr(numpy.array([[1, 3]])), [[0, 1]])
+
+    expr = expression.parse_expression("b1 * -2 + 1")
+    numpy.testing.assert_array_equal(expr(numpy.array([[1, 3]])), [[-1, -5]])
+
+
+@pytest.mark.parametrize(
+    "expr",
+    [
+        "b1 +",
+        "__import__('os')",
+        "b1.real",
+        "b0 + 1",
+        "c1 + 1",
+        "'a'",
+        "1 + 1",
+        "[b1]",
+        "b1 if b2 else b3",
+        "sqrt(x=b1)",
+        "b1 + 9**9**9**9",
+        "b1 * (-2 - 3)",
+    ],
+)
+def test_expression_invalid(expr):
+    """Should only accept band math."""
+    with pytest.raises(ValueError):
+        expression.Expression(expr)
@@ -0,0 +1,73 @@
+"""tests cogeo_mosaic_tiler.extract."""
+
+import os
+
+import pytest
+import rasterio
+
+from cogeo_mosaic.utils import create_mosaic
+from rio_tiler_mosaic.methods import defaults
+
+from cogeo_mosaic_tiler.extract import extract_bbox, get_bbox_grid
+from cogeo_mosaic_tiler.preview import mosaic_grid
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+def test_get_bbox_grid():
+    """Should align the grid on the top-left corner."""
+    bounds, width, height = get_bbox_grid([-1, -1, 1, 1], 1000)
+    assert width == height == 223
+    assert bounds[2] - bounds[0] == pytest.approx(223000)
+    assert bounds[3] - bounds[1] == pytest.approx(223000)
+    assert bounds[0] == pytest.approx(-111319.49)
+
+    _, width, height = get_bbox_grid([0, 0, 0.000001, 0.000001], 1000)
+    assert width == height == 1
+
+
+def test_extract_bbox(tmpdir):
+    """Should write the mosaic area window by window."""
+    bounds = create_mosaic([asset1, asset2])["bounds"]
+    path = str(tmpdir.join("extract.tif"))
+    profile = extract_bbox([asset1, asset2], bounds, 1000, path, window_size=64)
+    assert profile["dtype"] == "uint16"
+    assert profile["count"] == 3
+
+    grid_bounds, width, height = get_bbox_grid(bounds, 1000)
+    with rasterio.open(path) as src_dst:
+        assert (src_dst.width, src_dst.height) == (width, height)
+        assert src_dst.crs.to_epsg() == 3857
+        assert src_dst.block_shapes[0] == (64, 64)
+        data = src_dst.read()
+        mask = src_dst.dataset_mask()
+
+    # Same as the whole area read at once, but for nearest resampling picking
+    # neighbour pixels (datasets are warped on a grid aligned on each window)
+    expected, expected_mask = mosaic_grid([asset1, asset2], grid_bounds, width, height)
+    assert (mask != expected_mask).mean() < 0.001
+    assert (data != expected).any(axis=0).mean() < 0.05
+
+    path = str(tmpdir.join("extract_stdev.tif"))
+    profile = extract_bbox(
+        [asset1, asset2],
+        bounds,
+        2000,
+        path,
+        pixel_selection=defaults.StdevMethod,
+        indexes=[1],
+    )
+    assert profile["count"] == 1
+    assert profile["dtype"] != "uint16"
+
+    # Windows without assets are not written
+    path = str(tmpdir.join("extract_sparse.tif"))
+    bounds = [bounds[0] - 5, bounds[1], bounds[2], bounds[3]]
+    extract_bbox([asset1, asset2], bounds, 2000, path, window_size=32)
+    with rasterio.open(path) as src_dst:
+        assert not src_dst.dataset_mask(window=((0, 32), (0, 32))).any()
+
+    path = str(tmpdir.join("extract_empty.tif"))
+    assert extract_bbox([asset1], [0, 0, 1, 1], 1000, path) is None
+    assert not os.path.exists(path)
@@ -0,0 +1,264 @@
+"""tests cogeo_mosaic_tiler.headers."""
+
+import io
+import os
+import re
+import json
+import threading
+import http.server
+from concurrent import futures
+
+import numpy
+import pytest
+from mock import patch
+from click.testing import CliRunner
+
+import mercantile
+import rasterio
+from rasterio.enums import Resampling
+from rio_tiler import utils
+
+from cogeo_mosaic.utils import create_mosaic
+
+from cogeo_mosaic_tiler import headers
+from cogeo_mosaic_tiler.cache import SharedCache
+from cogeo_mosaic_tiler.headers import (
+    HeaderCache,
+    HeaderError,
+    parse_header,
+    read_header,
+)
+from cogeo_mosaic_tiler.scripts.cli import cogeo_mosaic_tiler_cli
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+mosaic_json = os.path.join(os.path.dirname(__file__), "fixtures", "mosaic.json")
+
+
+def _not_cog(path):
+    """Create a GeoTIFF with overviews appended after the data."""
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=512,
+        height=512,
+        count=1,
+        dtype="uint8",
+        tiled=True,
+    ) as dst:
+        dst.write(numpy.ones((1, 512, 512), dtype="uint8"))
+
+    with rasterio.open(path, "r+") as dst:
+        dst.build_overviews([2, 4], Resampling.nearest)
+
+
+def test_read_header():
+    """Should read the COG header."""
+    with open(asset1, "rb") as f:
+        content = f.read()
+
+    metadata_end, data_start = parse_header(lambda start, end: content[start:end])
+    assert metadata_end <= data_start < len(content)
+
+    header, size = read_header(asset1)
+    assert size == len(content)
+    assert header == content[:data_start]
+
+    with pytest.raises(HeaderError):
+        read_header(asset1, max_size=256)
+
+    with pytest.raises(HeaderError):
+        read_header(mosaic_json)
+
+
+def test_read_header_not_cog(tmpdir):
+    """Should not cache non-COG headers."""
+    path = str(tmpdir.join("not_cog.tif"))
+    _not_cog(path)
+    with pytest.raises(HeaderError):
+        read_header(path)
+
+    cache = HeaderCache()
+    assert not cache.get(path)
+    assert not cache.get(path)
+    assert cache.reads == 1
+    with cache.open(path) as src_dst:
+        assert src_dst.overviews(1) == [2, 4]
+
+
+@patch("cogeo_mosaic_tiler.headers._get_range", wraps=headers._get_range)
+def test_header_cache(get_range, tmpdir):
+    """Should open datasets without reading their header."""
+    store = SharedCache(str(tmpdir.join("headers")))
+    cache = HeaderCache(store=store)
+    header, _ = cache.get(asset1)
+    assert cache.reads == 1
+    assert get_range.called
+
+    # New worker
+    get_range.reset_mock()
+    cache = HeaderCache(store=store)
+    tile_bounds = mercantile.xy_bounds(150, 182, 9)
+    with cache.open(asset1) as src_dst:
+        assert not get_range.called
+        data, mask = utils.tile_read(src_dst, tile_bounds, 256)
+
+    assert cache.reads == 0
+    assert get_range.called
+    assert all(call[0][1] >= len(header) for call in get_range.call_args_list)
+
+    with rasterio.open(asset1) as src_dst:
+        profile = src_dst.profile
+        expected_data, expected_mask = utils.tile_read(src_dst, tile_bounds, 256)
+
+    with cache.open(asset1) as src_dst:
+        assert src_dst.profile == profile
+        assert src_dst.read(1, out_shape=(64, 64)).any()
+    numpy.testing.assert_array_equal(data, expected_data)
+    numpy.testing.assert_array_equal(mask, expected_mask)
+
+    stats = cache.stats
+    assert stats["items"] == 1
+    assert stats["store"]["type"] == "shared"
+
+
+@patch("cogeo_mosaic_tiler.headers.read_header")
+def test_header_cache_error(read_header, tmpdir):
+    """Should open datasets with GDAL when their header cannot be read."""
+    read_header.side_effect = OSError("Connection reset")
+    cache = HeaderCache()
+    assert cache.get(asset1) is None
+    with cache.open(asset1) as src_dst:
+        assert src_dst.count == 3
+    assert cache.reads == 2
+
+
+def test_cli_headers(tmpdir):
+    """Should cache the mosaic assets headers."""
+    mosaic_path = str(tmpdir.join("mosaic.json"))
+    with open(mosaic_path, "w") as f:
+        json.dump(create_mosaic([asset1, asset2]), f)
+
+    cache_dir = str(tmpdir.join("headers"))
+    runner = CliRunner()
+    result = runner.invoke(
+        cogeo_mosaic_tiler_cli, ["headers", mosaic_path, "--cache-dir", cache_dir]
+    )
+    assert not result.exception
+    assert result.exit_code == 0
+
+    cache = HeaderCache(store=SharedCache(cache_dir))
+    assert cache.get(asset1)
+    assert cache.get(asset2)
+    assert cache.reads == 0
+
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the fixture, with range requests support if `ranges` is set."""
+
+    ranges = True
+    requests = []
+
+    def do_GET(self):  # noqa: N802
+        with open(asset1, "rb") as f:
+            content = f.read()
+        self.requests.append(dict(self.headers))
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if self.ranges and match:
+            start, end = int(match.group(1)), int(match.group(2)) + 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(content)}")
+            content = content[start:end]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """Local http server."""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _RangeHandler.ranges = True
+    _RangeHandler.requests = []
+    yield f"http://127.0.0.1:{server.server_address[1]}/cog1.tif"
+    server.shutdown()
+
+
+def test_http_range(http_server, monkeypatch):
+    """Should read http ranges with the GDAL options."""
+    with open(asset1, "rb") as f:
+        content = f.read()
+
+    monkeypatch.setenv("GDAL_HTTP_HEADERS", "X-Api-Key: abc, X-Other: d")
+    monkeypatch.setenv("GDAL_HTTP_USERAGENT", "my-agent")
+    data, size = headers._get_range(http_server, 10, 20)
+    assert data == content[10:20]
+    assert size == len(content)
+    request = _RangeHandler.requests[-1]
+    assert request["X-Api-Key"] == "abc"
+    assert request["X-Other"] == "d"
+    assert request["User-Agent"] == "my-agent"
+
+    cache = HeaderCache()
+    tile_bounds = mercantile.xy_bounds(150, 182, 9)
+    with cache.open(http_server) as src_dst:
+        data, _ = utils.tile_read(src_dst, tile_bounds, 256)
+    with rasterio.open(asset1) as src_dst:
+        expected, _ = utils.tile_read(src_dst, tile_bounds, 256)
+    numpy.testing.assert_array_equal(data, expected)
+
+    # Servers ignoring the range send the file from its start
+    _RangeHandler.ranges = False
+    with pytest.raises(OSError):
+        headers._get_range(http_server, 10, 20)
+
+
+@patch("cogeo_mosaic_tiler.headers._get_s3_client")
+def test_s3_range(get_client, monkeypatch):
+    """Should read S3 ranges with the GDAL options."""
+    session = object()
+    client = get_client.return_value
+    client.get_object.return_value = {
+        "ContentRange": "bytes 10-19/1000",
+        "Body": io.BytesIO(b"0123456789"),
+    }
+    data, size = headers._get_range("s3://bucket/cog.tif", 10, 20, session=session)
+    assert (data, size) == (b"0123456789", 1000)
+    get_client.assert_called_with(session, None)
+    client.get_object.assert_called_with(
+        Bucket="bucket", Key="cog.tif", Range="bytes=10-19"
+    )
+
+    monkeypatch.setenv("AWS_S3_ENDPOINT", "minio:9000")
+    monkeypatch.setenv("AWS_HTTPS", "NO")
+    monkeypatch.setenv("AWS_REQUEST_PAYER", "requester")
+    client.get_object.return_value["Body"] = io.BytesIO(b"0123456789")
+    headers._get_range("s3://bucket/cog.tif", 10, 20, session=session)
+    get_client.assert_called_with(session, "http://minio:9000")
+    assert client.get_object.call_args[1]["RequestPayer"] == "requester"
+
+
+@patch(
+    "cogeo_mosaic_tiler.headers.futures.ThreadPoolExecutor",
+    wraps=futures.ThreadPoolExecutor,
+)
+def test_byte_ranges(executor):
+    """Should read multiple ranges with a bounded number of threads."""
+    with open(asset1, "rb") as f:
+        content = f.read()
+
+    header, size = read_header(asset1)
+    f = headers._HeaderFile(asset1, header, size)
+    offsets = list(range(0, 64 * 1000, 1000))
+    assert f.get_byte_ranges(offsets, [100] * 64) == [
+        content[offset : offset + 100] for offset in offsets
+    ]
+    assert executor.call_args[1]["max_workers"] == headers.MAX_RANGE_THREADS
@@ -0,0 +1,85 @@
+"""tests cogeo_mosaic_tiler.memory."""
+
+import pytest
+
+from cogeo_mosaic_tiler.memory import (
+    TileMemoryError,
+    estimate_tile_memory,
+    plan_tile_read,
+)
+
+MB = 1000000
+
+
+def test_estimate_tile_memory():
+    """Should only grow with the number of assets for stacking methods."""
+    for method in ["first", "streaming_median", "streaming_stdev", "streaming_mean"]:
+        assert estimate_tile_memory(
+            method, 10, 3, "uint16", 256, 5
+        ) == estimate_tile_memory(method, 100, 3, "uint16", 256, 5)
+
+    for method in ["mean", "median", "stdev"]:
+        assert estimate_tile_memory(
+            method, 100, 3, "uint16", 256, 5
+        ) > 5 * estimate_tile_memory(method, 10, 3, "uint16", 256, 5)
+
+    assert estimate_tile_memory(
+        "streaming_p90", 10, 3, "uint16", 256, 5
+    ) == estimate_tile_memory("streaming_median", 10, 3, "uint16", 256, 5)
+
+    # @4x tiles use 16 times more memory
+    assert estimate_tile_memory(
+        "median", 10, 3, "uint16", 1024, 5
+    ) == 16 * estimate_tile_memory("median", 10, 3, "uint16", 256, 5)
+    # 4 times more bands of a 8 times larger data type
+    assert estimate_tile_memory(
+        "first", 10, 12, "float64", 256, 5
+    ) > 6 * estimate_tile_memory("first", 10, 3, "uint8", 256, 5)
+
+
+def test_plan_tile_read():
+    """Should degrade tile reads to fit in budget."""
+    # fits
+    assert plan_tile_read("median", 20, 3, "uint16", 256, 4, 100 * MB) == (
+        "median",
+        20,
+        4,
+    )
+
+    # streaming
+    assert plan_tile_read("median", 20, 3, "uint16", 256, 4, 60 * MB) == (
+        "streaming_median",
+        20,
+        4,
+    )
+
+    # streaming is larger for few assets, read them one by one
+    method, assets, chunk_size = plan_tile_read(
+        "median", 2, 3, "uint16", 1024, 4, 235 * MB
+    )
+    assert (method, assets, chunk_size) == ("median", 2, 1)
+
+    # cap assets
+    method, assets, chunk_size = plan_tile_read(
+        "median", 20, 3, "uint16", 256, 4, 30 * MB, streaming=False
+    )
+    assert method == "median"
+    assert 1 < assets < 20
+    assert chunk_size == 1
+    assert estimate_tile_memory(method, assets, 3, "uint16", 256, 1) <= 30 * MB
+    assert estimate_tile_memory(method, assets + 1, 3, "uint16", 256, 1) > 30 * MB
+
+    # streaming does not fit, capped stacking does
+    method, assets, _ = plan_tile_read("median", 20, 3, "uint16", 256, 4, 30 * MB)
+    assert method == "median"
+    assert assets < 20
+
+    # first only reads fewer assets concurrently
+    assert plan_tile_read("first", 20, 3, "uint16", 1024, 10, 120 * MB) == (
+        "first",
+        20,
+        5,
+    )
+
+    with pytest.raises(TileMemoryError):
+        plan_tile_read("first", 20, 12, "float64", 1024, 10, 50 * MB)
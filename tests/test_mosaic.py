@@ -0,0 +1,172 @@
+"""tests cogeo_mosaic_tiler.mosaic."""
+
+import os
+
+import mercantile
+from mock import patch
+
+from cogeo_mosaic.utils import create_mosaic as cogeo_create_mosaic, get_assets
+
+from cogeo_mosaic_tiler import mosaic
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+def test_create_mosaic():
+    """Should create mosaic definition with assets bounds."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2])
+    assets = mosaic_def.pop("assets")
+    assert mosaic_def == cogeo_create_mosaic([asset1, asset2])
+    assert list(assets.keys()) == [asset1, asset2]
+    bounds = assets[asset1]["bounds"]
+    assert bounds[0] < bounds[2]
+    assert bounds[1] < bounds[3]
+    assert not assets[asset1].get("footprint")
+
+    mosaic_def = mosaic.create_mosaic([asset1, asset2], valid_footprint=True)
+    footprint = mosaic_def["assets"][asset1]["footprint"]
+    assert footprint["type"] == "MultiPolygon"
+
+
+def test_filter_assets():
+    """Should remove assets not intersecting with the tile."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2])
+    tile = mercantile.Tile(x=148, y=182, z=9)
+    assets = get_assets(mosaic_def, *tile)
+    assert assets == [asset1, asset2]
+    assert mosaic.filter_assets(mosaic_def, assets, mercantile.bounds(tile)) == [asset1]
+
+    # No assets metadata
+    mosaic_def.pop("assets")
+    assert mosaic.filter_assets(mosaic_def, assets, mercantile.bounds(tile)) == assets
+
+
+def test_filter_assets_footprint():
+    """Should use valid data footprint."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2], valid_footprint=True)
+    saved = 0
+    for tile in mercantile.tiles(*mosaic_def["bounds"], zooms=9):
+        assets = get_assets(mosaic_def, *tile)
+        saved += len(assets) - len(
+            mosaic.filter_assets(mosaic_def, assets, mercantile.bounds(tile))
+        )
+    assert saved == 42
+
+
+@patch("cogeo_mosaic_tiler.mosaic.fetch_mosaic_definition")
+def test_fetch_and_find_assets(get_data):
+    """Should filter assets by tile and point."""
+    get_data.return_value = mosaic.create_mosaic([asset1, asset2])
+    assert mosaic.fetch_and_find_assets("mosaic.json", 148, 182, 9) == [asset1]
+    assert mosaic.fetch_and_find_assets_point("mosaic.json", -73, 45) == [
+        asset1,
+        asset2,
+    ]
+    assert mosaic.fetch_and_find_assets_point("mosaic.json", -75.5, 45) == [asset1]
+
+    bbox = (-75.9, 45, -72, 46)
+    assert mosaic.fetch_and_find_assets_bbox("mosaic.json", bbox) == [asset1, asset2]
+    assert mosaic.fetch_and_find_assets_bbox("mosaic.json", bbox, reverse=True) == [
+        asset2,
+        asset1,
+    ]
+    bbox = (-75.9, 45, -75.5, 45.5)
+    assert mosaic.fetch_and_find_assets_bbox("mosaic.json", bbox) == [asset1]
+    assert mosaic.fetch_and_find_assets_bbox("mosaic.json", (0, 0, 1, 1)) == []
+
+
+def test_sort_assets_by_coverage():
+    """Should put assets covering most of the bounds first, keeping priorities."""
+    mosaic_def = {
+        "assets": {
+            "sliver": {"bounds": [-1, -1, 0.1, 2]},
+            "full": {"bounds": [-1, -1, 2, 2]},
+            "half": {"bounds": [0.5, -1, 2, 2]},
+            "full2": {"bounds": [-2, -2, 3, 3]},
+        }
+    }
+    # `half` does not intersect `sliver`, `full` and `full2` intersect both
+    assets = ["sliver", "half", "full", "full2"]
+    assert mosaic.sort_assets_by_coverage(mosaic_def, assets, (0, 0, 1, 1)) == [
+        "half",
+        "sliver",
+        "full",
+        "full2",
+    ]
+    assets = ["sliver", "full", "half", "full2"]
+    assert mosaic.sort_assets_by_coverage(mosaic_def, assets, (0, 0, 1, 1)) == assets
+
+    # Assets without metadata are not moved
+    assets = ["sliver", "unknown", "half"]
+    assert mosaic.sort_assets_by_coverage(mosaic_def, assets, (0, 0, 1, 1)) == assets
+    assets = ["unknown", "sliver", "half"]
+    assert mosaic.sort_assets_by_coverage(mosaic_def, assets, (0, 0, 1, 1)) == [
+        "unknown",
+        "half",
+        "sliver",
+    ]
+    assert mosaic.sort_assets_by_coverage({}, assets, (0, 0, 1, 1)) == assets
+
+
+@patch("cogeo_mosaic_tiler.mosaic.fetch_mosaic_definition")
+def test_fetch_and_find_assets_order(get_data):
+    """Should reverse and sort assets by tile coverage."""
+    get_data.return_value = mosaic.create_mosaic([asset1, asset2], valid_footprint=True)
+    tile = mercantile.Tile(x=152, y=182, z=9)
+    assert mosaic.fetch_and_find_assets("mosaic.json", *tile) == [asset1, asset2]
+    assert mosaic.fetch_and_find_assets("mosaic.json", *tile, reverse=True) == [
+        asset2,
+        asset1,
+    ]
+    # asset2 covers most of the tile but intersects asset1
+    assert mosaic.fetch_and_find_assets(
+        "mosaic.json", *tile, sort_by_coverage=True
+    ) == [asset1, asset2]
+
+    # Both assets cover the whole tile, the priority order is kept
+    tile = mercantile.Tile(x=151, y=181, z=9)
+    assert mosaic.fetch_and_find_assets(
+        "mosaic.json", *tile, sort_by_coverage=True
+    ) == [asset1, asset2]
+    assert mosaic.fetch_and_find_assets(
+        "mosaic.json", *tile, reverse=True, sort_by_coverage=True
+    ) == [asset2, asset1]
+
+
+def test_create_mosaic_processes():
+    """Should create the same mosaic with a pool of processes."""
+    timings = {}
+    mosaic_def = mosaic.create_mosaic(
+        [asset1, asset2], minzoom=8, tile_cover_sort=True, timings=timings
+    )
+    assert set(timings) == {"footprints", "quadkeys", "assets"}
+    assert len(mosaic_def["tiles"]) > 1
+    assert mosaic_def == mosaic.create_mosaic(
+        [asset1, asset2], minzoom=8, tile_cover_sort=True, max_processes=2
+    )
+    assert (
+        mosaic_def["tiles"]
+        == cogeo_create_mosaic([asset1, asset2], minzoom=8, tile_cover_sort=True)[
+            "tiles"
+        ]
+    )
+
+
+@patch("cogeo_mosaic_tiler.mosaic.get_mosaic_content")
+def test_refresh_mosaic(get_content):
+    """Should invalidate cached definitions of updated mosaics."""
+    url = "http://myrefreshedmosaic.json"
+    get_content.return_value = dict(tiles={"0": ["a.tif"]})
+    assert mosaic.fetch_mosaic_definition(url) == dict(tiles={"0": ["a.tif"]})
+    revision = mosaic.get_revision(url)
+
+    assert not mosaic.refresh_mosaic(url)
+    assert mosaic.get_revision(url) == revision
+
+    get_content.return_value = dict(tiles={"0": ["b.tif"]})
+    assert mosaic.refresh_mosaic(url)
+    assert mosaic.get_revision(url) != revision
+    assert mosaic.fetch_mosaic_definition(url) == dict(tiles={"0": ["b.tif"]})
+
+    assert not mosaic.refresh_mosaic("sqlite:///mosaics.db:mosaic")
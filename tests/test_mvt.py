@@ -0,0 +1,61 @@
+"""tests cogeo_mosaic_tiler.mvt."""
+
+import numpy
+import pytest
+
+from vtzero.tile import VectorTile
+
+from cogeo_mosaic_tiler import mvt
+
+
+def _features(content):
+    tile = VectorTile(content)
+    layer = next(tile)
+    return layer, len(layer)
+
+
+def test_polygons_encoder():
+    """Should create one polygon per region of equal values."""
+    data = numpy.zeros((2, 256, 256), dtype=numpy.uint8)
+    data[:, :, 128:] = 1
+    data[1, 100:120, 10:20] = 2
+    mask = numpy.zeros((256, 256), dtype=numpy.uint8)
+    mask[:, :200] = 255
+
+    layer, count = _features(mvt.polygons_encoder(data, mask, layer_name="test"))
+    assert layer.name == b"test"
+    assert layer.extent == 4096
+    assert count == 3
+    feature = next(layer)
+    assert feature.geometry_type == VectorTile.POLYGON
+
+    # Empty mask
+    _, count = _features(mvt.polygons_encoder(data, numpy.zeros((256, 256))))
+    assert count == 0
+
+
+def test_grid_encoder():
+    """Should create one polygon per grid cell with valid data."""
+    data = numpy.random.randint(0, 1000, size=(3, 256, 256)).astype(numpy.uint16)
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    _, count = _features(mvt.grid_encoder(data, mask))
+    assert count == 32 * 32
+
+    mask[:, 128:] = 0
+    _, count = _features(mvt.grid_encoder(data, mask, cell_size=16))
+    assert count == 16 * 8
+
+    with pytest.raises(Exception):
+        mvt.grid_encoder(data, mask, cell_size=100)
+
+
+def test_encoders_size():
+    """Polygonized and aggregated tiles should be smaller than pixel points."""
+    from rio_tiler_mvt.mvt import encoder
+
+    data = numpy.zeros((1, 256, 256), dtype=numpy.uint8)
+    data[:, 50:150, 50:150] = 1
+    mask = numpy.full((256, 256), 255, dtype=numpy.uint8)
+    points = encoder(data, mask, [], "test", feature_type="point")
+    assert len(mvt.polygons_encoder(data, mask)) * 10 < len(points)
+    assert len(mvt.grid_encoder(data, mask)) * 10 < len(points)
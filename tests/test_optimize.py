@@ -0,0 +1,125 @@
+"""tests cogeo_mosaic_tiler.optimize."""
+
+import os
+import json
+
+import pygeos
+import pytest
+import mercantile
+from click.testing import CliRunner
+
+from cogeo_mosaic_tiler.mosaic import create_mosaic
+from cogeo_mosaic_tiler.optimize import get_asset_footprints, optimize_mosaic
+from cogeo_mosaic_tiler.scripts.cli import cogeo_mosaic_tiler_cli
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset1_small = os.path.join(os.path.dirname(__file__), "fixtures", "cog1_small.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+@pytest.fixture(scope="module")
+def mosaic_def():
+    """Zoom 9 mosaic with a lower resolution copy of the first dataset."""
+    with pytest.warns(UserWarning):
+        return create_mosaic([asset1, asset1_small, asset2], minzoom=9)
+
+
+def test_get_asset_footprints():
+    """Inner footprint should be within the outer footprint."""
+    outer, inner = get_asset_footprints(asset1)
+    assert pygeos.area(inner) > 0
+    assert pygeos.area(inner) < pygeos.area(outer)
+    assert pygeos.covers(outer, inner)
+
+
+def test_optimize_mosaic(mosaic_def):
+    """Should remove hidden assets and report them."""
+    tiles = {k: list(v) for k, v in mosaic_def["tiles"].items()}
+    optimized, report = optimize_mosaic(mosaic_def)
+    assert mosaic_def["tiles"] == tiles
+    assert optimized["optimized"] == "first"
+    assert "optimized" not in mosaic_def
+
+    assert report["assets"]["before"] == sum(len(v) for v in tiles.values())
+    assert report["assets"]["after"] == sum(len(v) for v in optimized["tiles"].values())
+    assert report["assets"]["after"] < report["assets"]["before"]
+    assert report["removed"]["occluded"] > 0
+    assert report["removed"]["outside"] > 0
+    assert report["removed"]["capped"] == 0
+    assert (
+        sum(report["removed"].values())
+        == report["assets"]["before"] - report["assets"]["after"]
+    )
+    assert report["quadkeys"]["before"] == len(tiles)
+    assert report["quadkeys"]["after"] == len(optimized["tiles"])
+
+    for quadkey, assets in optimized["tiles"].items():
+        # order is kept
+        assert assets == [a for a in tiles[quadkey] if a in assets]
+        removed = report["tiles"].get(quadkey, [])
+        assert sorted(assets + removed) == sorted(tiles[quadkey])
+
+    # The lower resolution copy is only kept where the first dataset edges are
+    quadkey = next(
+        qk
+        for qk, assets in tiles.items()
+        if assets[:2] == [asset1, asset1_small]
+        and pygeos.covers(
+            get_asset_footprints(asset1)[1],
+            pygeos.box(*mercantile.bounds(mercantile.quadkey_to_tile(qk))),
+        )
+    )
+    assert optimized["tiles"][quadkey] == [asset1]
+    assert asset1_small in report["tiles"][quadkey]
+
+
+def test_optimize_mosaic_max_assets(mosaic_def):
+    """Should cap the number of assets per quadkey."""
+    optimized, report = optimize_mosaic(mosaic_def, max_assets=1)
+    assert all(len(assets) == 1 for assets in optimized["tiles"].values())
+    assert report["removed"]["capped"] > 0
+    assert report["assets"]["after"] == len(optimized["tiles"])
+
+
+def test_optimize_mosaic_unused_assets():
+    """Should drop metadata of assets no longer used."""
+    mosaic_def = {
+        "tiles": {"030230": [asset1, "missing.tif"], "030231": [asset1]},
+        "assets": {asset1: {"bounds": [-76, 45, -73, 47]}, "other.tif": {}},
+    }
+    optimized, report = optimize_mosaic(mosaic_def)
+    # unreadable assets are kept
+    assert optimized["tiles"]["030230"] == [asset1, "missing.tif"]
+    assert optimized["assets"] == {asset1: {"bounds": [-76, 45, -73, 47]}}
+    assert report["unused"] == []
+
+
+def test_optimize_cli(mosaic_def, tmpdir):
+    """Should write the optimized mosaic and report."""
+    mosaic_path = str(tmpdir.join("mosaic.json"))
+    with open(mosaic_path, "w") as f:
+        json.dump(mosaic_def, f)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cogeo_mosaic_tiler_cli,
+        [
+            "optimize",
+            mosaic_path,
+            "--max-assets",
+            "2",
+            "--report",
+            str(tmpdir.join("report.json")),
+            "-o",
+            str(tmpdir.join("optimized.json")),
+        ],
+    )
+    assert not result.exception
+    assert result.exit_code == 0
+
+    with open(str(tmpdir.join("optimized.json"))) as f:
+        optimized = json.load(f)
+    with open(str(tmpdir.join("report.json"))) as f:
+        report = json.load(f)
+    assert max(len(assets) for assets in optimized["tiles"].values()) == 2
+    assert report["assets"]["after"] < report["assets"]["before"]
@@ -0,0 +1,66 @@
+"""tests cogeo_mosaic_tiler.overviews."""
+
+import os
+
+import mercantile
+import rasterio
+from mock import patch
+from rio_cogeo.cogeo import cog_validate
+
+from cogeo_mosaic.utils import create_mosaic
+
+from cogeo_mosaic_tiler import overviews
+from cogeo_mosaic_tiler.mosaic import fetch_and_find_assets, get_minzoom
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+mosaic_content = create_mosaic([asset1, asset2])
+
+
+def test_create_overviews(tmpdir):
+    """Should create COG overviews for zooms below minzoom."""
+    prefix = str(tmpdir.join("overviews"))
+    ovr = overviews.create_overviews(mosaic_content, prefix, levels=2)
+    assert ovr["minzoom"] == 5
+    assert ovr["maxzoom"] == 6
+    assert ovr["quadkey_zoom"] == 5
+    assert ovr["pixel_selection"] == "first"
+    assert list(ovr["tiles"].keys()) == ["03023"]
+
+    path = ovr["tiles"]["03023"][0]
+    assert path == f"{prefix}/03023.tif"
+    assert cog_validate(path)[0]
+    with rasterio.open(path) as src_dst:
+        assert src_dst.width == 512
+        assert src_dst.count == 3
+        assert src_dst.dtypes[0] == "uint16"
+        assert src_dst.crs.to_epsg() == 3857
+        assert src_dst.dataset_mask().any()
+
+    mosaic_def = dict(mosaic_content, overviews=ovr)
+    assert get_minzoom(mosaic_def) == 5
+    with patch("cogeo_mosaic_tiler.mosaic.fetch_mosaic_definition") as get_data:
+        get_data.return_value = mosaic_def
+        tile = mercantile.tile(-73, 46, 6)
+        assert fetch_and_find_assets("mosaic.json", *tile) == [path]
+        assert fetch_and_find_assets("mosaic.json", *tile, pixel_selection="first") == [
+            path
+        ]
+        # Overviews are built with `first`, other methods read the assets
+        for pixel_selection in ["mean", "last"]:
+            assets = fetch_and_find_assets(
+                "mosaic.json", *tile, pixel_selection=pixel_selection
+            )
+            assert path not in assets
+            assert assets
+        # Mosaic zooms are not using overviews
+        tile = mercantile.tile(-73, 46, 8)
+        assert path not in fetch_and_find_assets("mosaic.json", *tile)
+
+
+def test_create_overviews_empty():
+    """Should skip overviews without data."""
+    content = overviews.create_overview(
+        mosaic_content, mercantile.Tile(0, 0, 5), maxzoom=6
+    )
+    assert content is None
@@ -0,0 +1,74 @@
+"""tests cogeo_mosaic_tiler.preview."""
+
+import os
+
+import numpy
+import pytest
+import mercantile
+
+from cogeo_mosaic.utils import create_mosaic
+from rio_tiler.errors import TileOutsideBounds
+from rio_tiler_mosaic.methods import defaults
+
+from cogeo_mosaic_tiler.preview import get_preview_grid, mosaic_preview, read_grid
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+def test_get_preview_grid():
+    """Should keep the mosaic aspect ratio."""
+    bounds, width, height = get_preview_grid([-10, 0, 10, 10], max_size=512)
+    assert width == 512
+    assert height == round(512 * (bounds[3] - bounds[1]) / (bounds[2] - bounds[0]))
+    assert bounds[:2] == mercantile.xy(-10, 0)
+
+    bounds, width, height = get_preview_grid([-180, -90, 180, 90], max_size=256)
+    assert (width, height) == (256, 256)
+
+
+def test_read_grid():
+    """Should read the part of the preview covered by the dataset."""
+    mosaic_def = create_mosaic([asset1, asset2])
+    bounds, width, height = get_preview_grid(mosaic_def["bounds"], max_size=128)
+    data, mask = read_grid(asset1, bounds, width, height)
+    assert data.shape == (3, height, width)
+    assert mask.shape == (height, width)
+    assert 0 < (mask > 0).mean() < 1
+    assert not data[:, mask == 0].any()
+
+    data, _ = read_grid(asset1, bounds, width, height, indexes=[1])
+    assert data.shape == (1, height, width)
+
+    bounds, width, height = get_preview_grid([0, 0, 10, 10], max_size=128)
+    with pytest.raises(TileOutsideBounds):
+        read_grid(asset1, bounds, width, height)
+
+
+def test_mosaic_preview():
+    """Should combine the assets with the pixel selection method."""
+    mosaic_def = create_mosaic([asset1, asset2])
+    data, mask, bounds = mosaic_preview(
+        [asset1, asset2], mosaic_def["bounds"], max_size=256
+    )
+    assert data.shape[0] == 3
+    assert max(data.shape[1:]) == 256
+    assert mask.shape == data.shape[1:]
+
+    _, mask1 = read_grid(asset1, bounds, mask.shape[1], mask.shape[0])
+    _, mask2 = read_grid(asset2, bounds, mask.shape[1], mask.shape[0])
+    numpy.testing.assert_array_equal(mask > 0, (mask1 > 0) | (mask2 > 0))
+
+    data, _, _ = mosaic_preview(
+        [asset1, asset2],
+        mosaic_def["bounds"],
+        max_size=256,
+        pixel_selection=defaults.HighestMethod(),
+        indexes=[1],
+        chunk_size=1,
+    )
+    assert data.shape[0] == 1
+
+    data, mask, _ = mosaic_preview(["missing.tif"], mosaic_def["bounds"])
+    assert data is None
+    assert mask is None
@@ -0,0 +1,128 @@
+"""tests cogeo_mosaic_tiler.profiling."""
+
+import os
+import time
+import pstats
+
+import pytest
+from mock import patch
+
+from cogeo_mosaic_tiler import profiling
+from cogeo_mosaic_tiler.proxy import API
+
+app = API(name="test-profiling")
+
+
+@app.route("/slow", methods=["GET"])
+def _slow(value: str = None):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < 0.05:
+        pass
+    return ("OK", "text/plain", f"value={value}")
+
+
+def _event(params=None):
+    return {
+        "path": "/slow",
+        "httpMethod": "GET",
+        "headers": {},
+        "queryStringParameters": params or {},
+    }
+
+
+def test_sign():
+    """Should verify signed flags."""
+    expires = int(time.time()) + 60
+    token = profiling.sign("/slow", expires, "secret")
+    assert profiling.verify("/slow", token, "secret")
+    assert not profiling.verify("/other", token, "secret")
+    assert not profiling.verify("/slow", token, "other")
+    assert not profiling.verify("/slow", f"{expires}.deadbeef", "secret")
+    assert not profiling.verify("/slow", "invalid", "secret")
+
+    token = profiling.sign("/slow", int(time.time()) - 1, "secret")
+    assert not profiling.verify("/slow", token, "secret")
+
+
+def test_from_env(monkeypatch):
+    """Should only enable profiling with a secret or a sample rate."""
+    monkeypatch.delenv("PROFILE_SECRET", raising=False)
+    monkeypatch.delenv("PROFILE_SAMPLE_RATE", raising=False)
+    assert profiling.RequestProfiler.from_env() is None
+
+    monkeypatch.setenv("PROFILE_SECRET", "secret")
+    monkeypatch.setenv("MOSAIC_DEF_BUCKET", "my-bucket")
+    profiler = profiling.RequestProfiler.from_env()
+    assert profiler.output == "s3://my-bucket/profiles"
+    assert profiler.sample_rate == 0
+    assert profiler.mode == "sample"
+
+    monkeypatch.setenv("PROFILE_MODE", "invalid")
+    with pytest.raises(ValueError):
+        profiling.RequestProfiler.from_env()
+
+
+def test_signed_request(tmpdir):
+    """Should profile requests with a valid flag."""
+    app.profiler = profiling.RequestProfiler(str(tmpdir), secret="secret")
+
+    res = app(_event({"value": "1"}), {})
+    assert res["statusCode"] == 200
+    assert profiling.PROFILE_HEADER not in res["headers"]
+
+    res = app(_event({"value": "1", "profile_token": "1.invalid"}), {})
+    assert res["statusCode"] == 200
+    assert profiling.PROFILE_HEADER not in res["headers"]
+    assert res["body"] == "value=1"
+    assert not tmpdir.listdir()
+
+    token = profiling.sign("/slow", int(time.time()) + 60, "secret")
+    res = app(_event({"value": "1", "profile_token": token}), {})
+    assert res["statusCode"] == 200
+    assert res["body"] == "value=1"
+    path = res["headers"][profiling.PROFILE_HEADER]
+    assert os.path.dirname(path) == str(tmpdir)
+    assert path.endswith(".txt")
+    with open(path) as f:
+        stacks = f.read()
+    assert "_slow (test_profiling.py" in stacks
+    assert stacks.splitlines()[0].startswith("MainThread;")
+
+
+def test_deterministic(tmpdir):
+    """Should write pstats dumps."""
+    app.profiler = profiling.RequestProfiler(
+        str(tmpdir), sample_rate=1, mode="deterministic"
+    )
+    res = app(_event(), {})
+    path = res["headers"][profiling.PROFILE_HEADER]
+    assert path.endswith(".prof")
+    stats = pstats.Stats(path)
+    assert any(func[2] == "_slow" for func in stats.stats)
+
+
+def test_sample_rate(tmpdir):
+    """Should profile a fraction of requests."""
+    app.profiler = profiling.RequestProfiler(str(tmpdir), sample_rate=0.5)
+    with patch("cogeo_mosaic_tiler.profiling.random.random") as rand:
+        rand.return_value = 0.7
+        assert profiling.PROFILE_HEADER not in app(_event(), {})["headers"]
+        rand.return_value = 0.2
+        assert profiling.PROFILE_HEADER in app(_event(), {})["headers"]
+
+
+@patch("cogeo_mosaic_tiler.profiling._put_data")
+def test_s3_output(put_data):
+    """Should write profiles to S3 and ignore errors."""
+    app.profiler = profiling.RequestProfiler("s3://my-bucket/profiles", sample_rate=1)
+    res = app(_event(), {})
+    url = res["headers"][profiling.PROFILE_HEADER]
+    assert url.startswith("s3://my-bucket/profiles/")
+    assert "_slow_" in url
+    put_data.assert_called_once()
+    assert put_data.call_args[0][0] == url
+
+    put_data.side_effect = Exception("Access Denied")
+    res = app(_event(), {})
+    assert res["statusCode"] == 200
+    assert profiling.PROFILE_HEADER not in res["headers"]
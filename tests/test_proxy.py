@@ -0,0 +1,126 @@
+"""tests cogeo_mosaic_tiler.proxy."""
+
+import gzip
+import json
+import base64
+
+import numpy
+import pytest
+
+from cogeo_mosaic_tiler import raw
+from cogeo_mosaic_tiler.proxy import API, accepted_encodings
+
+brotli = pytest.importorskip("brotli")
+
+app = API(name="test")
+metadata = json.dumps({"tiles": [f"tile-{i}" for i in range(1000)]})
+
+
+@app.route(
+    "/image.png",
+    methods=["GET"],
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+)
+def _image():
+    return ("OK", "image/png", b"\x89PNG" + b"\x00" * 1000)
+
+
+@app.route(
+    "/tile.pbf",
+    methods=["GET"],
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+)
+def _tile():
+    return ("OK", "application/x-protobuf", b"\x00" * 1000)
+
+
+@app.route(
+    "/tile.bin",
+    methods=["GET"],
+    payload_compression_method="gzip",
+    binary_b64encode=True,
+)
+def _raw_tile(compression: str = None):
+    tile = numpy.zeros((1, 256, 256), dtype="uint8")
+    content = raw.encode(tile, tile[0] + 1, compression=compression)
+    return ("OK", raw.CONTENT_TYPE, content)
+
+
+@app.route(
+    "/info", methods=["GET"], payload_compression_method="gzip", binary_b64encode=True
+)
+def _info():
+    return ("OK", "application/json", metadata)
+
+
+def _event(path, encoding):
+    return {
+        "path": path,
+        "httpMethod": "GET",
+        "headers": {"Accept-Encoding": encoding},
+        "queryStringParameters": {},
+    }
+
+
+def test_accepted_encodings():
+    """Should parse Accept-Encoding header."""
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip;q=0.8") == {"gzip"}
+    assert accepted_encodings("") == set()
+
+
+def test_compressed_images():
+    """Should not compress already compressed formats."""
+    res = app(_event("/image.png", "gzip, br"), {})
+    assert "Content-Encoding" not in res["headers"]
+    assert base64.b64decode(res["body"]).startswith(b"\x89PNG")
+
+
+def test_compressed_raw_tiles():
+    """Should not compress raw tiles with a compressed payload."""
+    res = app(_event("/tile.bin", "gzip"), {})
+    assert res["headers"]["Content-Encoding"] == "gzip"
+
+    for compression in raw.compressions()[1:]:
+        event = _event("/tile.bin", "gzip, br")
+        event["queryStringParameters"] = dict(compression=compression)
+        res = app(event, {})
+        assert "Content-Encoding" not in res["headers"]
+        assert raw.get_compression(base64.b64decode(res["body"])) == compression
+
+
+def test_compression():
+    """Should use brotli when accepted, gzip otherwise."""
+    res = app(_event("/tile.pbf", "gzip"), {})
+    assert res["headers"]["Content-Encoding"] == "gzip"
+    assert res["headers"]["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(base64.b64decode(res["body"])) == b"\x00" * 1000
+
+    res = app(_event("/tile.pbf", "gzip, deflate, br"), {})
+    assert res["headers"]["Content-Encoding"] == "br"
+    assert brotli.decompress(base64.b64decode(res["body"])) == b"\x00" * 1000
+
+    res = app(_event("/tile.pbf", "identity"), {})
+    assert "Content-Encoding" not in res["headers"]
+
+
+def test_compressed_cache():
+    """Should cache compressed metadata."""
+    app.compressed_cache.clear()
+    res = app(_event("/info", "br"), {})
+    assert res["headers"]["Content-Encoding"] == "br"
+    body = brotli.decompress(base64.b64decode(res["body"]))
+    assert json.loads(body) == json.loads(metadata)
+    assert len(app.compressed_cache) == 1
+
+    hits = app.compressed_cache.hits
+    res = app(_event("/info", "br"), {})
+    assert app.compressed_cache.hits == hits + 1
+
+    res = app(_event("/info", "gzip"), {})
+    assert json.loads(gzip.decompress(base64.b64decode(res["body"]))) == json.loads(
+        metadata
+    )
+    assert len(app.compressed_cache) == 2
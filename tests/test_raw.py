@@ -0,0 +1,46 @@
+"""tests cogeo_mosaic_tiler.raw."""
+
+import os
+
+import numpy
+import pytest
+
+import rasterio
+
+from cogeo_mosaic_tiler import raw
+
+asset = os.path.join(os.path.dirname(__file__), "fixtures", "cog1_uint32.tif")
+
+
+@pytest.mark.parametrize("compression", raw.compressions())
+def test_encode_decode(compression):
+    """Should round trip tile, mask and header."""
+    with rasterio.open(asset) as src_dst:
+        tile = src_dst.read(out_shape=(src_dst.count, 256, 256))
+    mask = numpy.zeros((256, 256), dtype=numpy.uint8)
+    mask[10:100, 20:200] = 255
+
+    content = raw.encode(tile, mask, bounds=[0, 0, 1, 1], compression=compression)
+    assert content[:4] == b"CMRT"
+
+    data, dmask, header = raw.decode(content)
+    assert data.dtype == numpy.uint32
+    numpy.testing.assert_array_equal(data, tile)
+    numpy.testing.assert_array_equal(dmask, mask)
+    assert header["bounds"] == [0, 0, 1, 1]
+    assert header["crs"] == "EPSG:3857"
+    assert header["compression"] == compression
+
+    if compression != "none":
+        assert len(content) < len(raw.encode(tile, mask))
+
+
+def test_encode_errors():
+    """Should raise on invalid compression or content."""
+    tile = numpy.zeros((1, 4, 4), dtype=numpy.float32)
+    mask = numpy.zeros((4, 4), dtype=numpy.uint8)
+    with pytest.raises(Exception):
+        raw.encode(tile, mask, compression="gzip")
+
+    with pytest.raises(Exception):
+        raw.decode(b"not a tile")
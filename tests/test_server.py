@@ -0,0 +1,72 @@
+"""tests cogeo_mosaic_tiler.server."""
+
+import os
+import base64
+
+from mock import patch
+
+from cogeo_mosaic_tiler import server
+from cogeo_mosaic_tiler.mosaic import fetch_mosaic_definition
+
+mosaic_json = os.path.join(os.path.dirname(__file__), "fixtures", "mosaic.json")
+
+
+def test_request_to_event():
+    """Should translate HTTP request to API Gateway event."""
+    event = server.request_to_event(
+        "GET", "/9/150/182.png?url=s3://my-bucket/mosaic.json&rescale=0,1000", {}
+    )
+    assert event["path"] == "/9/150/182.png"
+    assert event["httpMethod"] == "GET"
+    assert event["queryStringParameters"] == {
+        "url": "s3://my-bucket/mosaic.json",
+        "rescale": "0,1000",
+    }
+    assert not event.get("body")
+
+    event = server.request_to_event("POST", "/create", {}, body=b'["a.tif"]')
+    assert event["isBase64Encoded"]
+    assert base64.b64decode(event["body"]) == b'["a.tif"]'
+
+
+def test_event_response():
+    """Should decode API Gateway response."""
+    status, headers, body = server.event_response(
+        {
+            "statusCode": 200,
+            "headers": {"Content-Type": "image/png"},
+            "isBase64Encoded": True,
+            "body": base64.b64encode(b"img").decode(),
+        }
+    )
+    assert status == 200
+    assert ("Content-Type", "image/png") in headers
+    assert ("Content-Length", "3") in headers
+    assert body == b"img"
+
+    status, _, body = server.event_response(
+        {"statusCode": 204, "headers": {}, "body": ""}
+    )
+    assert status == 204
+    assert body == b""
+
+
+@patch("cogeo_mosaic_tiler.server.gc.freeze")
+def test_preload_mosaics(freeze):
+    """Should load the mosaic definitions before forking."""
+    with patch("cogeo_mosaic_tiler.mosaic.get_mosaic_content") as get_content:
+        get_content.return_value = {"tiles": {}}
+        server.preload_mosaics([mosaic_json + "?preload"])
+        assert get_content.call_count == 1
+        freeze.assert_called_once()
+
+        # Workers use the preloaded object
+        assert fetch_mosaic_definition(mosaic_json + "?preload") is (
+            fetch_mosaic_definition(mosaic_json + "?preload")
+        )
+        assert get_content.call_count == 1
+
+    with patch("cogeo_mosaic_tiler.utils._create_path") as create_path:
+        create_path.return_value = mosaic_json
+        server.preload_mosaics(["a" * 56])
+        create_path.assert_called_with("a" * 56)
@@ -0,0 +1,62 @@
+"""tests cogeo_mosaic_tiler.stats."""
+
+import os
+
+import numpy
+import rasterio
+from mock import patch
+
+from cogeo_mosaic.utils import create_mosaic
+
+from cogeo_mosaic_tiler import stats as stats_module
+from cogeo_mosaic_tiler.stats import get_assets_list, get_mosaic_stats
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+def test_get_assets_list():
+    """Should list unique assets, or overviews when available."""
+    mosaic_def = create_mosaic([asset1, asset2])
+    assert sorted(get_assets_list(mosaic_def)) == sorted([asset1, asset2])
+
+    mosaic_def["overviews"] = dict(tiles={"0": ["ovr.tif"], "1": ["ovr.tif"]})
+    assert get_assets_list(mosaic_def) == ["ovr.tif"]
+    assert get_assets_list(mosaic_def, "first") == ["ovr.tif"]
+    assert sorted(get_assets_list(mosaic_def, "mean")) == sorted([asset1, asset2])
+
+
+def test_get_mosaic_stats():
+    """Should compute per-band statistics from overviews."""
+    stats = get_mosaic_stats([asset1, asset2])
+    assert list(stats) == ["1", "2", "3"]
+    assert set(stats["1"]) == {"pc", "min", "max", "std"}
+
+    values = []
+    for asset in [asset1, asset2]:
+        with rasterio.open(asset) as src_dst:
+            values.append(src_dst.read(1, masked=True).compressed())
+    values = numpy.concatenate(values)
+    assert stats["1"]["min"] >= values.min()
+    assert stats["1"]["max"] <= values.max()
+    pc = numpy.percentile(values, (2, 98))
+    assert abs(stats["1"]["pc"][0] - pc[0]) < (values.max() - values.min()) * 0.02
+    assert abs(stats["1"]["pc"][1] - pc[1]) < (values.max() - values.min()) * 0.02
+
+    # Sampling keeps statistics close
+    sampled = get_mosaic_stats([asset1, asset2], max_samples=1000)
+    assert sampled["1"]["min"] >= stats["1"]["min"]
+
+    assert get_mosaic_stats(["missing.tif"]) == {}
+
+
+@patch("cogeo_mosaic_tiler.stats._sample_values", wraps=stats_module._sample_values)
+def test_get_mosaic_stats_sampling(sample_values):
+    """Should subsample each dataset values as soon as they are read."""
+    stats = get_mosaic_stats([asset1, asset2], max_samples=1000)
+    assert list(stats) == ["1", "2", "3"]
+    assert all(call[0][2] == 500 for call in sample_values.call_args_list)
+
+    values = stats_module._sample_values(asset1, max_values=500)
+    assert len(values) == 3
+    assert all(0 < band.size <= 500 for band in values)
@@ -0,0 +1,90 @@
+"""tests cogeo_mosaic_tiler.storage."""
+
+import os
+import json
+
+import mercantile
+import pytest
+
+from cogeo_mosaic.utils import get_assets
+
+from cogeo_mosaic_tiler import mosaic, storage
+
+asset1 = os.path.join(os.path.dirname(__file__), "fixtures", "cog1.tif")
+asset2 = os.path.join(os.path.dirname(__file__), "fixtures", "cog2.tif")
+
+
+def test_get_storage(monkeypatch):
+    """Should create storage from environment."""
+    monkeypatch.delenv("MOSAIC_STORAGE", raising=False)
+    monkeypatch.setenv("MOSAIC_DEF_BUCKET", "my-bucket")
+    backend = storage.get_storage()
+    assert isinstance(backend, storage.S3Storage)
+    assert backend.path("abc") == "s3://my-bucket/mosaics/abc.json.gz"
+    assert backend.overviews_path("abc") == "s3://my-bucket/mosaics/abc/overviews"
+
+    monkeypatch.setenv("MOSAIC_STORAGE", "s3://other-bucket/defs")
+    assert storage.get_storage().path("abc") == "s3://other-bucket/defs/abc.json.gz"
+
+    monkeypatch.setenv("MOSAIC_STORAGE", "file:///data/mosaics")
+    backend = storage.get_storage()
+    assert isinstance(backend, storage.FileStorage)
+    assert backend.path("abc") == "/data/mosaics/abc.json.gz"
+
+    monkeypatch.setenv("MOSAIC_STORAGE", "sqlite:///data/mosaics.db")
+    backend = storage.get_storage()
+    assert isinstance(backend, storage.SQLiteStorage)
+    assert backend.path("abc") == "sqlite:///data/mosaics.db:abc"
+    assert storage.parse_sqlite_url(backend.path("abc")) == ("/data/mosaics.db", "abc")
+
+    monkeypatch.setenv("MOSAIC_STORAGE", "ftp://somewhere")
+    with pytest.raises(ValueError):
+        storage.get_storage()
+
+
+def test_file_storage(tmpdir):
+    """Should write gzipped definitions readable by fetch_mosaic_definition."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2])
+    backend = storage.FileStorage(str(tmpdir.join("mosaics")))
+    path = backend.write("abc", mosaic_def)
+    assert path == backend.path("abc")
+    assert os.listdir(str(tmpdir.join("mosaics"))) == ["abc.json.gz"]
+    assert mosaic.fetch_mosaic_definition(path) == json.loads(json.dumps(mosaic_def))
+
+
+def test_sqlite_storage(tmpdir):
+    """Should store and query definitions by quadkey."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2])
+    backend = storage.SQLiteStorage(str(tmpdir.join("mosaics.db")))
+    url = backend.write("abc", mosaic_def)
+    assert url == backend.path("abc")
+
+    stored = storage.read_sqlite_mosaic(url)
+    assert stored["bounds"] == list(mosaic_def["bounds"])
+    assert stored["minzoom"] == mosaic_def["minzoom"]
+    assert dict(stored["tiles"]) == mosaic_def["tiles"]
+    assert dict(stored["assets"]) == mosaic_def["assets"]
+    assert len(stored["tiles"]) == len(mosaic_def["tiles"])
+    assert stored["tiles"].get("0") is None
+
+    for tile in mercantile.tiles(*mosaic_def["bounds"], zooms=[7, 9, 10]):
+        assert get_assets(stored, *tile) == get_assets(mosaic_def, *tile)
+
+    # Replace definition rows
+    mosaic_def = mosaic.create_mosaic([asset1])
+    backend.write("abc", mosaic_def)
+    stored = backend.read("abc")
+    assert dict(stored["tiles"]) == mosaic_def["tiles"]
+    assert list(stored["assets"]) == [asset1]
+
+    with pytest.raises(storage.MosaicNotFoundError):
+        backend.read("def")
+
+
+def test_sqlite_fetch_and_find_assets(tmpdir):
+    """Should find tile assets from SQLite definitions."""
+    mosaic_def = mosaic.create_mosaic([asset1, asset2])
+    url = storage.SQLiteStorage(str(tmpdir.join("mosaics.db"))).write("abc", mosaic_def)
+    assert mosaic.fetch_and_find_assets(url, 148, 182, 9) == [asset1]
+    assert mosaic.fetch_and_find_assets(url, 150, 182, 9) == [asset1, asset2]
+    assert mosaic.fetch_and_find_assets_point(url, -75.5, 45) == [asset1]